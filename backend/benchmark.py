@@ -0,0 +1,512 @@
+"""Benchmarks for the evaluation backend.
+
+precision: loads MODEL_PATH once per inference precision, scores a fixed set of
+source/translation pairs and reports memory footprint, tokens/second and how well
+the scores agree with the first precision in the list (the baseline).
+
+    python benchmark.py precision --precisions auto,bfloat16,int8 --out precision.json
+
+offline: needs no Smartling account or model download. Serves a fake Smartling API on
+localhost (auth, paged jobs/files/translations, per-request latency and periodic 429s) for a
+synthetic Japanese project of each requested size, points the backend at it with a scratch
+database, and drives the real endpoints: ingest strings/second, p50/p99 of table pages and
+searches, flagging runtime, and evaluations/second on a tiny random-weight model.
+
+    python benchmark.py offline --strings 1000,100000 --out offline.json
+"""
+import argparse
+import asyncio
+import atexit
+import concurrent.futures
+import gc
+import json
+import os
+import platform
+import shutil
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+
+import torch
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+# importing main runs init_db(); give it a scratch database so benchmarks never migrate or read the real strings.db
+BENCH_DB_DIR = tempfile.mkdtemp(prefix="strings-bench-db-")
+atexit.register(shutil.rmtree, BENCH_DB_DIR, ignore_errors=True)
+os.environ["STRINGS_DB_PATH"] = os.path.join(BENCH_DB_DIR, "strings.db")
+
+import main  # noqa: E402
+
+# fixed string set so runs are comparable; a mix of good, awkward and broken translations
+BENCH_PAIRS = [
+    ("Save", "保存"),
+    ("Cancel", "キャンセル"),
+    ("Settings", "設定"),
+    ("Delete this file?", "このファイルを削除しますか？"),
+    ("You have {count} unread messages.", "未読メッセージが{count}件あります。"),
+    ("Your changes have been saved.", "変更が保存されました。"),
+    ("Sign in with your company account", "会社のアカウントでサインイン"),
+    ("Click <b>Next</b> to continue.", "<b>次へ</b>をクリックして続行します。"),
+    ("Export report as CSV", "Export report as CSV"),
+    ("The guide will be shown to new users only.", "ガイドは新しいユーザーのみに表示されます。"),
+    ("Last updated {date}", "最終更新"),
+    ("Are you sure you want to leave this page?", "このページは離れるですか本当に？"),
+]
+
+
+def current_rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024, 1)
+    except (OSError, ValueError):
+        return None
+
+
+def run_precision(precision, pairs, max_new_tokens):
+    gc.collect()
+    rss_before = current_rss_mb()
+    started = time.perf_counter()
+    model, tokenizer = main.load_model(precision)
+    load_seconds = time.perf_counter() - started
+    rss_after = current_rss_mb()
+    scores = []
+    new_tokens = 0
+    generate_seconds = 0.0
+    for source, translation in pairs:
+        inputs = tokenizer.apply_chat_template(
+            main.build_eval_messages(source, translation),
+            add_generation_prompt=True,
+            return_tensors="pt",
+            return_dict=True,
+        ).to(model.device)
+        t0 = time.perf_counter()
+        with torch.no_grad():
+            output = model.generate(**inputs, max_new_tokens=max_new_tokens, do_sample=False, pad_token_id=tokenizer.pad_token_id)
+        generate_seconds += time.perf_counter() - t0
+        generated = output[0, inputs["input_ids"].shape[1]:]
+        new_tokens += int(generated.shape[0])
+        try:
+            score, _ = main.parse_eval_output(tokenizer.decode(generated, skip_special_tokens=True))
+        except ValueError:
+            score = None
+        scores.append(score)
+    result = {
+        "precision": precision,
+        "load_seconds": round(load_seconds, 2),
+        "model_memory_mb": round(model.get_memory_footprint() / 1024 / 1024, 1),
+        "rss_delta_mb": round(rss_after - rss_before, 1) if rss_before is not None and rss_after is not None else None,
+        "new_tokens": new_tokens,
+        "generate_seconds": round(generate_seconds, 2),
+        "tokens_per_second": round(new_tokens / generate_seconds, 2) if generate_seconds else None,
+        "parsed": sum(score is not None for score in scores),
+        "scores": scores,
+    }
+    del model, tokenizer
+    gc.collect()
+    return result
+
+
+def score_agreement(baseline, scores):
+    both = [(a, b) for a, b in zip(baseline, scores) if a is not None and b is not None]
+    if not both:
+        return {"compared": 0, "exact": None, "within_10": None, "mean_abs_diff": None}
+    diffs = [abs(a - b) for a, b in both]
+    return {
+        "compared": len(both),
+        "exact": round(sum(d == 0 for d in diffs) / len(both), 3),
+        "within_10": round(sum(d <= 10 for d in diffs) / len(both), 3),
+        "mean_abs_diff": round(sum(diffs) / len(both), 2),
+    }
+
+
+def bench_precision(args):
+    if args.model:
+        main.MODEL_PATH = args.model
+    precisions = [p.strip() for p in args.precisions.split(",") if p.strip()]
+    for precision in precisions:
+        if precision not in main.INFERENCE_PRECISIONS:
+            raise SystemExit(f"unknown precision {precision!r}, expected one of {', '.join(main.INFERENCE_PRECISIONS)}")
+    results = []
+    for precision in precisions:
+        print(f"[bench] precision={precision}")
+        results.append(run_precision(precision, BENCH_PAIRS, args.max_new_tokens))
+    baseline = results[0]
+    for result in results:
+        result["agreement_with_" + baseline["precision"]] = score_agreement(baseline["scores"], result["scores"])
+    return {"benchmark": "precision", "model_path": main.MODEL_PATH, "pairs": len(BENCH_PAIRS), "results": results}
+
+
+# --- Fake Smartling ---
+# Strings are derived from (file, index) on demand so a 1M string project costs no memory.
+EN_WORDS = ["account", "settings", "file", "report", "project", "message", "user", "password", "folder", "download",
+            "upload", "review", "translation", "payment", "invoice", "schedule", "team", "profile", "guide", "search"]
+JA_WORDS = ["アカウント", "設定画面", "ファイル", "レポート", "プロジェクト", "メッセージ", "ユーザー", "パスワード", "フォルダー", "ダウンロード",
+            "アップロード", "レビュー", "翻訳メモリ", "お支払い", "請求書", "スケジュール", "チーム", "プロフィール", "ガイド", "検索結果"]
+
+
+def synthetic_string(file_index, i):
+    """(source, translation) with a sprinkling of the problems the flag rules look for."""
+    n = (file_index * 7919 + i) * 2654435761 % 2 ** 32
+    words = [n >> (k * 3) & 0xffff for k in range(3 + n % 6)]
+    source = " ".join(EN_WORDS[w % len(EN_WORDS)] for w in words).capitalize() + f" {i}."
+    translation = "の".join(JA_WORDS[w % len(JA_WORDS)] for w in words) + f"{i}。"
+    kind = n % 100
+    if kind < 5:
+        source, translation = f"{{count}} {source}", f"{{count}}{translation}"
+    elif kind < 7:
+        source = f"{{count}} {source}"  # variable missing from the translation
+    elif kind < 10:
+        source, translation = f"<b>{source}</b>", f"<b>{translation}</b>"
+    elif kind < 12:
+        translation = source  # left untranslated
+    return source, translation
+
+
+class FakeSmartling:
+    def __init__(self, strings, strings_per_file=1000, files_per_job=2, page_size=500, latency=0.005, rate_limit_every=50, retry_after=0.05):
+        self.strings = strings
+        self.strings_per_file = strings_per_file
+        self.files = max(1, -(-strings // strings_per_file))
+        self.files_per_job = files_per_job
+        self.jobs = max(1, -(-self.files // files_per_job))
+        self.page_size = page_size
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.requests = 0
+        self.rate_limited = 0
+        self.tokens = set()
+        self.app = self.build_app()
+        self.server = None
+        self.thread = None
+        self.url = None
+
+    def file_uri(self, file_index):
+        return f"/bench/strings-{file_index:05d}.json"
+
+    def file_size(self, file_index):
+        return min(self.strings_per_file, self.strings - file_index * self.strings_per_file)
+
+    def issue_token(self):
+        token = f"token-{len(self.tokens)}"
+        self.tokens.add(token)
+        return {"response": {"code": "SUCCESS", "data": {"accessToken": token, "refreshToken": f"refresh-{token}", "expiresIn": 480}}}
+
+    @staticmethod
+    def page(items, total):
+        return {"response": {"code": "SUCCESS", "data": {"items": items, "totalCount": total}}}
+
+    def build_app(self):
+        app = FastAPI()
+
+        @app.middleware("http")
+        async def latency_and_rate_limit(request: Request, call_next):
+            self.requests += 1
+            await asyncio.sleep(self.latency)
+            if "/auth-api/" not in request.url.path:
+                if request.headers.get("authorization", "").removeprefix("Bearer ") not in self.tokens:
+                    return JSONResponse(status_code=401, content={"response": {"code": "AUTHENTICATION_ERROR"}})
+                if self.rate_limit_every and self.requests % self.rate_limit_every == 0:
+                    self.rate_limited += 1
+                    return JSONResponse(status_code=429, content={"response": {"code": "MAX_OPERATIONS_LIMIT_EXCEEDED"}}, headers={"Retry-After": str(self.retry_after)})
+            return await call_next(request)
+
+        @app.post("/auth-api/v2/authenticate")
+        @app.post("/auth-api/v2/authenticate/refresh")
+        def authenticate():
+            return self.issue_token()
+
+        @app.get("/accounts-api/v2/accounts/{account_id}/projects")
+        def projects(account_id: str):
+            return self.page([{"projectId": "bench", "projectName": "Benchmark"}], 1)
+
+        @app.get("/jobs-api/v3/projects/{project_id}/jobs")
+        def jobs(project_id: str, offset: int = 0, limit: int = 100):
+            items = [{"translationJobUid": f"job{j}", "jobName": f"Job {j}", "jobStatus": "IN_PROGRESS", "modifiedDate": "2026-01-01T00:00:00Z"}
+                     for j in range(offset, min(self.jobs, offset + limit))]
+            return self.page(items, self.jobs)
+
+        @app.get("/jobs-api/v3/projects/{project_id}/jobs/{job_id}/files")
+        def job_files(project_id: str, job_id: str):
+            first = int(job_id[3:]) * self.files_per_job
+            items = [{"uri": self.file_uri(f)} for f in range(first, min(self.files, first + self.files_per_job))]
+            return self.page(items, len(items))
+
+        @app.get("/files-api/v2/projects/{project_id}/locales/{locale}/file/last-modified")
+        def last_modified(project_id: str, locale: str, fileUri: str):
+            return {"response": {"code": "SUCCESS", "data": {"localeId": locale, "lastModified": "2026-01-01T00:00:00Z"}}}
+
+        @app.get("/strings-api/v2/projects/{project_id}/translations")
+        def translations(project_id: str, fileUri: str, targetLocaleId: str, offset: int = 0, limit: int = None):
+            file_index = int(fileUri.rsplit("-", 1)[1].split(".")[0])
+            total = self.file_size(file_index)
+            items = []
+            for i in range(offset, min(total, offset + min(limit or self.page_size, self.page_size))):
+                source, translation = synthetic_string(file_index, i)
+                items.append({"hashcode": f"{file_index:05d}{i:06d}", "parsedStringText": source, "targetLocaleId": targetLocaleId, "translations": [{"translation": translation}]})
+            return self.page(items, total)
+
+        return app
+
+    def start(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(("127.0.0.1", 0))
+        self.url = "http://127.0.0.1:%d" % sock.getsockname()[1]
+        self.server = uvicorn.Server(uvicorn.Config(self.app, log_level="warning", access_log=False))
+        self.thread = threading.Thread(target=self.server.run, kwargs={"sockets": [sock]}, name="fake-smartling", daemon=True)
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join()
+
+
+# --- Tiny model ---
+def build_tiny_model(path):
+    """Random-weight Phi-3 shaped model with a small BPE tokenizer and a chat template; exercises the eval path, not quality."""
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers, trainers
+    from transformers import Phi3Config, Phi3ForCausalLM, PreTrainedTokenizerFast
+
+    corpus = ['{"score": 95, "reason": "Accurate and natural translation."}', " ".join(EN_WORDS), "".join(JA_WORDS)] * 20
+    corpus += [text for pair in BENCH_PAIRS for text in pair]
+    tokenizer = Tokenizer(models.BPE(unk_token="<unk>"))
+    tokenizer.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tokenizer.decoder = decoders.ByteLevel()
+    special_tokens = ["<unk>", "<|endoftext|>", "<|system|>", "<|user|>", "<|assistant|>", "<|end|>"]
+    tokenizer.train_from_iterator(corpus, trainers.BpeTrainer(vocab_size=512, special_tokens=special_tokens, initial_alphabet=pre_tokenizers.ByteLevel.alphabet(), show_progress=False))
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=tokenizer, unk_token="<unk>", eos_token="<|endoftext|>", pad_token="<|endoftext|>")
+    tokenizer.chat_template = "{% for m in messages %}<|{{ m['role'] }}|>{{ m['content'] }}<|end|>{% endfor %}{% if add_generation_prompt %}<|assistant|>{% endif %}"
+    tokenizer.save_pretrained(path)
+    config = Phi3Config(vocab_size=len(tokenizer), hidden_size=64, intermediate_size=128, num_hidden_layers=2, num_attention_heads=4, num_key_value_heads=4,
+                        max_position_embeddings=4096, pad_token_id=tokenizer.pad_token_id, eos_token_id=tokenizer.eos_token_id, bos_token_id=tokenizer.eos_token_id)
+    torch.manual_seed(0)
+    Phi3ForCausalLM(config).save_pretrained(path)
+    return path
+
+
+# --- Measurements ---
+def percentiles(seconds):
+    ordered = sorted(seconds)
+    if not ordered:
+        return {"count": 0}
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {"count": len(ordered), "p50_ms": round(pick(0.5) * 1000, 2), "p99_ms": round(pick(0.99) * 1000, 2), "max_ms": round(ordered[-1] * 1000, 2)}
+
+
+def timed(client, method, url, **kwargs):
+    started = time.perf_counter()
+    res = client.request(method, url, **kwargs)
+    seconds = time.perf_counter() - started
+    if res.status_code != 200:
+        raise RuntimeError(f"{method} {url} returned {res.status_code}: {res.text[:200]}")
+    return res.json(), seconds
+
+
+def bench_table(client, project_id, total, repeats):
+    table = "/admin/smartling-translations-table"
+    base = {"project_id": project_id, "per_page": 50}
+    timings = {"first_page": [], "keyset_walk": [], "offset_deep": [], "status_filter": [], "flag_filter": []}
+    for _ in range(repeats):
+        body, seconds = timed(client, "GET", table, params=base)
+        timings["first_page"].append(seconds)
+        for _ in range(10):
+            if not body["next_after_id"]:
+                break
+            body, seconds = timed(client, "GET", table, params={**base, "after_id": body["next_after_id"]})
+            timings["keyset_walk"].append(seconds)
+        timings["offset_deep"].append(timed(client, "GET", table, params={**base, "page": max(1, total // 100)})[1])
+        timings["status_filter"].append(timed(client, "GET", table, params={**base, "status": "pending"})[1])
+        timings["flag_filter"].append(timed(client, "GET", table, params={**base, "flag": 1})[1])
+    return {name: percentiles(values) for name, values in timings.items()}
+
+
+def bench_search(client, project_id, repeats):
+    table = "/admin/smartling-translations-table"
+    queries = {
+        "source_fts": [("source", word) for word in EN_WORDS],
+        "translation_fts": [("translation", word) for word in JA_WORDS],
+        "translation_short_like": [("translation", word[:2]) for word in JA_WORDS],
+        "source_relevance": [("source", f"{a} {b}") for a, b in zip(EN_WORDS, EN_WORDS[1:])],
+    }
+    result = {}
+    for name, pairs in queries.items():
+        seconds = []
+        for _ in range(repeats):
+            for search_type, text in pairs:
+                params = {"project_id": project_id, "per_page": 50, "search_type": search_type, "search_text": text}
+                if name == "source_relevance":
+                    params["sort"] = "relevance"
+                seconds.append(timed(client, "GET", table, params=params)[1])
+        result[name] = percentiles(seconds)
+    return result
+
+
+def bench_project(args, strings):
+    """Ingest, table, search and flagging numbers for one synthetic project of the given size."""
+    project_id = f"bench-{strings}"
+    fake = FakeSmartling(strings, args.strings_per_file, page_size=args.page_size, latency=args.latency_ms / 1000, rate_limit_every=args.rate_limit_every).start()
+    main.SMARTLING_API_BASE = fake.url
+    main.smartling.invalidate()
+    try:
+        with TestClient(main.app) as client:
+            client.post("/admin/smartling-keys", json={"user_id": "bench", "secret": "bench", "project_id": project_id, "account_id": "bench"}).raise_for_status()
+            client.post("/admin/smartling-auth", json={"user_id": "bench", "secret": "bench"}).raise_for_status()
+            requests_before = fake.requests
+            job_files, job_files_seconds = timed(client, "POST", "/admin/smartling-job-files", json={"project_id": project_id, "concurrency": args.concurrency})
+            ingest, ingest_seconds = timed(client, "POST", "/admin/smartling-fetch-translations", json={"project_id": project_id, "concurrency": args.concurrency})
+            resync, resync_seconds = timed(client, "POST", "/admin/smartling-fetch-translations", json={"project_id": project_id, "concurrency": args.concurrency})
+            flag_full, flag_full_seconds = timed(client, "POST", "/admin/flag-matching-strings", params={"project_id": project_id, "full": True})
+            flag_incremental, flag_incremental_seconds = timed(client, "POST", "/admin/flag-matching-strings", params={"project_id": project_id})
+            result = {
+                "strings": strings,
+                "files": fake.files,
+                "jobs": fake.jobs,
+                "ingest": {
+                    "job_files_seconds": round(job_files_seconds, 3),
+                    "seconds": round(ingest_seconds, 3),
+                    "saved": ingest.get("saved"),
+                    "strings_per_second": round(ingest.get("saved", 0) / ingest_seconds, 1) if ingest_seconds else None,
+                    "pages": ingest.get("pages"),
+                    "retries": job_files.get("retries", 0) + ingest.get("retries", 0),
+                    "smartling_requests": fake.requests - requests_before,
+                    "rate_limited": fake.rate_limited,
+                    "unchanged_resync_seconds": round(resync_seconds, 3),
+                    "unchanged_resync_files_skipped": resync.get("files_skipped"),
+                },
+                "table": bench_table(client, project_id, strings, args.repeats),
+                "search": bench_search(client, project_id, args.repeats),
+                "flagging": {
+                    "full_seconds": round(flag_full_seconds, 3),
+                    "full_strings_per_second": round(strings / flag_full_seconds, 1) if flag_full_seconds else None,
+                    "checked": flag_full.get("checked"),
+                    "flagged": flag_full.get("flagged"),
+                    "by_rule": flag_full.get("by_rule"),
+                    "incremental_noop_seconds": round(flag_incremental_seconds, 3),
+                },
+            }
+    finally:
+        fake.stop()
+    return result
+
+
+def bench_evaluation(args, work_dir):
+    """Evaluations/second through /evaluate-translation with concurrent callers, on a tiny random-weight model.
+
+    The pre-screen is off unless --eval-prescreen is given, so every evaluation reaches the model.
+    """
+    main.MODEL_PATH = build_tiny_model(os.path.join(work_dir, "tiny-model"))
+    main.generation_args["max_new_tokens"] = args.eval_max_new_tokens
+    main.set_setting('prescreen_enabled', 'true' if args.eval_prescreen else 'false')
+    pairs = [(f"{source} ({i})", translation) for i in range(args.evals) for source, translation in [BENCH_PAIRS[i % len(BENCH_PAIRS)]]]
+    with TestClient(main.app) as client:
+        client.post("/admin/set-model-download-flag", json={"download_model": True}).raise_for_status()
+        load_started = time.perf_counter()
+        while client.get("/admin/model-status").json()["state"] == "loading":
+            time.sleep(0.05)
+        load_seconds = time.perf_counter() - load_started
+        before = dict(main.eval_engine.stats)
+        screened_before = main.prescreen_stats["pass"] + main.prescreen_stats["fail"]
+        started = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(args.eval_concurrency) as pool:
+            latencies = list(pool.map(lambda pair: timed(client, "POST", "/evaluate-translation", json={"source": pair[0], "translation": pair[1]})[1], pairs))
+        seconds = time.perf_counter() - started
+        after = dict(main.eval_engine.stats)
+        prescreened = main.prescreen_stats["pass"] + main.prescreen_stats["fail"] - screened_before
+        client.post("/admin/set-model-download-flag", json={"download_model": False})
+    delta = {key: after.get(key, 0) - before.get(key, 0) for key in ("requests", "batches", "prompt_tokens", "generated_tokens", "busy_seconds", "prefill_seconds", "decode_seconds")}
+    return {
+        "engine": type(main.eval_engine).__name__,
+        "evaluations": len(pairs),
+        "prescreen": args.eval_prescreen,
+        "prescreened": prescreened,
+        "model_requests": delta["requests"],
+        "concurrency": args.eval_concurrency,
+        "max_new_tokens": args.eval_max_new_tokens,
+        "model_load_seconds": round(load_seconds, 2),
+        "seconds": round(seconds, 3),
+        "evaluations_per_second": round(len(pairs) / seconds, 2) if seconds else None,
+        "model_evaluations_per_second": round(delta["requests"] / seconds, 2) if seconds else None,
+        "latency": percentiles(latencies),
+        "batches": delta["batches"],
+        "mean_batch_size": round(delta["requests"] / delta["batches"], 2) if delta["batches"] else None,
+        "prompt_tokens": delta["prompt_tokens"],
+        "generated_tokens": delta["generated_tokens"],
+        "generated_tokens_per_second": round(delta["generated_tokens"] / delta["busy_seconds"], 1) if delta["busy_seconds"] else None,
+        "prefill_seconds": round(delta["prefill_seconds"], 3),
+        "decode_seconds": round(delta["decode_seconds"], 3),
+    }
+
+
+def bench_offline(args):
+    sizes = [int(size) for size in args.strings.split(",") if size.strip()]
+    original = (main.DB_PATH, main.SMARTLING_API_BASE, main.MODEL_PATH, main.generation_args["max_new_tokens"])
+    report = {
+        "benchmark": "offline",
+        "environment": {"python": platform.python_version(), "sqlite": sqlite3.sqlite_version, "torch": torch.__version__, "cpus": os.cpu_count()},
+        "settings": {"latency_ms": args.latency_ms, "rate_limit_every": args.rate_limit_every, "page_size": args.page_size, "strings_per_file": args.strings_per_file, "concurrency": args.concurrency},
+        "projects": [],
+    }
+    with tempfile.TemporaryDirectory(prefix="strings-bench-") as work_dir:
+        try:
+            for size in sizes:
+                print(f"[bench] offline project of {size} strings")
+                # a fresh database per size so nothing is cached or already synced
+                main.DB_PATH = os.path.join(work_dir, f"strings-{size}.db")
+                main.init_db()
+                report["projects"].append(bench_project(args, size))
+            if args.evals:
+                print(f"[bench] {args.evals} evaluations on a tiny random-weight model")
+                main.DB_PATH = os.path.join(work_dir, "strings-eval.db")
+                main.init_db()
+                report["evaluation"] = bench_evaluation(args, work_dir)
+        finally:
+            main.db().close()
+            main.DB_PATH, main.SMARTLING_API_BASE, main.MODEL_PATH, main.generation_args["max_new_tokens"] = original
+            main.smartling.invalidate()
+    return report
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="benchmark", required=True)
+    p = sub.add_parser("precision", help="compare inference precisions")
+    p.add_argument("--model", help="model path or hub id (defaults to MODEL_PATH)")
+    p.add_argument("--precisions", default="auto,bfloat16,int8", help="comma separated, first one is the baseline")
+    p.add_argument("--max-new-tokens", type=int, default=main.generation_args["max_new_tokens"])
+    p.add_argument("--out", help="write the JSON report here as well as stdout")
+    p.set_defaults(func=bench_precision)
+    p = sub.add_parser("offline", help="ingest/table/search/flagging/evaluation throughput against a local fake Smartling")
+    p.add_argument("--strings", default="1000,10000", help="comma separated project sizes, each run on a fresh database")
+    p.add_argument("--strings-per-file", type=int, default=1000)
+    p.add_argument("--page-size", type=int, default=500, help="translations per Smartling page")
+    p.add_argument("--latency-ms", type=float, default=5.0, help="added to every fake Smartling response")
+    p.add_argument("--rate-limit-every", type=int, default=50, help="answer every Nth request with 429 (0 disables)")
+    p.add_argument("--concurrency", type=int, default=4, help="Smartling fetch concurrency")
+    p.add_argument("--repeats", type=int, default=5, help="passes over the table and search query sets")
+    p.add_argument("--evals", type=int, default=64, help="evaluations to run on the tiny model (0 skips the model)")
+    p.add_argument("--eval-concurrency", type=int, default=8)
+    p.add_argument("--eval-max-new-tokens", type=int, default=32)
+    p.add_argument("--eval-prescreen", action="store_true", help="keep the heuristic pre-screen on (reports prescreened and model counts separately)")
+    p.add_argument("--out", help="write the JSON report here as well as stdout")
+    p.set_defaults(func=bench_offline)
+    args = parser.parse_args()
+    report = args.func(args)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main_cli()
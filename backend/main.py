@@ -1,4 +1,10 @@
 import concurrent.futures
+import contextlib
+import csv
+import functools
+import io
+import zlib
+import sys
 import httpx
 import time
 import sqlite3
@@ -6,15 +12,281 @@ import os
 import httpx
 import logging
 import time
+import queue
+import threading
+import traceback
+import hashlib
+import json
+import math
+import re
+import copy
+import random
+import struct
+import unicodedata
+import itertools
+import multiprocessing
+import asyncio
+from collections import OrderedDict
 from fastapi import FastAPI, HTTPException, Request, Query, Body
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 from pydantic import BaseModel
 from typing import List, Optional
 from fastapi import APIRouter
+from xml.sax.saxutils import escape as xml_escape, quoteattr as xml_quoteattr
 import torch
-from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
-DB_PATH = os.path.join(os.path.dirname(__file__), 'strings.db')
+from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline, StoppingCriteria, StoppingCriteriaList
+DB_PATH = os.environ.get('STRINGS_DB_PATH') or os.path.join(os.path.dirname(__file__), 'strings.db')
+
+# --- Metrics ---
+# Counters, gauges and histograms kept in memory and rendered in the Prometheus text format at /metrics.
+METRIC_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta = {}
+        self._values = {}
+        self._histograms = {}
+
+    def describe(self, name: str, kind: str, help_text: str, buckets=METRIC_BUCKETS):
+        self._meta[name] = (kind, help_text, buckets)
+
+    @staticmethod
+    def _key(labels):
+        return tuple(sorted(labels.items())) if labels else ()
+
+    def inc(self, name: str, labels=None, value: float = 1.0):
+        key = (name, self._key(labels))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + value
+
+    def set(self, name: str, value: float, labels=None):
+        with self._lock:
+            self._values[(name, self._key(labels))] = value
+
+    def observe(self, name: str, value: float, labels=None):
+        buckets = self._meta[name][2]
+        key = (name, self._key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(buckets), 0.0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    @staticmethod
+    def _labels(labels, extra=None):
+        items = list(labels) + (list(extra) if extra else [])
+        if not items:
+            return ""
+        return "{" + ",".join('%s="%s"' % (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in items) + "}"
+
+    def render(self) -> str:
+        with self._lock:
+            values = dict(self._values)
+            histograms = {key: ([*h[0]], h[1], h[2]) for key, h in self._histograms.items()}
+        lines = []
+        for name, (kind, help_text, buckets) in sorted(self._meta.items()):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "histogram":
+                for (metric, labels), (counts, total, count) in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, bucket_count in zip(buckets, counts):
+                        lines.append(f"{name}_bucket{self._labels(labels, [('le', bound)])} {bucket_count}")
+                    lines.append(f"{name}_bucket{self._labels(labels, [('le', '+Inf')])} {count}")
+                    lines.append(f"{name}_sum{self._labels(labels)} {total}")
+                    lines.append(f"{name}_count{self._labels(labels)} {count}")
+            else:
+                for (metric, labels), value in sorted(values.items()):
+                    if metric == name:
+                        lines.append(f"{name}{self._labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+metrics.describe("http_request_duration_seconds", "histogram", "HTTP request latency by route (time to response headers for streams).")
+metrics.describe("db_statement_duration_seconds", "histogram", "SQLite statement execution time by operation and table.")
+metrics.describe("db_write_lock_wait_seconds", "histogram", "Time spent waiting for the shared writer connection.")
+metrics.describe("smartling_request_duration_seconds", "histogram", "Outbound Smartling API latency by endpoint.")
+metrics.describe("smartling_requests_total", "counter", "Outbound Smartling API responses by endpoint and status.")
+metrics.describe("smartling_retries_total", "counter", "Smartling requests retried after 429/5xx/network errors.")
+metrics.describe("smartling_token_refreshes_total", "counter", "Smartling access token refreshes.")
+metrics.describe("eval_prefill_seconds", "histogram", "Prompt processing time per evaluation batch (until the first generated token).")
+metrics.describe("eval_decode_seconds", "histogram", "Token generation time per evaluation batch after the first token.")
+metrics.describe("eval_batch_size", "histogram", "Prompts per evaluation batch.", buckets=(1, 2, 4, 8, 16, 32, 64))
+metrics.describe("eval_cache_lookups_total", "counter", "Evaluation cache lookups by result.")
+metrics.describe("eval_prescreen_total", "counter", "Heuristic pre-screen decisions by route (pass/fail skip the model).")
+metrics.describe("eval_engine_requests_total", "counter", "Prompts evaluated by the model.")
+metrics.describe("eval_engine_batches_total", "counter", "Evaluation batches run.")
+metrics.describe("eval_engine_errors_total", "counter", "Evaluation batches that raised.")
+metrics.describe("eval_engine_prompt_tokens_total", "counter", "Prompt tokens processed.")
+metrics.describe("eval_engine_generated_tokens_total", "counter", "Tokens generated.")
+metrics.describe("eval_engine_busy_seconds_total", "counter", "Time spent running evaluation batches.")
+metrics.describe("eval_engine_tokens_per_second", "gauge", "Generated tokens per busy second since start.")
+metrics.describe("eval_engine_queue_depth", "gauge", "Prompts waiting for the evaluation engine.")
+metrics.describe("model_ready", "gauge", "1 when the evaluation model is loaded.")
+metrics.describe("sync_jobs", "gauge", "Background sync jobs by state.")
+
+SQL_STATEMENT_RE = re.compile(r"^\s*(\w+)\s+(?:OR\s+\w+\s+)?(?:(\w+)\s+SET\b|.*?\b(?:FROM|INTO|TABLE|ON)\s+(?:IF\s+(?:NOT\s+)?EXISTS\s+)?(\w+))?", re.S | re.I)
+
+@functools.lru_cache(maxsize=1024)
+def sql_statement_labels(sql: str):
+    match = SQL_STATEMENT_RE.match(sql)
+    if not match:
+        return (("op", "other"), ("table", ""))
+    return (("op", match.group(1).upper()), ("table", (match.group(2) or match.group(3) or "").lower()))
+
+class TimedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            metrics.observe("db_statement_duration_seconds", time.perf_counter() - started, dict(sql_statement_labels(sql)))
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            metrics.observe("db_statement_duration_seconds", time.perf_counter() - started, dict(sql_statement_labels(sql)))
+
+class TimedConnection(sqlite3.Connection):
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+# WAL is enabled once in init_db (it sticks to the database file); these apply per connection
+DB_PRAGMAS = (
+    ("synchronous", "NORMAL"),
+    ("cache_size", -65536),
+    ("mmap_size", 268435456),
+    ("busy_timeout", 5000),
+    ("temp_store", "MEMORY"),
+)
+DB_READERS = 4
+
+def fold_text(text):
+    """Python's Unicode strip/lower for SQL; SQLite's trim() and lower() only handle ASCII."""
+    return text.strip().lower() if text is not None else None
+
+class ConnectionPool:
+    """Long-lived SQLite connections: one writer behind a lock and a small pool of readers.
+
+    With WAL, readers see the last committed state and are never blocked by the writer.
+    write() commits on exit and rolls back if the block raises.
+    """
+    def __init__(self, path: str, readers: int = DB_READERS):
+        self.path = path
+        self._write_lock = threading.RLock()
+        self._writer = None
+        self._readers = queue.LifoQueue()
+        self._reader_slots = threading.BoundedSemaphore(readers)
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, factory=TimedConnection)
+        for name, value in DB_PRAGMAS:
+            conn.execute(f"PRAGMA {name}={value}")
+        conn.create_function("fold_text", 1, fold_text, deterministic=True)
+        return conn
+
+    @contextlib.contextmanager
+    def write(self):
+        waited = time.perf_counter()
+        with self._write_lock:
+            metrics.observe("db_write_lock_wait_seconds", time.perf_counter() - waited)
+            if self._writer is None:
+                self._writer = self._open()
+            conn = self._writer
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                conn.row_factory = None
+
+    @contextlib.contextmanager
+    def read(self):
+        with self._reader_slots:
+            try:
+                conn = self._readers.get_nowait()
+            except queue.Empty:
+                conn = self._open()
+            try:
+                yield conn
+            finally:
+                conn.row_factory = None
+                if conn.in_transaction:
+                    conn.rollback()
+                self._readers.put(conn)
+
+    @contextlib.contextmanager
+    def stream(self):
+        """A dedicated read connection for long scans (exports), so a slow download doesn't hold a pooled reader."""
+        conn = self._open()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def close(self):
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+
+_db_pool = None
+_db_pool_lock = threading.Lock()
+
+def db() -> ConnectionPool:
+    global _db_pool
+    with _db_pool_lock:
+        if _db_pool is None or _db_pool.path != DB_PATH:
+            if _db_pool is not None:
+                _db_pool.close()
+            _db_pool = ConnectionPool(DB_PATH)
+        return _db_pool
+
+# Substring search over source and translation text. The trigram tokenizer indexes every 3-character
+# window, so CJK text (which has no word breaks) matches the same way LIKE '%text%' would.
+FTS_ENABLED = False
+FTS_MIN_QUERY_CHARS = 3
+
+def init_translation_search(c):
+    global FTS_ENABLED
+    c.execute("SELECT 1 FROM sqlite_master WHERE name='smartling_translations_fts'")
+    exists = c.fetchone() is not None
+    try:
+        c.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS smartling_translations_fts USING fts5(
+            parsed_string_text, translation, content='smartling_translations', content_rowid='id', tokenize='trigram')""")
+    except sqlite3.OperationalError as e:
+        # needs SQLite >= 3.34 built with FTS5; search falls back to LIKE
+        print("[DB] full-text search unavailable:", e)
+        return
+    c.execute("""CREATE TRIGGER IF NOT EXISTS smartling_translations_fts_ai AFTER INSERT ON smartling_translations BEGIN
+        INSERT INTO smartling_translations_fts (rowid, parsed_string_text, translation) VALUES (new.id, new.parsed_string_text, new.translation);
+    END""")
+    c.execute("""CREATE TRIGGER IF NOT EXISTS smartling_translations_fts_ad AFTER DELETE ON smartling_translations BEGIN
+        INSERT INTO smartling_translations_fts (smartling_translations_fts, rowid, parsed_string_text, translation) VALUES ('delete', old.id, old.parsed_string_text, old.translation);
+    END""")
+    c.execute("""CREATE TRIGGER IF NOT EXISTS smartling_translations_fts_au AFTER UPDATE OF parsed_string_text, translation ON smartling_translations BEGIN
+        INSERT INTO smartling_translations_fts (smartling_translations_fts, rowid, parsed_string_text, translation) VALUES ('delete', old.id, old.parsed_string_text, old.translation);
+        INSERT INTO smartling_translations_fts (rowid, parsed_string_text, translation) VALUES (new.id, new.parsed_string_text, new.translation);
+    END""")
+    if not exists:
+        c.execute("INSERT INTO smartling_translations_fts (smartling_translations_fts) VALUES ('rebuild')")
+    FTS_ENABLED = True
 
 def init_db():
     #sql sql sql dance
@@ -23,6 +295,7 @@ def init_db():
         open(DB_PATH, 'a').close()
     with sqlite3.connect(DB_PATH) as conn:
         c = conn.cursor()
+        c.execute("PRAGMA journal_mode=WAL")
         c.execute('''CREATE TABLE IF NOT EXISTS strings (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             source TEXT NOT NULL,
@@ -66,12 +339,166 @@ def init_db():
             confidence REAL,
             reason TEXT,
             flag INTEGER,
-            hashcode TEXT UNIQUE
+            hashcode TEXT
+        )''')
+        # hashcode used to be globally UNIQUE, which clashes across locales; rebuild old tables so
+        # uniqueness is per (project_id, locale, hashcode) instead
+        c.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name='smartling_translations'")
+        if "hashcode TEXT UNIQUE" in c.fetchone()[0]:
+            c.execute("ALTER TABLE smartling_translations RENAME TO smartling_translations_old")
+            c.execute('''CREATE TABLE smartling_translations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                project_id TEXT NOT NULL,
+                file_uri TEXT NOT NULL,
+                locale TEXT NOT NULL,
+                parsed_string_text TEXT,
+                translation TEXT,
+                status TEXT NOT NULL DEFAULT 'pending',
+                confidence REAL,
+                reason TEXT,
+                flag INTEGER,
+                hashcode TEXT
+            )''')
+            c.execute("INSERT INTO smartling_translations SELECT id, project_id, file_uri, locale, parsed_string_text, translation, status, confidence, reason, flag, hashcode FROM smartling_translations_old")
+            c.execute("DROP TABLE smartling_translations_old")
+        c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_smartling_translations_key ON smartling_translations (project_id, locale, hashcode)")
+        # flag_rule: comma separated rules that flagged the row; flag_checked: 0 until the rules have seen its current text
+        c.execute("PRAGMA table_info(smartling_translations)")
+        columns = [row[1] for row in c.fetchall()]
+        if "flag_rule" not in columns:
+            c.execute("ALTER TABLE smartling_translations ADD COLUMN flag_rule TEXT")
+        if "flag_checked" not in columns:
+            c.execute("ALTER TABLE smartling_translations ADD COLUMN flag_checked INTEGER NOT NULL DEFAULT 0")
+        # flag_manual: the flag was set or cleared by hand, so the rules leave it alone
+        if "flag_manual" not in columns:
+            c.execute("ALTER TABLE smartling_translations ADD COLUMN flag_manual INTEGER NOT NULL DEFAULT 0")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_smartling_translations_unchecked ON smartling_translations (project_id, locale, id) WHERE flag_checked=0")
+        # tm_key: fingerprint of the normalized source/translation pair, NULL until the translation memory has indexed the current text
+        if "tm_key" not in columns:
+            c.execute("ALTER TABLE smartling_translations ADD COLUMN tm_key TEXT")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_smartling_translations_tm ON smartling_translations (tm_key, project_id, locale)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_smartling_translations_tm_unindexed ON smartling_translations (project_id, locale, id) WHERE tm_key IS NULL")
+        # confidence_source: 'model', or 'prescreen' for a provisional heuristic score
+        if "confidence_source" not in columns:
+            c.execute("ALTER TABLE smartling_translations ADD COLUMN confidence_source TEXT")
+        # MinHash signature per distinct tm_key, and its LSH band buckets for near-duplicate lookups
+        c.execute('''CREATE TABLE IF NOT EXISTS smartling_tm_signatures (
+            project_id TEXT NOT NULL,
+            locale TEXT NOT NULL,
+            tm_key TEXT NOT NULL,
+            signature BLOB NOT NULL,
+            PRIMARY KEY (project_id, locale, tm_key)
+        )''')
+        c.execute('''CREATE TABLE IF NOT EXISTS smartling_tm_bands (
+            project_id TEXT NOT NULL,
+            locale TEXT NOT NULL,
+            band INTEGER NOT NULL,
+            bucket INTEGER NOT NULL,
+            tm_key TEXT NOT NULL
         )''')
+        c.execute("CREATE INDEX IF NOT EXISTS idx_smartling_tm_bands_bucket ON smartling_tm_bands (project_id, locale, band, bucket)")
+        c.execute("SELECT 1 FROM sqlite_master WHERE type='index' AND name='idx_smartling_tm_bands_key'")
+        if not c.fetchone():
+            # older indexes could hold the same band row more than once
+            c.execute("DELETE FROM smartling_tm_bands WHERE rowid NOT IN (SELECT MIN(rowid) FROM smartling_tm_bands GROUP BY project_id, locale, tm_key, band)")
+            c.execute("CREATE UNIQUE INDEX idx_smartling_tm_bands_key ON smartling_tm_bands (project_id, locale, tm_key, band)")
+        # table view filters, each ending in id so keyset pages (id > after_id ORDER BY id) come straight off the index
+        c.execute("CREATE INDEX IF NOT EXISTS idx_smartling_translations_page ON smartling_translations (project_id, locale, id)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_smartling_translations_status_flag ON smartling_translations (project_id, locale, status, flag, id)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_smartling_translations_status ON smartling_translations (project_id, locale, status, id)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_smartling_translations_flag ON smartling_translations (project_id, locale, flag, id)")
+        init_translation_search(c)
+        # INSERT OR IGNORE only dedups with a unique constraint; drop duplicates left by older syncs first
+        c.execute("DELETE FROM smartling_job_files WHERE id NOT IN (SELECT MIN(id) FROM smartling_job_files GROUP BY project_id, job_id, file_uri)")
+        c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_smartling_job_files_key ON smartling_job_files (project_id, job_id, file_uri)")
         c.execute('''CREATE TABLE IF NOT EXISTS settings (
             key TEXT PRIMARY KEY,
             value TEXT
         )''')
+        c.execute('''CREATE TABLE IF NOT EXISTS eval_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            project_id TEXT NOT NULL,
+            locale TEXT NOT NULL,
+            status_filter TEXT,
+            flag_filter INTEGER,
+            missing_confidence INTEGER NOT NULL DEFAULT 1,
+            state TEXT NOT NULL DEFAULT 'queued',
+            last_id INTEGER NOT NULL DEFAULT 0,
+            processed INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            total INTEGER,
+            elapsed_seconds REAL NOT NULL DEFAULT 0,
+            error TEXT,
+            created_at INTEGER,
+            updated_at INTEGER
+        )''')
+        c.execute("PRAGMA table_info(eval_jobs)")
+        eval_job_columns = [row[1] for row in c.fetchall()]
+        if "prescreened" not in eval_job_columns:
+            c.execute("ALTER TABLE eval_jobs ADD COLUMN prescreened INTEGER NOT NULL DEFAULT 0")
+        if "scored" not in eval_job_columns:
+            c.execute("ALTER TABLE eval_jobs ADD COLUMN scored INTEGER NOT NULL DEFAULT 0")
+        c.execute('''CREATE TABLE IF NOT EXISTS glossary_terms (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            locale TEXT NOT NULL,
+            source_term TEXT NOT NULL,
+            target_term TEXT NOT NULL
+        )''')
+        c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_glossary_terms_key ON glossary_terms (locale, source_term, target_term)")
+        c.execute('''CREATE TABLE IF NOT EXISTS smartling_sync_checkpoints (
+            project_id TEXT NOT NULL,
+            locale TEXT NOT NULL DEFAULT '',
+            kind TEXT NOT NULL,
+            item_key TEXT NOT NULL,
+            last_modified TEXT,
+            string_count INTEGER,
+            synced_at INTEGER,
+            PRIMARY KEY (project_id, locale, kind, item_key)
+        )''')
+        # source strings + translations pulled straight from the strings API (/admin/smartling-strings)
+        c.execute('''CREATE TABLE IF NOT EXISTS smartling_strings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            project_id TEXT NOT NULL,
+            locale TEXT NOT NULL,
+            hashcode TEXT NOT NULL,
+            string_text TEXT,
+            translation TEXT,
+            synced_at INTEGER
+        )''')
+        c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_smartling_strings_key ON smartling_strings (project_id, locale, hashcode)")
+        # background sync jobs (job files, translations, flagging) and their periodic schedules
+        c.execute('''CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            params TEXT NOT NULL,
+            state TEXT NOT NULL DEFAULT 'queued',
+            progress TEXT,
+            result TEXT,
+            error TEXT,
+            schedule_id INTEGER,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            created_at INTEGER,
+            started_at INTEGER,
+            finished_at INTEGER,
+            seconds REAL
+        )''')
+        c.execute("CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state, id)")
+        c.execute('''CREATE TABLE IF NOT EXISTS job_schedules (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            params TEXT NOT NULL,
+            interval_seconds INTEGER NOT NULL,
+            enabled INTEGER NOT NULL DEFAULT 1,
+            next_run_at INTEGER,
+            last_job_id INTEGER,
+            created_at INTEGER
+        )''')
+        c.execute('''CREATE TABLE IF NOT EXISTS eval_cache (
+            cache_key TEXT PRIMARY KEY,
+            score INTEGER NOT NULL,
+            reason TEXT,
+            created_at INTEGER
+        )''')
     c.execute('''CREATE TABLE IF NOT EXISTS smartling_job_files (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         job_id TEXT NOT NULL,
@@ -84,6 +511,9 @@ init_db()
 class TranslationEvalRequest(BaseModel):
     source: str
     translation: str
+    locale: str = "ja-JP"
+    project_id: Optional[str] = None
+    force_model: bool = False
 
 class TranslationEvalResponse(BaseModel):
     score: int
@@ -104,39 +534,156 @@ class EvaluationRequest(BaseModel):
 MODEL_PATH = "microsoft/Phi-4-mini-instruct"
 
 def get_setting(key: str, default=None):
-    with sqlite3.connect(DB_PATH) as conn:
+    with db().read() as conn:
         c = conn.cursor()
         c.execute("SELECT value FROM settings WHERE key=?", (key,))
         row = c.fetchone()
         return row[0] if row else default
 
 def set_setting(key: str, value: str):
-    with sqlite3.connect(DB_PATH) as conn:
+    with db().write() as conn:
         c = conn.cursor()
         c.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, value))
         conn.commit()
 
-# --- Model download flag logic ---
-MODEL_DOWNLOAD_FLAG = get_setting('download_model', 'false') == 'true'
+INFERENCE_PRECISIONS = ("auto", "float32", "bfloat16", "int8")
+
+def model_memory_bytes(model):
+    """Parameter and buffer bytes, plus the int8 weights that dynamic quantization keeps in packed params."""
+    total = model.get_memory_footprint()
+    for module in model.modules():
+        # quantized Linear modules hold weight and bias outside parameters(), so get_memory_footprint() misses them
+        if hasattr(module, "_weight_bias"):
+            weight, bias = module._weight_bias()
+            total += weight.numel() * weight.element_size()
+            if bias is not None:
+                total += bias.numel() * bias.element_size()
+    return total
 
-if MODEL_DOWNLOAD_FLAG:
+def load_model(precision: str = "auto"):
+    """Load MODEL_PATH at the given inference precision and return (model, tokenizer)."""
     torch.random.manual_seed(0)
-    model = AutoModelForCausalLM.from_pretrained(
-        MODEL_PATH,
-        device_map="auto",
-        torch_dtype="auto",
-        trust_remote_code=False,
-    )
+    if precision == "int8":
+        # dynamic int8 quantization of the linear layers; CPU only and needs float32 weights to start from
+        model = AutoModelForCausalLM.from_pretrained(
+            MODEL_PATH,
+            device_map="cpu",
+            torch_dtype=torch.float32,
+            trust_remote_code=False,
+        )
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    else:
+        model = AutoModelForCausalLM.from_pretrained(
+            MODEL_PATH,
+            device_map="auto",
+            torch_dtype="auto" if precision == "auto" else getattr(torch, precision),
+            trust_remote_code=False,
+        )
     tokenizer = AutoTokenizer.from_pretrained(MODEL_PATH)
-    pipe = pipeline(
-        "text-generation",
-        model=model,
-        tokenizer=tokenizer,
-    )
-else:
-    model = None
-    tokenizer = None
-    pipe = None
+    # batched generation needs a pad token and left padding for a decoder-only model
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    tokenizer.padding_side = "left"
+    return model, tokenizer
+
+# --- Model lifecycle ---
+# The model is loaded in a background thread (at startup or on first demand) so uvicorn comes up
+# immediately, and can be loaded/unloaded at runtime through the download_model flag.
+class ModelManager:
+    def __init__(self):
+        self.state = "unloaded"  # unloaded | loading | ready | failed
+        self.model = None
+        self.tokenizer = None
+        self.pipe = None
+        self.error = None
+        self.load_seconds = None
+        self.loaded_at = None
+        self.precision = get_setting('inference_precision', 'auto')
+        self.loaded_precision = None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    def load_async(self):
+        with self._lock:
+            if self.state in ("loading", "ready"):
+                return
+            self.state = "loading"
+            self.error = None
+            self._done.clear()
+        threading.Thread(target=self._load, name="model-loader", daemon=True).start()
+
+    def _load(self, require_flag: bool = True):
+        started = time.perf_counter()
+        try:
+            precision = self.precision
+            model, tokenizer = load_model(precision)
+            pipe = pipeline(
+                "text-generation",
+                model=model,
+                tokenizer=tokenizer,
+            )
+            if require_flag and get_setting('download_model', 'false') != 'true':
+                # flag was switched off while we were loading
+                with self._lock:
+                    self.state = "unloaded"
+                return
+            with self._lock:
+                self.model, self.tokenizer, self.pipe = model, tokenizer, pipe
+                self.loaded_precision = precision
+                self.load_seconds = round(time.perf_counter() - started, 2)
+                self.loaded_at = int(time.time())
+                self.state = "ready"
+            print(f"[Model] {MODEL_PATH} ({precision}) loaded in {self.load_seconds}s")
+        except Exception as e:
+            print("[Model Load Error]", e)
+            traceback.print_exc()
+            with self._lock:
+                self.state = "failed"
+                self.error = str(e)
+        finally:
+            self._done.set()
+
+    def unload(self):
+        with self._lock:
+            if self.state == "loading":
+                return False
+            self.model = self.tokenizer = self.pipe = None
+            self.loaded_precision = None
+            prompt_prefix_cache.clear()
+            self.state = "unloaded"
+            self.load_seconds = None
+            self.loaded_at = None
+        import gc; gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        return True
+
+    def wait_until_ready(self, timeout=None):
+        """Start loading on first demand if the flag is on, then wait for it. Returns the pipeline or None."""
+        if self.state in ("unloaded", "failed") and get_setting('download_model', 'false') == 'true':
+            self.load_async()
+        if self.state == "loading":
+            self._done.wait(timeout)
+        return self.pipe if self.state == "ready" else None
+
+    def status(self):
+        import resource
+        model = self.model
+        return {
+            "model_path": MODEL_PATH,
+            "state": self.state,
+            "download_model": get_setting('download_model', 'false') == 'true',
+            "error": self.error,
+            "precision": self.precision,
+            "loaded_precision": self.loaded_precision,
+            "load_seconds": self.load_seconds,
+            "loaded_at": self.loaded_at,
+            "model_memory_mb": round(model_memory_bytes(model) / 1024 / 1024, 1) if model is not None else None,
+            "device": str(model.device) if model is not None else None,
+            "process_peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        }
+
+model_manager = ModelManager()
 
 generation_args = {
     "max_new_tokens": 500,
@@ -145,54 +692,936 @@ generation_args = {
     "do_sample": False,
 }
 
+EVAL_DECODING_MODES = ("json_stop", "full")
+
+class JsonObjectStoppingCriteria(StoppingCriteria):
+    """Finishes each sequence in the batch as soon as it has emitted one complete top-level JSON object.
+
+    Tracking starts at the first '{' followed by '"' or '}', so braces and quotes in prose before
+    the object (e.g. "use {count} here") don't count.
+    """
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+        self._length = None
+        self._rows = []
+
+    def __call__(self, input_ids, scores, **kwargs):
+        # a new generate() call (or a different batch) starts from a fresh state
+        if self._length is None or input_ids.shape[1] != self._length + 1 or len(self._rows) != input_ids.shape[0]:
+            self._rows = [{"depth": 0, "opening": False, "in_string": False, "escape": False, "done": False} for _ in range(input_ids.shape[0])]
+        self._length = input_ids.shape[1]
+        for state, text in zip(self._rows, self.tokenizer.batch_decode(input_ids[:, -1:])):
+            if not state["done"]:
+                self._feed(state, text)
+        return torch.tensor([state["done"] for state in self._rows], dtype=torch.bool, device=input_ids.device)
+
+    @staticmethod
+    def _feed(state, text):
+        for ch in text:
+            if state["opening"]:
+                # a '{' at top level only starts the object if a key (or the closing brace) follows
+                if ch.isspace():
+                    continue
+                state["opening"] = False
+                if ch in '"}':
+                    state["depth"] = 1
+            if state["depth"] == 0:
+                state["opening"] = ch == "{"
+                continue
+            if state["in_string"]:
+                if state["escape"]:
+                    state["escape"] = False
+                elif ch == "\\":
+                    state["escape"] = True
+                elif ch == '"':
+                    state["in_string"] = False
+            elif ch == '"':
+                state["in_string"] = True
+            elif ch == "{":
+                state["depth"] += 1
+            elif ch == "}":
+                state["depth"] -= 1
+                if state["depth"] == 0:
+                    state["done"] = True
+                    return
+
+class FirstTokenTimer(StoppingCriteria):
+    """Never stops generation; notes when the first token came out so prefill and decode can be timed apart."""
+    def __init__(self):
+        self.first_token_at = None
+
+    def __call__(self, input_ids, scores, **kwargs):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        return torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+
+def eval_stopping_criteria(tokenizer, decoding_mode: str):
+    if decoding_mode == "json_stop":
+        return StoppingCriteriaList([JsonObjectStoppingCriteria(tokenizer)])
+    return None
+
+class PromptPrefixCache:
+    """Key/value cache for the constant system-prompt prefix, computed once and shared across calls.
+
+    Rebuilt whenever the model or the rendered prefix text changes.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._key = None
+        self._ids = None
+        self._past = None
+        self.stats = {"builds": 0, "reused_tokens": 0}
+
+    def get(self, model, tokenizer, system_message):
+        """Returns (prefix_text, prefix_ids, past_key_values) or None if the chat template can't be split."""
+        text = tokenizer.apply_chat_template([system_message], tokenize=False)
+        key = (id(model), text)
+        with self._lock:
+            if self._key != key:
+                ids = tokenizer(text, add_special_tokens=False)["input_ids"]
+                with torch.no_grad():
+                    past = model(input_ids=torch.tensor([ids], device=model.device), use_cache=True).past_key_values
+                self._key, self._ids, self._past = key, ids, past
+                self.stats["builds"] += 1
+            return text, self._ids, self._past
+
+    def clear(self):
+        with self._lock:
+            self._key = self._ids = self._past = None
+
+prompt_prefix_cache = PromptPrefixCache()
+
+def build_prefixed_batch(tokenizer, prefix_ids, suffixes, device):
+    # prefix + padding + suffix: the padding sits between the shared prefix and each row's own tokens,
+    # so every row can start from the same cached prefix and positions stay what they'd be unpadded
+    width = max(len(ids) for ids in suffixes)
+    rows, masks = [], []
+    for ids in suffixes:
+        pad = width - len(ids)
+        rows.append(prefix_ids + [tokenizer.pad_token_id] * pad + ids)
+        masks.append([1] * len(prefix_ids) + [0] * pad + [1] * len(ids))
+    return {"input_ids": torch.tensor(rows, device=device), "attention_mask": torch.tensor(masks, device=device)}
+
+def generate_eval_batch(model, tokenizer, messages_list, decoding_mode: str = "json_stop", use_prefix_cache: bool = True, streamer=None):
+    """Run chat prompts through model.generate as one padded batch (a streamer needs a batch of one).
+
+    Returns (texts, generated_token_counts, prompt_token_count, timings).
+    """
+    prompts = [tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True) for messages in messages_list]
+    prefix = None
+    if use_prefix_cache and all(messages[0] == messages_list[0][0] and messages[0]["role"] == "system" for messages in messages_list):
+        prefix = prompt_prefix_cache.get(model, tokenizer, messages_list[0][0])
+        if not all(prompt.startswith(prefix[0]) for prompt in prompts):
+            prefix = None
+    generate_kwargs = {"streamer": streamer} if streamer is not None else {}
+    if prefix is not None:
+        prefix_text, prefix_ids, past = prefix
+        suffixes = [tokenizer(prompt[len(prefix_text):], add_special_tokens=False)["input_ids"] for prompt in prompts]
+        inputs = build_prefixed_batch(tokenizer, prefix_ids, suffixes, model.device)
+        past = copy.deepcopy(past)
+        if len(prompts) > 1:
+            past.batch_repeat_interleave(len(prompts))
+        generate_kwargs["past_key_values"] = past
+        prompt_prefix_cache.stats["reused_tokens"] += len(prefix_ids) * len(prompts)
+    else:
+        inputs = tokenizer(prompts, return_tensors="pt", padding=True, add_special_tokens=False).to(model.device)
+    timer = FirstTokenTimer()
+    stopping_criteria = eval_stopping_criteria(tokenizer, decoding_mode) or StoppingCriteriaList()
+    stopping_criteria.append(timer)
+    started = time.perf_counter()
+    with torch.no_grad():
+        output = model.generate(
+            **inputs,
+            **generate_kwargs,
+            max_new_tokens=generation_args["max_new_tokens"],
+            do_sample=generation_args["do_sample"],
+            pad_token_id=tokenizer.pad_token_id,
+            stopping_criteria=stopping_criteria,
+        )
+    finished = time.perf_counter()
+    first_token_at = timer.first_token_at or finished
+    timings = {"prefill_seconds": first_token_at - started, "decode_seconds": finished - first_token_at}
+    generated = output[:, inputs["input_ids"].shape[1]:]
+    texts = tokenizer.batch_decode(generated, skip_special_tokens=True)
+    token_counts = (generated != tokenizer.pad_token_id).sum(dim=1).tolist()
+    return texts, token_counts, int(inputs["attention_mask"].sum()), timings
+
+# --- Batched evaluation engine ---
+# Requests from concurrent reviewers are queued and run through the model together
+# as one padded batch instead of serializing on the model one call at a time.
+class EvaluationEngine:
+    def __init__(self, max_batch_size: int = 8, max_wait_ms: int = 25, decoding_mode: str = "json_stop", prefix_cache: bool = True):
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.decoding_mode = decoding_mode
+        self.prefix_cache = prefix_cache
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.stats = {"requests": 0, "batches": 0, "largest_batch": 0, "errors": 0, "busy_seconds": 0.0, "prefill_seconds": 0.0, "decode_seconds": 0.0, "prompt_tokens": 0, "generated_tokens": 0, "last_generated_tokens": []}
+
+    def submit(self, messages, streamer=None) -> concurrent.futures.Future:
+        """Queue one chat prompt; the future resolves to the raw generated text.
+
+        With a transformers streamer the request runs as a batch of its own and tokens are pushed
+        to the streamer as they are generated.
+        """
+        future = concurrent.futures.Future()
+        self._ensure_worker()
+        self._queue.put((messages, future, streamer))
+        return future
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    # lifecycle; the in-process engine runs on this process's model_manager
+    @property
+    def state(self):
+        return model_manager.state
+
+    @property
+    def error(self):
+        return model_manager.error
+
+    @property
+    def loaded_precision(self):
+        return model_manager.loaded_precision
+
+    def wait_until_ready(self, timeout=None) -> bool:
+        return model_manager.wait_until_ready(timeout) is not None
+
+    def load(self):
+        model_manager.load_async()
+
+    def unload(self):
+        model_manager.unload()
+
+    def _ensure_worker(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._worker, name="eval-engine", daemon=True)
+                self._thread.start()
+
+    def _next_batch(self):
+        # block for the first request, then keep collecting until the batch is full or max_wait_ms is up
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _worker(self):
+        while True:
+            items = [item for item in self._next_batch() if item[1].set_running_or_notify_cancel()]
+            plain = [(messages, future) for messages, future, streamer in items if streamer is None]
+            if plain:
+                self._run_batch(plain)
+            # a streamer follows a single sequence
+            for messages, future, streamer in items:
+                if streamer is not None:
+                    self._run_batch([(messages, future)], streamer)
+
+    def _run_batch(self, batch, streamer=None):
+        started = time.perf_counter()
+        try:
+            model, tokenizer = model_manager.model, model_manager.tokenizer
+            if model is None:
+                raise RuntimeError(f"Model is not loaded (state: {model_manager.state})")
+            texts, token_counts, prompt_tokens, timings = generate_eval_batch(model, tokenizer, [messages for messages, _ in batch], self.decoding_mode, self.prefix_cache, streamer)
+        except Exception as e:
+            self.stats["errors"] += 1
+            for _, future in batch:
+                future.set_exception(e)
+            if streamer is not None:
+                streamer.end()
+            return
+        self.stats["prompt_tokens"] += prompt_tokens
+        self.stats["generated_tokens"] += sum(token_counts)
+        self.stats["last_generated_tokens"] = token_counts
+        self.stats["requests"] += len(batch)
+        self.stats["batches"] += 1
+        self.stats["largest_batch"] = max(self.stats["largest_batch"], len(batch))
+        self.stats["busy_seconds"] += time.perf_counter() - started
+        self.stats["prefill_seconds"] += timings["prefill_seconds"]
+        self.stats["decode_seconds"] += timings["decode_seconds"]
+        metrics.observe("eval_prefill_seconds", timings["prefill_seconds"])
+        metrics.observe("eval_decode_seconds", timings["decode_seconds"])
+        metrics.observe("eval_batch_size", len(batch))
+        for (_, future), text in zip(batch, texts):
+            future.set_result(text)
+
+# --- Evaluation worker processes ---
+# With eval_worker_processes > 0 the API process never loads the model. Each worker process loads
+# its own copy and runs an in-process EvaluationEngine, fed from a shared bounded request queue,
+# so inference and tokenization stay off the API's threadpool and GIL.
+def eval_worker_main(worker_index, requests, results, config):
+    global MODEL_PATH
+    MODEL_PATH = config["model_path"]
+    generation_args.update(config["generation_args"])
+    if config["threads"]:
+        torch.set_num_threads(config["threads"])
+    model_manager.precision = config["precision"]
+    model_manager._load(require_flag=False)
+    if model_manager.state != "ready":
+        results.put(("failed", worker_index, model_manager.error))
+        return
+    engine = EvaluationEngine(config["max_batch_size"], config["max_wait_ms"], config["decoding_mode"], config["prefix_cache"])
+    results.put(("ready", worker_index, {"pid": os.getpid(), "threads": torch.get_num_threads(), **model_manager.status()}))
+    # only pull as much work as this worker can batch, so idle workers get the rest
+    in_flight = threading.BoundedSemaphore(config["max_batch_size"] * 2)
+    while True:
+        in_flight.acquire()
+        item = requests.get()
+        if item is None:
+            in_flight.release()
+            break
+        request_id, messages = item
+
+        def done(future, request_id=request_id):
+            in_flight.release()
+            # the prefix cache lives in this process, so its counters travel with the engine stats
+            stats = {**engine.stats, "prefix_cache_builds": prompt_prefix_cache.stats["builds"], "prefix_tokens_reused": prompt_prefix_cache.stats["reused_tokens"]}
+            try:
+                results.put(("result", request_id, future.result(), None, worker_index, stats))
+            except Exception as e:
+                results.put(("result", request_id, None, str(e), worker_index, stats))
+
+        engine.submit(messages).add_done_callback(done)
+    # finish what was already pulled before reporting stopped
+    for _ in range(config["max_batch_size"] * 2):
+        in_flight.acquire()
+    results.put(("stopped", worker_index, None))
+
+class ProcessPoolEvaluationEngine:
+    def __init__(self, processes: int, threads: int = 0, queue_depth: int = 256, max_batch_size: int = 8, max_wait_ms: int = 25, decoding_mode: str = "json_stop", prefix_cache: bool = True):
+        self.processes = processes
+        self.threads = threads
+        self.max_queue_depth = queue_depth
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.decoding_mode = decoding_mode
+        self.prefix_cache = prefix_cache
+        self.loaded_precision = None
+        self._ctx = multiprocessing.get_context("spawn")
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        # request id -> future; touched by submitting threads, the collector thread and unload()
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._workers = []
+        self._worker_info = {}
+        self._worker_stats = {}
+        self._ready = threading.Event()
+        self._requests = None
+        self._results = None
+        self.errors = 0
+
+    @property
+    def state(self):
+        states = [info["state"] for info in self._worker_info.values()]
+        if not states:
+            return "unloaded"
+        if "ready" in states:
+            return "ready"
+        if "loading" in states:
+            return "loading"
+        return "failed"
+
+    @property
+    def error(self):
+        errors = [info.get("error") for info in self._worker_info.values() if info.get("error")]
+        return errors[0] if errors else None
+
+    @property
+    def stats(self):
+        totals = {"requests": 0, "batches": 0, "largest_batch": 0, "errors": self.errors, "busy_seconds": 0.0, "prefill_seconds": 0.0, "decode_seconds": 0.0, "prompt_tokens": 0, "generated_tokens": 0, "prefix_cache_builds": 0, "prefix_tokens_reused": 0}
+        for stats in list(self._worker_stats.values()):
+            for key in totals:
+                if key == "largest_batch":
+                    totals[key] = max(totals[key], stats.get(key, 0))
+                elif key != "errors":
+                    totals[key] += stats.get(key, 0)
+        return totals
+
+    def queue_depth(self) -> int:
+        try:
+            return self._requests.qsize() if self._requests is not None else 0
+        except NotImplementedError:
+            return -1
+
+    def load(self):
+        with self._lock:
+            if self._workers:
+                return
+            self._ready.clear()
+            self._requests = self._ctx.Queue(maxsize=self.max_queue_depth)
+            self._results = self._ctx.Queue()
+            config = {
+                "model_path": MODEL_PATH,
+                "precision": model_manager.precision,
+                "threads": self.threads,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_ms,
+                "decoding_mode": self.decoding_mode,
+                "prefix_cache": self.prefix_cache,
+                "generation_args": dict(generation_args),
+            }
+            self.loaded_precision = config["precision"]
+            for index in range(self.processes):
+                process = self._ctx.Process(target=eval_worker_main, args=(index, self._requests, self._results, config), name=f"eval-worker-{index}", daemon=True)
+                process.start()
+                self._workers.append(process)
+                self._worker_info[index] = {"state": "loading", "pid": process.pid}
+            threading.Thread(target=self._collect, args=(self._results, list(self._workers)), name="eval-pool-collector", daemon=True).start()
+
+    def unload(self, drain_timeout=60):
+        """Stop the workers. Requests already submitted get up to drain_timeout seconds to finish; the rest fail."""
+        with self._lock:
+            # submit() refuses new work from here on
+            workers, self._workers = self._workers, []
+            if self.state == "ready":
+                with self._pending_lock:
+                    in_flight = list(self._pending.values())
+                concurrent.futures.wait(in_flight, timeout=drain_timeout)
+            for _ in workers:
+                try:
+                    self._requests.put(None, timeout=5)
+                except queue.Full:
+                    break
+            for process in workers:
+                process.join(timeout=10)
+                if process.is_alive():
+                    process.terminate()
+            self._worker_info = {}
+            self._worker_stats = {}
+            self.loaded_precision = None
+            self._ready.clear()
+            self._fail_pending(RuntimeError("Evaluation workers were stopped"))
+
+    def wait_until_ready(self, timeout=None) -> bool:
+        if not self._workers and get_setting('download_model', 'false') == 'true':
+            self.load()
+        if self.state == "loading":
+            self._ready.wait(timeout)
+        return self.state == "ready"
+
+    def submit(self, messages) -> concurrent.futures.Future:
+        future = concurrent.futures.Future()
+        if not self._workers:
+            future.set_exception(RuntimeError("Evaluation workers are not running"))
+            return future
+        request_id = next(self._ids)
+        with self._pending_lock:
+            self._pending[request_id] = future
+        try:
+            # bounded queue: blocks the caller (backpressure) until a worker frees a slot
+            self._requests.put((request_id, messages), timeout=60)
+        except queue.Full:
+            with self._pending_lock:
+                self._pending.pop(request_id, None)
+            future.set_exception(RuntimeError("Evaluation queue is full"))
+        return future
+
+    def worker_status(self):
+        return [{"worker": index, **info} for index, info in sorted(self._worker_info.items())]
+
+    def _fail_pending(self, error):
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(error)
+
+    def _collect(self, results, workers):
+        while any(process.is_alive() for process in workers) or not results.empty():
+            try:
+                message = results.get(timeout=1)
+            except queue.Empty:
+                self._mark_dead_workers(workers)
+                continue
+            kind = message[0]
+            if kind == "result":
+                _, request_id, text, error, worker_index, stats = message
+                with self._pending_lock:
+                    future = self._pending.pop(request_id, None)
+                self._worker_stats[worker_index] = stats
+                if future is None or future.done():
+                    continue
+                if error is None:
+                    future.set_result(text)
+                else:
+                    self.errors += 1
+                    future.set_exception(RuntimeError(error))
+            elif kind == "ready":
+                self._worker_info[message[1]] = {"state": "ready", **message[2]}
+                self._ready.set()
+            elif kind == "failed":
+                self._worker_info[message[1]] = {"state": "failed", "error": message[2]}
+                print(f"[Eval Worker {message[1]}] failed to load: {message[2]}")
+                if self.state == "failed":
+                    self._ready.set()
+        if workers and self._workers == workers:
+            # every worker died without being asked to stop
+            self._mark_dead_workers(workers)
+            self._fail_pending(RuntimeError("Evaluation workers exited"))
+
+    def _mark_dead_workers(self, workers):
+        for index, process in enumerate(workers):
+            info = self._worker_info.get(index)
+            if info and info["state"] != "failed" and not process.is_alive() and self._workers == workers:
+                self._worker_info[index] = {"state": "failed", "error": f"worker exited with code {process.exitcode}"}
+                if self.state == "failed":
+                    self._ready.set()
+
+EVAL_WORKER_PROCESSES = int(get_setting('eval_worker_processes', '0'))
+
+if EVAL_WORKER_PROCESSES > 0:
+    eval_engine = ProcessPoolEvaluationEngine(
+        processes=EVAL_WORKER_PROCESSES,
+        threads=int(get_setting('eval_worker_threads', '0')),
+        queue_depth=int(get_setting('eval_queue_depth', '256')),
+        max_batch_size=int(get_setting('eval_max_batch_size', '8')),
+        max_wait_ms=int(get_setting('eval_max_wait_ms', '25')),
+        decoding_mode=get_setting('eval_decoding_mode', 'json_stop'),
+        prefix_cache=get_setting('eval_prefix_cache', 'true') == 'true',
+    )
+else:
+    eval_engine = EvaluationEngine(
+        max_batch_size=int(get_setting('eval_max_batch_size', '8')),
+        max_wait_ms=int(get_setting('eval_max_wait_ms', '25')),
+        decoding_mode=get_setting('eval_decoding_mode', 'json_stop'),
+        prefix_cache=get_setting('eval_prefix_cache', 'true') == 'true',
+    )
+
 
 
 app = FastAPI()
+
+# ?profile=1 returns a sampling profile of the request instead of its response. Dev only: set
+# REQUEST_PROFILING=1. Sampling (rather than cProfile) also sees sync handlers, which run on
+# threadpool threads, and the evaluation engine thread.
+REQUEST_PROFILING = os.environ.get("REQUEST_PROFILING") == "1"
+PROFILE_INTERVAL_SECONDS = 0.001
+PROFILE_IDLE_FILES = ("threading.py", "queue.py", "selectors.py", "base_events.py", os.path.join("futures", "thread.py"))
+
+def sample_threads(stop: threading.Event, samples: dict):
+    me = threading.get_ident()
+    while not stop.wait(PROFILE_INTERVAL_SECONDS):
+        for ident, frame in sys._current_frames().items():
+            if ident == me or frame.f_code.co_filename.endswith(PROFILE_IDLE_FILES):
+                continue
+            samples["total"] += 1
+            leaf = True
+            seen = set()
+            while frame is not None:
+                code = frame.f_code
+                key = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                if leaf:
+                    samples["self"][key] = samples["self"].get(key, 0) + 1
+                    leaf = False
+                if key not in seen:
+                    seen.add(key)
+                    samples["cumulative"][key] = samples["cumulative"].get(key, 0) + 1
+                frame = frame.f_back
+
+def format_profile(samples, seconds, status, top: int = 30) -> str:
+    lines = [f"{seconds * 1000:.1f}ms, response status {status}, {samples['total']} busy-thread samples every {PROFILE_INTERVAL_SECONDS * 1000:g}ms", ""]
+    for title, counts in (("cumulative", samples["cumulative"]), ("self", samples["self"])):
+        lines.append(f"top {top} by {title} samples:")
+        for key, count in sorted(counts.items(), key=lambda item: -item[1])[:top]:
+            lines.append(f"{count:8d} {100.0 * count / max(1, samples['total']):6.1f}%  {key}")
+        lines.append("")
+    return "\n".join(lines)
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    profile = REQUEST_PROFILING and request.query_params.get("profile") == "1"
+    if profile:
+        samples = {"total": 0, "self": {}, "cumulative": {}}
+        stop = threading.Event()
+        sampler = threading.Thread(target=sample_threads, args=(stop, samples), name="request-profiler", daemon=True)
+        sampler.start()
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        elapsed = time.perf_counter() - started
+        route = request.scope.get("route")
+        metrics.observe("http_request_duration_seconds", elapsed, {"method": request.method, "route": route.path if route else "unmatched", "status": str(status)})
+        if profile:
+            stop.set()
+            sampler.join()
+    if profile:
+        return Response(format_profile(samples, elapsed, status), media_type="text/plain")
+    return response
+
+@app.get("/metrics")
+def get_metrics():
+    stats = eval_engine.stats
+    for key in ("requests", "batches", "errors", "prompt_tokens", "generated_tokens"):
+        metrics.set(f"eval_engine_{key}_total", stats.get(key, 0))
+    metrics.set("eval_engine_busy_seconds_total", stats.get("busy_seconds", 0.0))
+    metrics.set("eval_engine_tokens_per_second", stats["generated_tokens"] / stats["busy_seconds"] if stats.get("busy_seconds") else 0.0)
+    metrics.set("eval_engine_queue_depth", eval_engine.queue_depth())
+    metrics.set("model_ready", 1 if eval_engine.state == "ready" else 0)
+    with db().read() as conn:
+        c = conn.cursor()
+        c.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state")
+        for state, count in c.fetchall():
+            metrics.set("sync_jobs", count, {"state": state})
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
 @app.post("/admin/smartling-toggle-status")
-async def smartling_toggle_status(data: dict = Body(...)):
+def smartling_toggle_status(data: dict = Body(...)):
     row_id = data.get("id")
     status = data.get("status")
     if row_id is None or status not in ("pending", "completed"):
         return JSONResponse(status_code=400, content={"success": False, "message": "Missing id or invalid status"})
-    with sqlite3.connect(DB_PATH) as conn:
+    with db().write() as conn:
         c = conn.cursor()
         c.execute("UPDATE smartling_translations SET status=? WHERE id=?", (status, row_id))
+        propagated = propagate_tm_completed(c, [row_id]) if status == "completed" else 0
         conn.commit()
-    return {"success": True}
+    invalidate_translation_counts()
+    return {"success": True, "propagated": propagated}
 
 @app.post("/admin/smartling-bulk-complete")
-async def smartling_bulk_complete(data: dict = Body(...)):
+def smartling_bulk_complete(data: dict = Body(...)):
     ids = data.get("ids")
     if not ids or not isinstance(ids, list):
         return JSONResponse(status_code=400, content={"success": False, "message": "Missing or invalid ids list"})
-    with sqlite3.connect(DB_PATH) as conn:
+    with db().write() as conn:
         c = conn.cursor()
         c.executemany("UPDATE smartling_translations SET status='completed' WHERE id=?", [(i,) for i in ids])
+        propagated = propagate_tm_completed(c, ids)
         conn.commit()
-    return {"success": True, "updated": len(ids)}
+    invalidate_translation_counts()
+    return {"success": True, "updated": len(ids), "propagated": propagated}
 
-async def refresh_smartling_token(refresh_token, user_id, secret, DB_PATH):
-    async with httpx.AsyncClient() as client:
-        res = await client.post(
-            "https://api.smartling.com/auth-api/v2/authenticate/refresh",
-            json={"refreshToken": refresh_token}
-        )
-        res.raise_for_status()
-        data = res.json()
-        new_access_token = data.get('response', {}).get('data', {}).get('accessToken')
-        new_refresh_token = data.get('response', {}).get('data', {}).get('refreshToken')
-        expires_in = data.get('response', {}).get('data', {}).get('expiresIn')
-        new_token_expires = int(time.time()) + int(expires_in) if expires_in else None
-        with sqlite3.connect(DB_PATH) as conn:
+# --- Smartling API client ---
+# One pooled (HTTP/2 when h2 is installed) httpx client for the app's lifetime, with the credentials and
+# access token cached in memory. Token refreshes are single-flight: concurrent requests that hit an
+# expired token wait on one refresh instead of each calling the auth API.
+SMARTLING_API_BASE = "https://api.smartling.com"
+SMARTLING_AUTH_MESSAGE = "No valid Smartling access token. Please authenticate again from the admin page."
+
+try:
+    import h2  # noqa: F401
+    SMARTLING_HTTP2 = True
+except ImportError:
+    SMARTLING_HTTP2 = False
+
+class SmartlingAuthError(Exception):
+    pass
+
+class SmartlingClient:
+    def __init__(self):
+        self._client = None
+        self._loop = None
+        self._refresh_lock = None
+        self._credentials = None
+        self.stats = {"requests": 0, "retries": 0, "token_refreshes": 0}
+
+    def http(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            if self._client is not None:
+                self._close_stale(self._client, self._loop)
+            # connections and locks belong to the event loop that created them
+            self._client = httpx.AsyncClient(
+                http2=SMARTLING_HTTP2,
+                timeout=60.0,
+                limits=httpx.Limits(max_connections=32, max_keepalive_connections=32),
+            )
+            self._loop = loop
+            self._refresh_lock = asyncio.Lock()
+        return self._client
+
+    @staticmethod
+    def _close_stale(client, loop):
+        """Close a client left behind by another event loop, so its pooled connections are released."""
+        if loop is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+            return
+
+        async def close_here():
+            try:
+                await client.aclose()
+            except RuntimeError:
+                # its loop is closed; the sockets are released but the transports can't be told
+                pass
+        asyncio.get_running_loop().create_task(close_here())
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def credentials(self):
+        """Latest smartling_keys row, read from SQLite once and then served from memory."""
+        if self._credentials is None:
+            with db().read() as conn:
+                c = conn.cursor()
+                c.execute("SELECT user_id, secret, project_id, account_id, access_token, refresh_token, token_expires FROM smartling_keys ORDER BY id DESC LIMIT 1")
+                row = c.fetchone()
+            if not row:
+                return None
+            self._credentials = dict(zip(("user_id", "secret", "project_id", "account_id", "access_token", "refresh_token", "token_expires"), row))
+        return self._credentials
+
+    def invalidate(self):
+        """Drop cached credentials; call after smartling_keys changes."""
+        self._credentials = None
+
+    def store_tokens(self, user_id, secret, access_token, refresh_token, expires_in):
+        token_expires = int(time.time()) + int(expires_in) if expires_in else None
+        with db().write() as conn:
+            c = conn.cursor()
+            c.execute("UPDATE smartling_keys SET access_token=?, refresh_token=?, token_expires=? WHERE user_id=? AND secret=?", (access_token, refresh_token, token_expires, user_id, secret))
+            conn.commit()
+        self.invalidate()
+        return token_expires
+
+    def _valid_token(self):
+        creds = self.credentials()
+        if not creds or not creds["access_token"]:
+            return None
+        # treat tokens about to expire as expired so long syncs don't fail mid-request
+        if creds["token_expires"] and time.time() >= creds["token_expires"] - 30:
+            return None
+        return creds["access_token"]
+
+    async def token(self, stale_token=None):
+        token = self._valid_token()
+        if token and token != stale_token:
+            return token
+        self.http()
+        async with self._refresh_lock:
+            # someone else may have refreshed while we waited for the lock
+            token = self._valid_token()
+            if token and token != stale_token:
+                return token
+            creds = self.credentials()
+            if not creds:
+                raise SmartlingAuthError("No Smartling credentials set")
+            if not creds["refresh_token"]:
+                raise SmartlingAuthError(SMARTLING_AUTH_MESSAGE)
+            res = await self.http().post(f"{SMARTLING_API_BASE}/auth-api/v2/authenticate/refresh", json={"refreshToken": creds["refresh_token"]})
+            if res.status_code in (400, 401):
+                raise SmartlingAuthError(SMARTLING_AUTH_MESSAGE)
+            res.raise_for_status()
+            data = res.json().get('response', {}).get('data', {})
+            self.stats["token_refreshes"] += 1
+            metrics.inc("smartling_token_refreshes_total")
+            await asyncio.to_thread(self.store_tokens, creds["user_id"], creds["secret"], data.get('accessToken'), data.get('refreshToken'), data.get('expiresIn'))
+            return data.get('accessToken')
+
+    async def request(self, method, path, params=None, json=None, stats=None, max_retries: int = 5):
+        """Authenticated request with one token refresh on 401 and backoff on 429 (honouring Retry-After), 5xx and network errors."""
+        url = path if path.startswith("http") else f"{SMARTLING_API_BASE}{path}"
+        endpoint = smartling_endpoint_label(url)
+        token = await self.token()
+        refreshed = False
+        for attempt in range(max_retries + 1):
+            self.stats["requests"] += 1
+            started = time.perf_counter()
+            try:
+                res = await self.http().request(method, url, headers={"Authorization": f"Bearer {token}"}, params=params, json=json)
+            except httpx.TransportError as e:
+                metrics.inc("smartling_requests_total", {"endpoint": endpoint, "status": type(e).__name__})
+                if attempt == max_retries:
+                    raise
+                delay = min(30.0, 0.5 * 2 ** attempt)
+                print(f"[Smartling] {type(e).__name__} on {url}, retrying in {delay}s")
+            else:
+                metrics.observe("smartling_request_duration_seconds", time.perf_counter() - started, {"endpoint": endpoint})
+                metrics.inc("smartling_requests_total", {"endpoint": endpoint, "status": str(res.status_code)})
+                if res.status_code == 401:
+                    if refreshed:
+                        raise SmartlingAuthError(SMARTLING_AUTH_MESSAGE)
+                    token = await self.token(stale_token=token)
+                    refreshed = True
+                    continue
+                if not (res.status_code == 429 or res.status_code >= 500) or attempt == max_retries:
+                    res.raise_for_status()
+                    return res
+                try:
+                    delay = float(res.headers.get("Retry-After"))
+                except (TypeError, ValueError):
+                    delay = min(30.0, 0.5 * 2 ** attempt)
+                print(f"[Smartling] {res.status_code} on {url}, retrying in {delay}s")
+            self.stats["retries"] += 1
+            metrics.inc("smartling_retries_total", {"endpoint": endpoint})
+            if stats is not None:
+                stats["retries"] = stats.get("retries", 0) + 1
+            await asyncio.sleep(delay)
+
+    async def get(self, path, params=None, stats=None):
+        return await self.request("GET", path, params=params, stats=stats)
+
+SMARTLING_ID_SEGMENT_RE = re.compile(r"/(projects|accounts|jobs|locales|files)/[^/]+")
+
+def smartling_endpoint_label(url: str) -> str:
+    """Request path with ids replaced, e.g. /jobs-api/v3/projects/{id}/jobs/{id}/files."""
+    return SMARTLING_ID_SEGMENT_RE.sub(r"/\1/{id}", httpx.URL(url).path)
+
+smartling = SmartlingClient()
+
+@app.on_event("shutdown")
+async def close_smartling_client():
+    await smartling.close()
+
+def smartling_error_response(label: str, e: Exception):
+    if isinstance(e, SmartlingAuthError):
+        return JSONResponse(status_code=401, content={"error": str(e)})
+    print(f"[{label}]", e)
+    traceback.print_exc()
+    return JSONResponse(status_code=500, content={"error": str(e)})
+
+# --- Flag rules ---
+# SQL rules are a WHERE condition run as one INSERT ... SELECT per chunk; Python rules get
+# (source, translation, locale) and run over rows streamed in id order. Both write their hits to a
+# temp table, and each chunk is applied with a handful of set-based UPDATEs.
+FLAG_SQL_RULES = {
+    "identical": "fold_text(parsed_string_text) = fold_text(translation)",
+}
+
+PRINTF_PLACEHOLDER_RE = re.compile(r"%(?:\d+\$)?[-+ 0#]*\d*(?:\.\d+)?[sdifuxXeEgGc@]")
+TEMPLATE_PLACEHOLDER_RE = re.compile(r"\{\{\s*[^{}]*?\s*\}\}|\$\{[^{}]*\}")
+VARIABLE_RE = re.compile(r"(?<![{$])\{\s*([A-Za-z_][\w.]*)\s*(?:,[^{}]*)?\}(?!\})")
+HTML_TAG_RE = re.compile(r"</?\s*([A-Za-z][\w-]*)[^>]*>")
+JAPANESE_RE = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uff66-\uff9f]")
+LATIN_WORD_RE = re.compile(r"[A-Za-z]{2,}")
+FLAG_LENGTH_RATIO = (0.15, 3.0)
+FLAG_LENGTH_MIN_SOURCE = 20
+
+MARKUP_RE = re.compile("|".join(pattern.pattern for pattern in (HTML_TAG_RE, TEMPLATE_PLACEHOLDER_RE, VARIABLE_RE, PRINTF_PLACEHOLDER_RE)))
+
+def strip_markup(text):
+    if "<" not in text and "{" not in text and "%" not in text:
+        return text
+    return MARKUP_RE.sub(" ", text)
+
+# each rule bails out on a plain substring test before touching a regex; most rows have no markup at all
+def placeholder_mismatch(source, translation, locale):
+    if "%" not in source and "%" not in translation and "{" not in source and "{" not in translation:
+        return False
+    return sorted(PRINTF_PLACEHOLDER_RE.findall(source) + [t.replace(" ", "") for t in TEMPLATE_PLACEHOLDER_RE.findall(source)]) != \
+        sorted(PRINTF_PLACEHOLDER_RE.findall(translation) + [t.replace(" ", "") for t in TEMPLATE_PLACEHOLDER_RE.findall(translation)])
+
+def variable_mismatch(source, translation, locale):
+    if "{" not in source and "{" not in translation:
+        return False
+    return sorted(VARIABLE_RE.findall(source)) != sorted(VARIABLE_RE.findall(translation))
+
+def html_tag_mismatch(source, translation, locale):
+    if "<" not in source and "<" not in translation:
+        return False
+    return sorted(tag.lower() for tag in HTML_TAG_RE.findall(source)) != sorted(tag.lower() for tag in HTML_TAG_RE.findall(translation))
+
+def length_ratio_outlier(source, translation, locale):
+    if len(source) < FLAG_LENGTH_MIN_SOURCE:
+        return False
+    source_text = strip_markup(source).strip()
+    if len(source_text) < FLAG_LENGTH_MIN_SOURCE:
+        return False
+    ratio = len(strip_markup(translation).strip()) / len(source_text)
+    return not (FLAG_LENGTH_RATIO[0] <= ratio <= FLAG_LENGTH_RATIO[1])
+
+def latin_only_japanese(source, translation, locale):
+    if not locale.lower().startswith("ja") or JAPANESE_RE.search(translation):
+        return False
+    text = strip_markup(translation)
+    return not JAPANESE_RE.search(text) and len(LATIN_WORD_RE.findall(text)) >= 2
+
+FLAG_PY_RULES = {
+    "placeholder_mismatch": placeholder_mismatch,
+    "variable_mismatch": variable_mismatch,
+    "html_tag_mismatch": html_tag_mismatch,
+    "length_ratio": length_ratio_outlier,
+    "latin_only": latin_only_japanese,
+}
+FLAG_RULES = list(FLAG_SQL_RULES) + list(FLAG_PY_RULES)
+FLAG_CHUNK_SIZE = 5000
+
+def enabled_flag_rules():
+    enabled = get_setting('flag_rules_enabled')
+    if enabled is None:
+        return FLAG_RULES
+    return [rule for rule in enabled.split(",") if rule in FLAG_RULES]
+
+def run_flag_rules(project_id, locale, full=False, progress=None):
+    """Run the enabled rules over the project's rows (only rows whose text changed since the last run unless full).
+
+    Rows flagged by a rule get flag=1 and flag_rule set; rule flags that no longer apply are cleared.
+    Flags set or dismissed by hand (flag_manual=1) are left alone.
+    """
+    progress = {} if progress is None else progress
+    rules = enabled_flag_rules()
+    sql_rules = [rule for rule in rules if rule in FLAG_SQL_RULES]
+    py_rules = [(rule, FLAG_PY_RULES[rule]) for rule in rules if rule in FLAG_PY_RULES]
+    progress.update({"full": full, "rules": rules, "checked": 0, "flagged": 0, "cleared": 0, "by_rule": {rule: 0 for rule in rules}})
+    started = time.perf_counter()
+    scope = "project_id=? AND locale=?" + ("" if full else " AND flag_checked=0")
+    last_id = 0
+    while True:
+        with db().read() as conn:
+            c = conn.cursor()
+            c.execute("SELECT id, parsed_string_text, translation, flag_manual FROM smartling_translations WHERE " + scope + " AND id>? ORDER BY id LIMIT ?", (project_id, locale, last_id, FLAG_CHUNK_SIZE))
+            rows = c.fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        checked = [(row[0],) for row in rows]
+        rows = [row for row in rows if not row[3]]
+        hits = []
+        for row_id, source, translation, _ in rows:
+            if not (source and translation):
+                continue
+            for rule, check in py_rules:
+                if check(source, translation, locale):
+                    hits.append((row_id, rule))
+        with db().write() as conn:
             c = conn.cursor()
-            c.execute("UPDATE smartling_keys SET access_token=?, refresh_token=?, token_expires=? WHERE user_id=? AND secret=?", (new_access_token, new_refresh_token, new_token_expires, user_id, secret))
+            c.execute("CREATE TEMP TABLE IF NOT EXISTS flag_chunk (id INTEGER PRIMARY KEY)")
+            c.execute("CREATE TEMP TABLE IF NOT EXISTS flag_hits (id INTEGER NOT NULL, rule TEXT NOT NULL)")
+            c.execute("DELETE FROM flag_chunk")
+            c.execute("DELETE FROM flag_hits")
+            c.executemany("INSERT INTO flag_chunk (id) VALUES (?)", [(row[0],) for row in rows])
+            c.executemany("INSERT INTO flag_hits (id, rule) VALUES (?, ?)", hits)
+            for rule in sql_rules:
+                c.execute(
+                    "INSERT INTO flag_hits (id, rule) SELECT id, ? FROM smartling_translations WHERE id IN (SELECT id FROM flag_chunk) AND parsed_string_text <> '' AND translation <> '' AND " + FLAG_SQL_RULES[rule],
+                    (rule,)
+                )
+            c.execute("SELECT rule, COUNT(*) FROM flag_hits GROUP BY rule")
+            for rule, count in c.fetchall():
+                progress["by_rule"][rule] += count
+            c.execute("UPDATE smartling_translations SET flag=0, flag_rule=NULL WHERE id IN (SELECT id FROM flag_chunk) AND flag_rule IS NOT NULL AND id NOT IN (SELECT id FROM flag_hits)")
+            progress["cleared"] += c.rowcount
+            c.execute("""
+                UPDATE smartling_translations SET flag=1, flag_rule=(SELECT group_concat(rule, ',') FROM flag_hits WHERE flag_hits.id=smartling_translations.id)
+                WHERE id IN (SELECT id FROM flag_hits)
+            """)
+            progress["flagged"] += c.rowcount
+            c.executemany("UPDATE smartling_translations SET flag_checked=1 WHERE id=?", checked)
             conn.commit()
-        return new_access_token, new_refresh_token, new_token_expires
+        progress["checked"] += len(checked)
+    progress["seconds"] = round(time.perf_counter() - started, 2)
+    invalidate_translation_counts(project_id)
+    return progress
 
 @app.post("/admin/flag-matching-strings")
-async def flag_matching_strings(project_id: str = Query(None), locale: str = Query("ja-JP")):
+def flag_matching_strings(project_id: str = Query(None), locale: str = Query("ja-JP"), full: bool = Query(False)):
     if not project_id:
-        with sqlite3.connect(DB_PATH) as conn:
+        with db().read() as conn:
             c = conn.cursor()
             c.execute("SELECT project_id FROM smartling_keys ORDER BY id DESC LIMIT 1")
             row = c.fetchone()
@@ -200,65 +1629,367 @@ async def flag_matching_strings(project_id: str = Query(None), locale: str = Que
                 project_id = row[0]
             else:
                 return JSONResponse(status_code=400, content={"success": False, "message": "No project_id found in database and none provided."})
-    with sqlite3.connect(DB_PATH) as conn:
+    result = run_flag_rules(project_id, locale, full=full)
+    return {"success": True, "message": f"Flagged {result['flagged']} of {result['checked']} checked rows for project_id {project_id}.", **result}
+
+@app.get("/admin/flag-rules")
+def get_flag_rules():
+    enabled = enabled_flag_rules()
+    return [{"rule": rule, "kind": "sql" if rule in FLAG_SQL_RULES else "python", "enabled": rule in enabled} for rule in FLAG_RULES]
+
+@app.post("/admin/flag-rules")
+def set_flag_rules(data: dict = Body(...)):
+    enabled = data.get("enabled")
+    if not isinstance(enabled, list) or any(rule not in FLAG_RULES for rule in enabled):
+        return JSONResponse(status_code=400, content={"error": f"enabled must be a list of rules from {', '.join(FLAG_RULES)}"})
+    set_setting('flag_rules_enabled', ",".join(enabled))
+    # the rule set changed, so every row needs checking again on the next run
+    with db().write() as conn:
         c = conn.cursor()
-        c.execute("SELECT id, parsed_string_text, translation FROM smartling_translations WHERE project_id=? AND locale=?", (project_id, locale))
-        rows = c.fetchall()
-        flagged = 0
-        for row in rows:
-            row_id, src, tgt = row
-            if src and tgt and src.strip().lower() == tgt.strip().lower():
-                c.execute("UPDATE smartling_translations SET flag=1 WHERE id=?", (row_id,))
-                flagged += 1
+        c.execute("UPDATE smartling_translations SET flag_checked=0")
         conn.commit()
-    return {"success": True, "message": f"Flagged {flagged} matching rows for project_id {project_id}."}
+    return get_flag_rules()
 
-# I hate cors
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# --- Translation memory ---
+# Rows whose source and translation match after normalization (NFKC, punctuation and whitespace
+# dropped, placeholders and numbers numbered by where they appear in the source) share a tm_key, and
+# evaluations and status changes carry over between them. Near-duplicates are found with MinHash
+# over character trigrams, bucketed into LSH bands so a lookup only compares candidates that share
+# a band; they are suggested, never changed automatically.
+TM_VALUE_RE = re.compile("|".join([TEMPLATE_PLACEHOLDER_RE.pattern, VARIABLE_RE.pattern, PRINTF_PLACEHOLDER_RE.pattern, r"\d+(?:[.,]\d+)*"]))
+TM_PUNCTUATION_RE = re.compile(r"[^\w\s\u00a7]")
+TM_SHINGLE_SIZE = 3
+TM_MINHASH_PERMUTATIONS = 32
+TM_LSH_BANDS = 8  # 4 rows per band: pairs around 0.6 Jaccard or better usually share a bucket
+# 31-bit hashes and prime keep a*h+b inside int64
+TM_MINHASH_PRIME = (1 << 31) - 1
+_tm_rng = random.Random(0)
+TM_MINHASH_A = torch.tensor([_tm_rng.randrange(1, TM_MINHASH_PRIME) for _ in range(TM_MINHASH_PERMUTATIONS)], dtype=torch.int64)
+TM_MINHASH_B = torch.tensor([_tm_rng.randrange(TM_MINHASH_PRIME) for _ in range(TM_MINHASH_PERMUTATIONS)], dtype=torch.int64)
+TM_MINHASH_BATCH = 1000
+TM_CHUNK_SIZE = 5000
+TM_MIN_SIMILARITY = 0.8
 
-@app.get("/strings", response_model=List[StringPair])
-def get_strings():
-    with sqlite3.connect(DB_PATH) as conn:
-        c = conn.cursor()
-        c.execute("SELECT id, source, japanese, confidence, reason, suggestion FROM strings")
-        rows = c.fetchall()
-        return [StringPair(id=row[0], source=row[1], japanese=row[2], confidence=row[3], reason=row[4], suggestion=row[5]) for row in rows]
+def tm_normalize(source, translation):
+    """Normalized (source, translation); a placeholder or number in the translation keeps its source position, so parity survives."""
+    values = {}
 
-@app.post("/strings", response_model=StringPair)
-def add_string(pair: StringPair):
-    with sqlite3.connect(DB_PATH) as conn:
-        c = conn.cursor()
-        c.execute("INSERT INTO strings (source, japanese) VALUES (?, ?)", (pair.source, pair.japanese))
-        conn.commit()
-        pair.id = c.lastrowid
-        return pair
-    
-# will implement someday...
-@app.post("/evaluate", response_model=StringPair)
-def evaluate_string(req: EvaluationRequest):
+    def source_value(match):
+        token = match.group(0).replace(" ", "")
+        return values.setdefault(token, f" \u00a7{len(values) + 1} ")
 
-    confidence = 0.85
-    reason = "Translation is mostly natural, but could be improved."
-    suggestion = "Use より自然な表現 here."
-    with sqlite3.connect(DB_PATH) as conn:
-        c = conn.cursor()
-        c.execute("""
-            UPDATE strings SET confidence=?, reason=?, suggestion=? WHERE id=?
-        """, (confidence, reason, suggestion, req.id))
-        conn.commit()
-    return StringPair(id=req.id, source=req.source, japanese=req.japanese, confidence=confidence, reason=reason, suggestion=suggestion)
+    def translation_value(match):
+        token = match.group(0).replace(" ", "")
+        return values.get(token, f" {token} ")
 
-@app.get("/admin/smartling-keys")
-def get_smartling_keys():
-    with sqlite3.connect(DB_PATH) as conn:
-        c = conn.cursor()
-        c.execute("SELECT user_id, secret, project_id, account_id, job_id, locale FROM smartling_keys ORDER BY id DESC LIMIT 1")
+    def normalize(text, value):
+        text = TM_VALUE_RE.sub(value, unicodedata.normalize("NFKC", text or ""))
+        return " ".join(TM_PUNCTUATION_RE.sub(" ", text).split())
+
+    normalized_source = normalize(source, source_value)
+    return normalized_source, normalize(translation, translation_value)
+
+def tm_key(source, translation):
+    return hashlib.sha1("\x1f".join(tm_normalize(source, translation)).encode("utf-8")).hexdigest()
+
+def tm_signatures(normalized_pairs):
+    """MinHash signatures for a list of normalized (source, translation) pairs, all permutations of a batch in one pass."""
+    signatures = []
+    for start in range(0, len(normalized_pairs), TM_MINHASH_BATCH):
+        batch = normalized_pairs[start:start + TM_MINHASH_BATCH]
+        hashes = []
+        owners = []
+        for owner, (normalized_source, normalized_translation) in enumerate(batch):
+            text = normalized_source + "\x1f" + normalized_translation
+            shingles = {text[i:i + TM_SHINGLE_SIZE] for i in range(max(1, len(text) - TM_SHINGLE_SIZE + 1))}
+            hashes.extend(zlib.crc32(shingle.encode("utf-8")) & TM_MINHASH_PRIME for shingle in shingles)
+            owners.extend([owner] * len(shingles))
+        hashes = torch.tensor(hashes, dtype=torch.int64)
+        owners = torch.tensor(owners, dtype=torch.int64).expand(TM_MINHASH_PERMUTATIONS, -1)
+        values = (TM_MINHASH_A[:, None] * hashes[None, :] + TM_MINHASH_B[:, None]) % TM_MINHASH_PRIME
+        minimums = torch.full((TM_MINHASH_PERMUTATIONS, len(batch)), TM_MINHASH_PRIME, dtype=torch.int64)
+        signatures.extend(minimums.scatter_reduce(1, owners, values, reduce="amin").T.tolist())
+    return signatures
+
+def tm_bands(signature):
+    rows = TM_MINHASH_PERMUTATIONS // TM_LSH_BANDS
+    return [(band, zlib.crc32(struct.pack(f"<{rows}Q", *signature[band * rows:(band + 1) * rows]))) for band in range(TM_LSH_BANDS)]
+
+def tm_similarity(signature, other):
+    return sum(a == b for a, b in zip(signature, other)) / TM_MINHASH_PERMUTATIONS
+
+def pack_tm_signature(signature):
+    return struct.pack(f"<{TM_MINHASH_PERMUTATIONS}Q", *signature)
+
+def unpack_tm_signature(blob):
+    return list(struct.unpack(f"<{TM_MINHASH_PERMUTATIONS}Q", blob))
+
+def index_translation_memory(project_id, locale, progress=None):
+    """Fingerprint rows whose text changed since the last run and add signatures for tm_keys not seen before."""
+    progress = {} if progress is None else progress
+    progress.update({"indexed": 0, "new_keys": 0})
+    started = time.perf_counter()
+    while True:
+        with db().read() as conn:
+            c = conn.cursor()
+            c.execute("SELECT id, parsed_string_text, translation FROM smartling_translations WHERE project_id=? AND locale=? AND tm_key IS NULL ORDER BY id LIMIT ?", (project_id, locale, TM_CHUNK_SIZE))
+            rows = c.fetchall()
+            keys = {}
+            key_by_text = {}
+            for row_id, source, translation in rows:
+                key = key_by_text.get((source, translation))
+                if key is None:
+                    normalized = tm_normalize(source, translation)
+                    key = key_by_text[(source, translation)] = hashlib.sha1("\x1f".join(normalized).encode("utf-8")).hexdigest()
+                    keys.setdefault(key, (normalized, []))
+                keys[key][1].append(row_id)
+            known = set()
+            key_list = list(keys)
+            for i in range(0, len(key_list), 500):
+                batch = key_list[i:i + 500]
+                c.execute("SELECT tm_key FROM smartling_tm_signatures WHERE project_id=? AND locale=? AND tm_key IN (%s)" % ",".join("?" * len(batch)), [project_id, locale] + batch)
+                known.update(row[0] for row in c.fetchall())
+        if not rows:
+            break
+        new_keys = [key for key in keys if key not in known]
+        signatures = []
+        bands = []
+        for key, signature in zip(new_keys, tm_signatures([keys[key][0] for key in new_keys])):
+            signatures.append((project_id, locale, key, pack_tm_signature(signature)))
+            bands.extend((project_id, locale, band, bucket, key) for band, bucket in tm_bands(signature))
+        with db().write() as conn:
+            c = conn.cursor()
+            c.executemany("INSERT OR REPLACE INTO smartling_tm_signatures (project_id, locale, tm_key, signature) VALUES (?, ?, ?, ?)", signatures)
+            c.executemany("DELETE FROM smartling_tm_bands WHERE project_id=? AND locale=? AND tm_key=?", [row[:3] for row in signatures])
+            c.executemany("INSERT INTO smartling_tm_bands (project_id, locale, band, bucket, tm_key) VALUES (?, ?, ?, ?, ?)", bands)
+            c.executemany("UPDATE smartling_translations SET tm_key=? WHERE id=?", [(key, row_id) for key, (_, row_ids) in keys.items() for row_id in row_ids])
+            conn.commit()
+        progress["indexed"] += len(rows)
+        progress["new_keys"] += len(signatures)
+    if progress["indexed"]:
+        progress["pruned_keys"] = prune_translation_memory(project_id, locale)
+    progress["seconds"] = round(time.perf_counter() - started, 2)
+    return progress
+
+def prune_translation_memory(project_id, locale):
+    """Drop signatures and bands of tm_keys no row uses any more (the translation changed or the string was removed)."""
+    with db().write() as conn:
+        c = conn.cursor()
+        c.execute("""
+            DELETE FROM smartling_tm_signatures WHERE project_id=? AND locale=? AND NOT EXISTS (
+                SELECT 1 FROM smartling_translations t
+                WHERE t.tm_key=smartling_tm_signatures.tm_key AND t.project_id=smartling_tm_signatures.project_id AND t.locale=smartling_tm_signatures.locale
+            )
+        """, (project_id, locale))
+        pruned = c.rowcount
+        c.execute("""
+            DELETE FROM smartling_tm_bands WHERE project_id=? AND locale=? AND NOT EXISTS (
+                SELECT 1 FROM smartling_tm_signatures s
+                WHERE s.tm_key=smartling_tm_bands.tm_key AND s.project_id=smartling_tm_bands.project_id AND s.locale=smartling_tm_bands.locale
+            )
+        """, (project_id, locale))
+        conn.commit()
+    return pruned
+
+def propagate_tm_completed(c, ids):
+    """Complete pending rows with exactly the same source and translation as any of ids (same project and locale); returns how many changed.
+
+    tm_key only narrows the lookup: rows that differ in punctuation or placeholder values share the key but are not completed.
+    """
+    if get_setting('tm_propagate_status', 'true') != 'true':
+        return 0
+    c.executemany("""
+        UPDATE smartling_translations SET status='completed'
+        WHERE (tm_key, project_id, locale, parsed_string_text, translation) =
+            (SELECT tm_key, project_id, locale, parsed_string_text, translation FROM smartling_translations WHERE id=?)
+        AND status<>'completed'
+    """, [(row_id,) for row_id in ids])
+    return max(c.rowcount, 0)
+
+def tm_neighbours(c, project_id, locale, key, min_similarity):
+    """{tm_key: similarity} for indexed keys whose MinHash signature is at least min_similarity from key's."""
+    c.execute("SELECT signature FROM smartling_tm_signatures WHERE project_id=? AND locale=? AND tm_key=?", (project_id, locale, key))
+    row = c.fetchone()
+    if not row:
+        return {}
+    signature = unpack_tm_signature(row[0])
+    c.execute("""
+        SELECT DISTINCT s.tm_key, s.signature FROM smartling_tm_bands b
+        JOIN smartling_tm_bands other ON other.project_id=b.project_id AND other.locale=b.locale AND other.band=b.band AND other.bucket=b.bucket
+        JOIN smartling_tm_signatures s ON s.project_id=other.project_id AND s.locale=other.locale AND s.tm_key=other.tm_key
+        WHERE b.project_id=? AND b.locale=? AND b.tm_key=? AND other.tm_key<>b.tm_key
+    """, (project_id, locale, key))
+    neighbours = {}
+    for other_key, blob in c.fetchall():
+        similarity = tm_similarity(signature, unpack_tm_signature(blob))
+        if similarity >= min_similarity:
+            neighbours[other_key] = similarity
+    return neighbours
+
+TM_ROW_COLUMNS = "id, file_uri, parsed_string_text, translation, status, confidence, reason, tm_key"
+
+def tm_row(row, similarity=None):
+    result = dict(zip(("id", "file_uri", "parsed_string_text", "translation", "status", "confidence", "reason", "tm_key"), row))
+    if similarity is not None:
+        result["similarity"] = round(similarity, 3)
+    return result
+
+@app.post("/admin/translation-memory/index")
+def translation_memory_index(data: dict = Body(...)):
+    project_id = data.get("project_id")
+    if not project_id:
+        return JSONResponse(status_code=400, content={"error": "Missing project_id"})
+    return index_translation_memory(project_id, data.get("locale", "ja-JP"))
+
+@app.get("/admin/translation-memory/stats")
+def translation_memory_stats(project_id: str, locale: str = "ja-JP"):
+    """How much review the translation memory saves: rows vs distinct normalized pairs, overall and still unreviewed."""
+    with db().read() as conn:
+        c = conn.cursor()
+        c.execute("""
+            SELECT COUNT(*), COUNT(tm_key), COUNT(DISTINCT tm_key),
+                SUM(status<>'completed' AND confidence IS NULL),
+                COUNT(DISTINCT CASE WHEN status<>'completed' AND confidence IS NULL THEN tm_key END)
+            FROM smartling_translations WHERE project_id=? AND locale=?
+        """, (project_id, locale))
+        rows, indexed, keys, unreviewed, unreviewed_keys = c.fetchone()
+    return {
+        "rows": rows,
+        "indexed": indexed,
+        "distinct": keys,
+        "duplication_ratio": round(indexed / keys, 3) if keys else None,
+        "unreviewed_rows": unreviewed or 0,
+        "unreviewed_distinct": unreviewed_keys,
+    }
+
+@app.get("/admin/translation-memory/similar")
+def translation_memory_similar(id: int, min_similarity: float = TM_MIN_SIMILARITY, limit: int = 50):
+    """Rows identical to row id after normalization, and near-duplicates with their estimated similarity."""
+    with db().read() as conn:
+        c = conn.cursor()
+        c.execute("SELECT project_id, locale, tm_key FROM smartling_translations WHERE id=?", (id,))
+        row = c.fetchone()
+        if not row:
+            return JSONResponse(status_code=404, content={"error": "Row not found"})
+        project_id, locale, key = row
+        if key is None:
+            return JSONResponse(status_code=409, content={"error": "Row is not in the translation memory yet; run /admin/translation-memory/index"})
+        c.execute("SELECT " + TM_ROW_COLUMNS + " FROM smartling_translations WHERE tm_key=? AND project_id=? AND locale=? AND id<>? ORDER BY id LIMIT ?", (key, project_id, locale, id, limit))
+        identical = [tm_row(r) for r in c.fetchall()]
+        neighbours = tm_neighbours(c, project_id, locale, key, min_similarity)
+        similar = []
+        for other_key, similarity in sorted(neighbours.items(), key=lambda item: -item[1]):
+            if len(similar) >= limit:
+                break
+            c.execute("SELECT " + TM_ROW_COLUMNS + " FROM smartling_translations WHERE tm_key=? AND project_id=? AND locale=? ORDER BY id LIMIT ?", (other_key, project_id, locale, limit - len(similar)))
+            similar.extend(tm_row(r, similarity) for r in c.fetchall())
+    return {"id": id, "tm_key": key, "identical": identical, "similar": similar}
+
+@app.get("/admin/translation-memory/suggestions")
+def translation_memory_suggestions(project_id: str, locale: str = "ja-JP", min_similarity: float = TM_MIN_SIMILARITY, limit: int = 100):
+    """Unreviewed rows that are near-duplicates of a reviewed (completed or scored) row, best match first."""
+    reviewed_keys = "SELECT tm_key FROM smartling_translations WHERE project_id=? AND locale=? AND tm_key IS NOT NULL AND (status='completed' OR confidence IS NOT NULL)"
+    with db().read() as conn:
+        c = conn.cursor()
+        # candidate pairs share at least one LSH bucket; only those get their signatures compared
+        c.execute("""
+            SELECT DISTINCT reviewed.tm_key, other.tm_key FROM smartling_tm_bands reviewed
+            JOIN smartling_tm_bands other ON other.project_id=reviewed.project_id AND other.locale=reviewed.locale AND other.band=reviewed.band AND other.bucket=reviewed.bucket
+            WHERE reviewed.project_id=? AND reviewed.locale=? AND reviewed.tm_key IN (""" + reviewed_keys + """) AND other.tm_key NOT IN (""" + reviewed_keys + """)
+        """, (project_id, locale, project_id, locale, project_id, locale))
+        pairs = c.fetchall()
+        needed = list({key for pair in pairs for key in pair})
+        signatures = {}
+        for i in range(0, len(needed), 500):
+            batch = needed[i:i + 500]
+            c.execute("SELECT tm_key, signature FROM smartling_tm_signatures WHERE project_id=? AND locale=? AND tm_key IN (%s)" % ",".join("?" * len(batch)), [project_id, locale] + batch)
+            signatures.update((key, unpack_tm_signature(blob)) for key, blob in c.fetchall())
+        best = {}
+        for key, other_key in pairs:
+            if key not in signatures or other_key not in signatures:
+                continue
+            similarity = tm_similarity(signatures[key], signatures[other_key])
+            if similarity >= min_similarity and similarity > best.get(other_key, (0, None))[0]:
+                best[other_key] = (similarity, key)
+        suggestions = []
+        for other_key, (similarity, key) in sorted(best.items(), key=lambda item: -item[1][0]):
+            if len(suggestions) >= limit:
+                break
+            c.execute("SELECT " + TM_ROW_COLUMNS + " FROM smartling_translations WHERE tm_key=? AND project_id=? AND locale=? AND (status='completed' OR confidence IS NOT NULL) ORDER BY id LIMIT 1", (key, project_id, locale))
+            reference = tm_row(c.fetchone())
+            c.execute("SELECT " + TM_ROW_COLUMNS + " FROM smartling_translations WHERE tm_key=? AND project_id=? AND locale=? ORDER BY id LIMIT ?", (other_key, project_id, locale, limit - len(suggestions)))
+            suggestions.extend({"row": tm_row(r, similarity), "reference": reference} for r in c.fetchall())
+    return {"suggestions": suggestions, "candidate_pairs": len(pairs)}
+
+@app.post("/admin/translation-memory/apply")
+def translation_memory_apply(data: dict = Body(...)):
+    """Copy status, confidence, reason and confidence source from row id onto ids (accepted near-duplicate suggestions)."""
+    row_id = data.get("id")
+    ids = data.get("ids")
+    if row_id is None or not ids or not isinstance(ids, list):
+        return JSONResponse(status_code=400, content={"error": "Missing id or ids list"})
+    with db().write() as conn:
+        c = conn.cursor()
+        c.execute("SELECT status, confidence, reason, confidence_source, project_id FROM smartling_translations WHERE id=?", (row_id,))
+        row = c.fetchone()
+        if not row:
+            return JSONResponse(status_code=404, content={"error": "Row not found"})
+        # suggestions come from the same project, so only its cached counts change
+        c.executemany(
+            "UPDATE smartling_translations SET status=?, confidence=?, reason=?, confidence_source=? WHERE id=? AND project_id=?",
+            [(row[0], row[1], row[2], row[3], i, row[4]) for i in ids]
+        )
+        updated = c.rowcount
+        conn.commit()
+    invalidate_translation_counts(row[4])
+    return {"success": True, "updated": updated}
+
+# I hate cors
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+@app.get("/strings", response_model=List[StringPair])
+def get_strings():
+    with db().read() as conn:
+        c = conn.cursor()
+        c.execute("SELECT id, source, japanese, confidence, reason, suggestion FROM strings")
+        rows = c.fetchall()
+        return [StringPair(id=row[0], source=row[1], japanese=row[2], confidence=row[3], reason=row[4], suggestion=row[5]) for row in rows]
+
+@app.post("/strings", response_model=StringPair)
+def add_string(pair: StringPair):
+    with db().write() as conn:
+        c = conn.cursor()
+        c.execute("INSERT INTO strings (source, japanese) VALUES (?, ?)", (pair.source, pair.japanese))
+        conn.commit()
+        pair.id = c.lastrowid
+        return pair
+    
+# will implement someday...
+@app.post("/evaluate", response_model=StringPair)
+def evaluate_string(req: EvaluationRequest):
+
+    confidence = 0.85
+    reason = "Translation is mostly natural, but could be improved."
+    suggestion = "Use より自然な表現 here."
+    with db().write() as conn:
+        c = conn.cursor()
+        c.execute("""
+            UPDATE strings SET confidence=?, reason=?, suggestion=? WHERE id=?
+        """, (confidence, reason, suggestion, req.id))
+        conn.commit()
+    return StringPair(id=req.id, source=req.source, japanese=req.japanese, confidence=confidence, reason=reason, suggestion=suggestion)
+
+@app.get("/admin/smartling-keys")
+def get_smartling_keys():
+    with db().read() as conn:
+        c = conn.cursor()
+        c.execute("SELECT user_id, secret, project_id, account_id, job_id, locale FROM smartling_keys ORDER BY id DESC LIMIT 1")
         row = c.fetchone()
         if row:
             return {"user_id": row[0], "secret": row[1], "project_id": row[2], "account_id": row[3], "job_id": row[4], "locale": row[5]}
@@ -273,7 +2004,7 @@ def set_smartling_keys(data: dict):
     account_id = data.get("account_id", "")
     job_id = data.get("job_id", "")
     locale = data.get("locale", "ja-JP")
-    with sqlite3.connect(DB_PATH) as conn:
+    with db().write() as conn:
         c = conn.cursor()
         # Check if a row exists
         c.execute("SELECT id FROM smartling_keys ORDER BY id DESC LIMIT 1")
@@ -288,55 +2019,23 @@ def set_smartling_keys(data: dict):
         else:
             c.execute("INSERT INTO smartling_keys (user_id, secret, project_id, account_id, job_id, locale) VALUES (?, ?, ?, ?, ?, ?)", (user_id, secret, project_id, account_id, job_id, locale))
         conn.commit()
+    smartling.invalidate()
     return {"status": "ok"}
 
 @app.get("/admin/smartling-projects")
 async def get_smartling_projects():
-    import time
-    SMARTLING_API_URL = None
-    account_id = None
-    with sqlite3.connect(DB_PATH) as conn:
-        c = conn.cursor()
-        c.execute("SELECT user_id, secret, project_id, account_id, access_token, refresh_token, token_expires FROM smartling_keys ORDER BY id DESC LIMIT 1")
-        row = c.fetchone()
-        if not row:
-            return JSONResponse(status_code=400, content={"error": "No Smartling credentials set"})
-        user_id, secret, project_id, account_id, access_token, refresh_token, token_expires = row
+    creds = smartling.credentials()
+    if not creds:
+        return JSONResponse(status_code=400, content={"error": "No Smartling credentials set"})
+    account_id = creds["account_id"]
     if not account_id:
         return JSONResponse(status_code=400, content={"error": "No Smartling account ID set in admin"})
-    SMARTLING_API_URL = f"https://api.smartling.com/accounts-api/v2/accounts/{account_id}/projects"
-    now = int(time.time())
-    token = access_token
-
-    async def fetch_projects(token):
-        async with httpx.AsyncClient() as client:
-            headers = {"Authorization": f"Bearer {token}"}
-            proj_res = await client.get(SMARTLING_API_URL, headers=headers)
-            if proj_res.status_code == 401:
-                raise Exception("unauthorized")
-            proj_res.raise_for_status()
-            projects = proj_res.json()["response"]["data"]["items"]
-            return [f"{p['projectId']} - {p['projectName']}" for p in projects]
-
-    if not token or (token_expires and now >= token_expires):
-        token = None
-    tried_refresh = False
-    for attempt in range(2):
-        try:
-            if not token and refresh_token:
-                token, _, _ = await refresh_smartling_token(refresh_token, user_id, secret, DB_PATH)
-                tried_refresh = True
-            if not token:
-                return JSONResponse(status_code=401, content={"error": "No valid Smartling access token. Please authenticate again from the admin page."})
-            return await fetch_projects(token)
-        except Exception as e:
-            if (not tried_refresh) and refresh_token and ("unauthorized" in str(e) or "401" in str(e)):
-                token, _, _ = await refresh_smartling_token(refresh_token)
-                tried_refresh = True
-                continue
-            print("[Smartling Auth Error]", e)
-            import traceback; traceback.print_exc()
-            return JSONResponse(status_code=500, content={"error": str(e)})
+    try:
+        proj_res = await smartling.get(f"/accounts-api/v2/accounts/{account_id}/projects")
+        projects = proj_res.json()["response"]["data"]["items"]
+        return [f"{p['projectId']} - {p['projectName']}" for p in projects]
+    except Exception as e:
+        return smartling_error_response("Smartling Auth Error", e)
 class SmartlingAuthRequest(BaseModel):
     user_id: str
     secret: str
@@ -345,27 +2044,21 @@ class SmartlingAuthRequest(BaseModel):
 @app.post("/admin/smartling-auth")
 async def smartling_auth(req: SmartlingAuthRequest):
     try:
-        async with httpx.AsyncClient() as client:
-            res = await client.post(
-                "https://api.smartling.com/auth-api/v2/authenticate",
-                json={
-                    "userIdentifier": req.user_id,
-                    "userSecret": req.secret
-                }
-            )
-            res.raise_for_status()
-            data = res.json()
-            logging.info(f"{data}")
-            access_token = data.get('response', {}).get('data', {}).get('accessToken')
-            refresh_token = data.get('response', {}).get('data', {}).get('refreshToken')
-            expires_in = data.get('response', {}).get('data', {}).get('expiresIn')
-            import time
-            token_expires = int(time.time()) + int(expires_in) if expires_in else None
-            with sqlite3.connect(DB_PATH) as conn:
-                c = conn.cursor()
-                c.execute("UPDATE smartling_keys SET access_token=?, refresh_token=?, token_expires=? WHERE user_id=? AND secret=?", (access_token, refresh_token, token_expires, req.user_id, req.secret))
-                conn.commit()
-            return data
+        res = await smartling.http().post(
+            f"{SMARTLING_API_BASE}/auth-api/v2/authenticate",
+            json={
+                "userIdentifier": req.user_id,
+                "userSecret": req.secret
+            }
+        )
+        res.raise_for_status()
+        data = res.json()
+        logging.info(f"{data}")
+        access_token = data.get('response', {}).get('data', {}).get('accessToken')
+        refresh_token = data.get('response', {}).get('data', {}).get('refreshToken')
+        expires_in = data.get('response', {}).get('data', {}).get('expiresIn')
+        await asyncio.to_thread(smartling.store_tokens, req.user_id, req.secret, access_token, refresh_token, expires_in)
+        return data
     except Exception as e:
         logging.error(f"Smartling auth error: {e}")
         return JSONResponse(status_code=500, content={"error": str(e)})
@@ -374,218 +2067,371 @@ async def smartling_auth(req: SmartlingAuthRequest):
 @app.get("/admin/smartling-jobs")
 async def get_smartling_jobs(project_id: str = Query(...)):
     """Fetch jobs for a given Smartling project ID (requires valid tokens in DB)"""
-    import time
-    SMARTLING_API_URL = None
-    with sqlite3.connect(DB_PATH) as conn:
-        c = conn.cursor()
-        c.execute("SELECT user_id, secret, account_id, access_token, refresh_token, token_expires FROM smartling_keys ORDER BY id DESC LIMIT 1")
-        row = c.fetchone()
-        if not row:
-            return JSONResponse(status_code=400, content={"error": "No Smartling credentials set"})
-        user_id, secret, account_id, access_token, refresh_token, token_expires = row
-    if not account_id:
+    creds = smartling.credentials()
+    if not creds:
+        return JSONResponse(status_code=400, content={"error": "No Smartling credentials set"})
+    if not creds["account_id"]:
         return JSONResponse(status_code=400, content={"error": "No Smartling account ID set in admin"})
-    SMARTLING_API_URL = f"https://api.smartling.com/jobs-api/v3/projects/{project_id}/jobs"
-    now = int(time.time())
-    token = access_token
-
-    async def fetch_jobs(token):
-        async with httpx.AsyncClient() as client:
-            headers = {"Authorization": f"Bearer {token}"}
-            jobs_res = await client.get(SMARTLING_API_URL, headers=headers)
-            if jobs_res.status_code == 401:
-                raise Exception("unauthorized")
-            jobs_res.raise_for_status()
-            jobs = jobs_res.json().get("response", {}).get("data", {}).get("items", [])
-            #print("[Smartling Jobs API response items]", jobs)
-            result = []
-            for j in jobs:
-                job_id = j.get("translationJobUid") or j.get("jobId") or j.get("id")
-                job_name = j.get("jobName") or j.get("name") or str(job_id)
-                if job_id:
-                    result.append({"jobId": job_id, "jobName": job_name})
-            return result
-
-    if not token or (token_expires and now >= token_expires):
-        token = None
-    tried_refresh = False
-    for attempt in range(2):
-        try:
-            if not token and refresh_token:
-                token, _, _ = await refresh_smartling_token(refresh_token, user_id, secret, DB_PATH)
-                tried_refresh = True
-            if not token:
-                return JSONResponse(status_code=401, content={"error": "No valid Smartling access token. Please authenticate again from the admin page."})
-            return await fetch_jobs(token)
-        except Exception as e:
-            if (not tried_refresh) and refresh_token and ("unauthorized" in str(e) or "401" in str(e)):
-                token, _, _ = await refresh_smartling_token(refresh_token)
-                tried_refresh = True
-                continue
-            print("[Smartling Jobs Error]", e)
-            import traceback; traceback.print_exc()
-            return JSONResponse(status_code=500, content={"error": str(e)})
+    try:
+        jobs_res = await smartling.get(f"/jobs-api/v3/projects/{project_id}/jobs")
+        jobs = jobs_res.json().get("response", {}).get("data", {}).get("items", [])
+        #print("[Smartling Jobs API response items]", jobs)
+        result = []
+        for j in jobs:
+            job_id = j.get("translationJobUid") or j.get("jobId") or j.get("id")
+            job_name = j.get("jobName") or j.get("name") or str(job_id)
+            if job_id:
+                result.append({"jobId": job_id, "jobName": job_name})
+        return result
+    except Exception as e:
+        return smartling_error_response("Smartling Jobs Error", e)
 
-# fetch and cache Smartling source strings and translations
-@app.get("/admin/smartling-strings")
-async def get_smartling_strings(project_id: str, locale: str = "ja-JP", page: int = 1, per_page: int = 50):
-    import time
-    import math
-    import asyncio
-    with sqlite3.connect(DB_PATH) as conn:
+# --- Source strings sync ---
+# Pages through every source string and fetches translations in batches of hashcodes (bounded
+# concurrency) instead of one request per string. Runs as a "strings" job in the jobs table, so
+# progress survives restarts; poll it through /admin/smartling-strings/sync/{id} or /admin/jobs.
+
+def save_smartling_strings(project_id, locale, rows):
+    """rows: list of (hashcode, string_text, translation)."""
+    now = int(time.time())
+    with db().write() as conn:
         c = conn.cursor()
-        c.execute("DELETE FROM strings WHERE project_id=? AND locale=?", (project_id, locale))
+        c.executemany(
+            """INSERT INTO smartling_strings (project_id, locale, hashcode, string_text, translation, synced_at) VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT (project_id, locale, hashcode) DO UPDATE SET string_text=excluded.string_text, translation=excluded.translation, synced_at=excluded.synced_at""",
+            [(project_id, locale, hashcode, string_text, translation, now) for hashcode, string_text, translation in rows]
+        )
         conn.commit()
-    with sqlite3.connect(DB_PATH) as conn:
+    return len(rows)
+
+async def sync_smartling_strings(project_id, locale, progress, page_size: int = 500, batch_size: int = 100, concurrency: int = 4):
+    semaphore = asyncio.Semaphore(concurrency)
+    progress.update({"total": None, "fetched": 0, "translated": 0, "saved": 0, "retries": 0})
+
+    async def fetch_translations(hashcodes):
+        async with semaphore:
+            res = await smartling.get(f"/strings-api/v2/projects/{project_id}/translations", params={"targetLocaleId": locale, "hashcodes": hashcodes, "limit": len(hashcodes)}, stats=progress)
+        translated = {}
+        for item in res.json().get("response", {}).get("data", {}).get("items", []):
+            translations = item.get("translations", [])
+            translated[item.get("hashcode")] = translations[0].get("translation") if translations else None
+        return translated
+
+    offset = 0
+    while True:
+        res = await smartling.get(f"/strings-api/v2/projects/{project_id}/source-strings", params={"offset": offset, "limit": page_size}, stats=progress)
+        data = res.json().get("response", {}).get("data", {})
+        items = [item for item in data.get("items", []) if item.get("hashcode")]
+        progress["total"] = data.get("totalCount", progress["total"])
+        if not data.get("items"):
+            break
+        hashcodes = [item["hashcode"] for item in items]
+        translated = {}
+        for batch in await asyncio.gather(*[fetch_translations(hashcodes[i:i + batch_size]) for i in range(0, len(hashcodes), batch_size)]):
+            translated.update(batch)
+        rows = [(item["hashcode"], item.get("parsedStringText") or item.get("stringText"), translated.get(item["hashcode"])) for item in items]
+        progress["saved"] += await asyncio.to_thread(save_smartling_strings, project_id, locale, rows)
+        progress["translated"] += sum(1 for row in rows if row[2])
+        progress["fetched"] += len(data["items"])
+        offset += len(data["items"])
+        if progress["total"] is not None and offset >= progress["total"]:
+            break
+    return progress
+
+def smartling_string_sync_status(job):
+    """The shape the strings sync endpoints have always returned, built from its jobs row."""
+    progress = job["progress"] or {}
+    status = {
+        "id": job["id"],
+        "project_id": job["params"]["project_id"],
+        "locale": job["params"].get("locale", "ja-JP"),
+        "state": job["state"],
+        "total": progress.get("total"),
+        "fetched": progress.get("fetched", 0),
+        "translated": progress.get("translated", 0),
+        "saved": progress.get("saved", 0),
+        "retries": progress.get("retries", 0),
+        "error": job["error"],
+        "started_at": job["started_at"] or job["created_at"],
+        "finished_at": job["finished_at"],
+        "seconds": job["seconds"],
+    }
+    status["percent"] = round(100.0 * status["fetched"] / status["total"], 1) if status["total"] else None
+    return status
+
+@app.post("/admin/smartling-strings/sync")
+async def start_smartling_strings_sync(data: dict = Body(...)):
+    project_id = data.get("project_id")
+    locale = data.get("locale", "ja-JP")
+    if not project_id:
+        return JSONResponse(status_code=400, content={"error": "Missing project_id"})
+    if not smartling.credentials():
+        return JSONResponse(status_code=400, content={"error": "No Smartling credentials set"})
+    with db().read() as conn:
         c = conn.cursor()
-        c.execute("SELECT user_id, secret, account_id, access_token, refresh_token, token_expires FROM smartling_keys ORDER BY id DESC LIMIT 1")
-        row = c.fetchone()
-        if not row:
-            return JSONResponse(status_code=400, content={"error": "No Smartling credentials set"})
-        user_id, secret, account_id, access_token, refresh_token, token_expires = row
-    SMARTLING_API_URL = f"https://api.smartling.com/strings-api/v2/projects/{project_id}/source-strings"
-    now = int(time.time())
-    token = access_token
+        c.execute(
+            "SELECT id FROM jobs WHERE kind='strings' AND state IN ('queued', 'running') AND json_extract(params, '$.project_id')=? AND json_extract(params, '$.locale')=?",
+            (project_id, locale)
+        )
+        running = c.fetchone()
+    if running:
+        return JSONResponse(status_code=409, content={"error": "A sync is already running for this project and locale", "sync_id": running[0]})
+    params = {"project_id": project_id, "locale": locale, "batch_size": min(500, max(1, int(data.get("batch_size", 100))))}
+    if data.get("concurrency"):
+        params["concurrency"] = data["concurrency"]
+    return smartling_string_sync_status(get_sync_job(enqueue_sync_job("strings", params)))
 
-    async def fetch_translation_async(client, project_id, locale, string_id, string_text, token):
-        try:
-            trans_url = f"https://api.smartling.com/strings-api/v2/projects/{project_id}/translations"
-            trans_params = {"targetLocaleId": locale, "stringId": string_id}
-            headers = {"Authorization": f"Bearer {token}"}
-            res = await client.get(trans_url, headers=headers, params=trans_params)
-            translation = ""
-            if res.status_code == 200:
-                trans_data = res.json().get("response", {}).get("data", {})
-                translation = trans_data.get("translation", "")
-            return (string_id, string_text, translation)
-        except Exception as e:
-            print(f"[Async Translation Fetch Error] string_id={string_id}: {e}")
-            return (string_id, string_text, "")
-
-    async def fetch_strings(token):
-        async with httpx.AsyncClient() as client:
-            headers = {"Authorization": f"Bearer {token}"}
-            params = {"limit": 500}
-            res = await client.get(SMARTLING_API_URL, headers=headers, params=params)
-            if res.status_code == 401:
-                raise Exception("unauthorized")
-            res.raise_for_status()
-            items = res.json().get("response", {}).get("data", {}).get("items", [])
-            # Launch all translation fetches concurrently
-            tasks = [fetch_translation_async(client, project_id, locale, s.get("stringId"), s.get("stringText"), token) for s in items]
-            translations = await asyncio.gather(*tasks)
-            with sqlite3.connect(DB_PATH) as conn:
-                c = conn.cursor()
-                for string_id, source, translation in translations:
-                    c.execute("INSERT OR REPLACE INTO strings (id, source, translation, project_id, locale) VALUES (?, ?, ?, ?, ?)", (string_id, source, translation, project_id, locale))
-                conn.commit()
-            return translations
+@app.get("/admin/smartling-strings/sync/{sync_id}")
+def get_smartling_strings_sync(sync_id: int):
+    job = get_sync_job(sync_id)
+    if not job or job["kind"] != "strings":
+        return JSONResponse(status_code=404, content={"error": "Sync not found"})
+    return smartling_string_sync_status(job)
+
+@app.get("/admin/smartling-strings")
+def get_smartling_strings(project_id: str, locale: str = "ja-JP", page: int = 1, per_page: int = 50):
+    """Synced source strings; start a sync with POST /admin/smartling-strings/sync."""
+    with db().read() as conn:
+        c = conn.cursor()
+        c.execute("SELECT COUNT(*) FROM smartling_strings WHERE project_id=? AND locale=?", (project_id, locale))
+        count = c.fetchone()[0]
+        c.execute("SELECT id, string_text, translation, hashcode FROM smartling_strings WHERE project_id=? AND locale=? ORDER BY id LIMIT ? OFFSET ?", (project_id, locale, per_page, (page-1)*per_page))
+        rows = c.fetchall()
+        return {"total": count, "page": page, "per_page": per_page, "strings": [{"id": row[0], "source": row[1], "translation": row[2], "hashcode": row[3]} for row in rows]}
 
-    if not token or (token_expires and now >= token_expires):
-        token = None
-    tried_refresh = False
-    for attempt in range(2):
-        try:
-            if not token and refresh_token:
-                token, _, _ = await refresh_smartling_token(refresh_token, user_id, secret, DB_PATH)
-                tried_refresh = True
-            if not token:
-                return JSONResponse(status_code=401, content={"error": "No valid Smartling access token. Please authenticate again from the admin page."})
-            await fetch_strings(token)
-            with sqlite3.connect(DB_PATH) as conn:
-                c = conn.cursor()
-                c.execute("SELECT COUNT(*) FROM strings WHERE project_id=? AND locale=?", (project_id, locale))
-                count = c.fetchone()[0]
-                c.execute("SELECT id, source, translation FROM strings WHERE project_id=? AND locale=? ORDER BY id LIMIT ? OFFSET ?", (project_id, locale, per_page, (page-1)*per_page))
-                rows = c.fetchall()
-                return {"total": count, "page": page, "per_page": per_page, "strings": [{"id": row[0], "source": row[1], "translation": row[2]} for row in rows]}
-        except Exception as e:
-            if (not tried_refresh) and refresh_token and ("unauthorized" in str(e) or "401" in str(e)):
-                token, _, _ = await refresh_smartling_token(refresh_token)
-                tried_refresh = True
-                continue
-            print("[Smartling Strings Error]", e)
-            import traceback; traceback.print_exc()
-            return JSONResponse(status_code=500, content={"error": str(e)})
-         
 @app.get("/admin/smartling-job-files")
 def get_job_files(project_id: str):
-    with sqlite3.connect(DB_PATH) as conn:
+    with db().read() as conn:
         c = conn.cursor()
         c.execute("SELECT job_id, file_uri FROM smartling_job_files WHERE project_id=?", (project_id,))
         rows = c.fetchall()
         return [{"job_id": row[0], "file_uri": row[1]} for row in rows]
 
+# --- Incremental sync checkpoints ---
+# kind='job': item_key is the job uid, last_modified its modifiedDate (locale is '').
+# kind='file': item_key is the file uri, last_modified the locale's last-modified date.
+# last_modified is the only thing that lets a sync skip a file. A changed file is fetched in full;
+# rows whose text did not change are no-ops in the upsert (older databases may still carry an
+# unused content_digest column).
+def load_sync_checkpoints(project_id, locale, kind):
+    with db().read() as conn:
+        c = conn.cursor()
+        c.execute("SELECT item_key, last_modified FROM smartling_sync_checkpoints WHERE project_id=? AND locale=? AND kind=?", (project_id, locale, kind))
+        return {row[0]: {"last_modified": row[1]} for row in c.fetchall()}
+
+def save_sync_checkpoints(project_id, locale, kind, checkpoints):
+    """checkpoints: list of (item_key, last_modified, string_count)."""
+    now = int(time.time())
+    with db().write() as conn:
+        c = conn.cursor()
+        c.executemany(
+            "INSERT OR REPLACE INTO smartling_sync_checkpoints (project_id, locale, kind, item_key, last_modified, string_count, synced_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(project_id, locale, kind, key, last_modified, count, now) for key, last_modified, count in checkpoints]
+        )
+        conn.commit()
+
+@app.get("/admin/smartling-sync-checkpoints")
+def get_sync_checkpoints(project_id: str, locale: str = None):
+    with db().read() as conn:
+        c = conn.cursor()
+        query = "SELECT kind, locale, item_key, last_modified, string_count, synced_at FROM smartling_sync_checkpoints WHERE project_id=?"
+        params = [project_id]
+        if locale:
+            query += " AND locale IN (?, '')"
+            params.append(locale)
+        c.execute(query + " ORDER BY kind, item_key", params)
+        return [{"kind": r[0], "locale": r[1], "item_key": r[2], "last_modified": r[3], "string_count": r[4], "synced_at": r[5]} for r in c.fetchall()]
+
+@app.delete("/admin/smartling-sync-checkpoints")
+def reset_sync_checkpoints(project_id: str, locale: str = None):
+    """Forget checkpoints so the next sync is a full re-crawl."""
+    with db().write() as conn:
+        c = conn.cursor()
+        if locale:
+            c.execute("DELETE FROM smartling_sync_checkpoints WHERE project_id=? AND locale IN (?, '')", (project_id, locale))
+        else:
+            c.execute("DELETE FROM smartling_sync_checkpoints WHERE project_id=?", (project_id,))
+        conn.commit()
+        return {"success": True, "deleted": c.rowcount}
+
+def save_job_files(project_id, job_file_pairs):
+    with db().write() as conn:
+        c = conn.cursor()
+        c.executemany("INSERT OR IGNORE INTO smartling_job_files (job_id, file_uri, project_id) VALUES (?, ?, ?)", [(job_id, file_uri, project_id) for job_id, file_uri in job_file_pairs])
+        conn.commit()
+
+def get_project_file_uris(project_id):
+    with db().read() as conn:
+        c = conn.cursor()
+        c.execute("SELECT DISTINCT file_uri FROM smartling_job_files WHERE project_id=?", (project_id,))
+        return [row[0] for row in c.fetchall()]
+
+async def sync_job_files(project_id, full_resync=False, concurrency=4, sync_stats=None):
+    """Discover (job_id, file_uri) pairs for the project's changed jobs; sync_stats is filled in as it goes."""
+    sync_stats = {} if sync_stats is None else sync_stats
+    sync_stats.update({"full_resync": full_resync, "jobs_synced": 0, "jobs_skipped": 0})
+
+    async def list_jobs():
+        jobs = []
+        while True:
+            res = await smartling.get(f"/jobs-api/v3/projects/{project_id}/jobs", params={"offset": len(jobs), "limit": 100})
+            page = res.json().get("response", {}).get("data", {})
+            items = page.get("items", [])
+            jobs.extend(items)
+            if not items or len(jobs) >= page.get("totalCount", 0):
+                return jobs
+
+    jobs = await list_jobs()
+    sync_stats["jobs"] = len(jobs)
+    checkpoints = {} if full_resync else await asyncio.to_thread(load_sync_checkpoints, project_id, "", "job")
+    semaphore = asyncio.Semaphore(concurrency)
+    synced_jobs = []
+    for job in jobs:
+        job_id = job.get("translationJobUid") or job.get("jobId") or job.get("id")
+        job_status = job.get("jobStatus")
+        if not job_id or job_status == "CANCELLED":
+            continue
+        modified = job.get("modifiedDate")
+        # unchanged since the last sync: its files are already in smartling_job_files
+        if modified and checkpoints.get(job_id, {}).get("last_modified") == modified:
+            sync_stats["jobs_skipped"] += 1
+            continue
+        synced_jobs.append((job_id, modified, None))
+    sync_stats["jobs_synced"] = len(synced_jobs)
+
+    async def files_for_job(job_id):
+        async with semaphore:
+            files_res = await smartling.get(f"/jobs-api/v3/projects/{project_id}/jobs/{job_id}/files")
+        files = files_res.json().get("response", {}).get("data", {}).get("items", [])
+        return [(job_id, f.get("uri") or f.get("fileUri")) for f in files if f.get("uri") or f.get("fileUri")]
+
+    job_file_pairs = [pair for pairs in await asyncio.gather(*[files_for_job(job[0]) for job in synced_jobs]) for pair in pairs]
+    await asyncio.to_thread(save_job_files, project_id, job_file_pairs)
+    await asyncio.to_thread(save_sync_checkpoints, project_id, "", "job", synced_jobs)
+    return job_file_pairs
+
 @app.post("/admin/smartling-job-files")
 async def fetch_and_save_job_files(data: dict = Body(...)):
     project_id = data.get("project_id")
+    full_resync = bool(data.get("full_resync", False))
     if not project_id:
         return JSONResponse(status_code=400, content={"error": "Missing project_id"})
-    import time
-    with sqlite3.connect(DB_PATH) as conn:
+    if not smartling.credentials():
+        return JSONResponse(status_code=400, content={"error": "No Smartling credentials set"})
+    concurrency = max(1, int(data.get("concurrency") or get_setting('smartling_fetch_concurrency', '4')))
+    sync_stats = {}
+    try:
+        pairs = await sync_job_files(project_id, full_resync, concurrency, sync_stats)
+        return {"saved": len(pairs), "pairs": pairs, **sync_stats}
+    except Exception as e:
+        return smartling_error_response("Smartling Job Files Error", e)
+
+def save_translation_page(project_id, locale, file_uri, items):
+    rows = []
+    for item in items:
+        translations = item.get("translations", [])
+        translation = translations[0]["translation"] if translations and "translation" in translations[0] else None
+        rows.append((project_id, file_uri, locale, item.get("parsedStringText"), translation, item.get("hashcode")))
+    with db().write() as conn:
         c = conn.cursor()
-        c.execute("SELECT user_id, secret, account_id, access_token, refresh_token, token_expires FROM smartling_keys ORDER BY id DESC LIMIT 1")
-        row = c.fetchone()
-        if not row:
-            return JSONResponse(status_code=400, content={"error": "No Smartling credentials set"})
-        user_id, secret, account_id, access_token, refresh_token, token_expires = row
-    now = int(time.time())
-    token = access_token
-
-    async def fetch_job_files(token):
-        async with httpx.AsyncClient() as client:
-            headers = {"Authorization": f"Bearer {token}"}
-            jobs_url = f"https://api.smartling.com/jobs-api/v3/projects/{project_id}/jobs"
-            jobs_res = await client.get(jobs_url, headers=headers)
-            jobs_res.raise_for_status()
-            jobs = jobs_res.json().get("response", {}).get("data", {}).get("items", [])
-            job_file_pairs = []
-            for job in jobs:
-                job_id = job.get("translationJobUid") or job.get("jobId") or job.get("id")
-                job_status = job.get("jobStatus")
-                if not job_id or job_status == "CANCELLED":
-                    continue
-                files_url = f"https://api.smartling.com/jobs-api/v3/projects/{project_id}/jobs/{job_id}/files"
-                files_res = await client.get(files_url, headers=headers)
-                files_res.raise_for_status()
-                files = files_res.json().get("response", {}).get("data", {}).get("items", [])
-                for f in files:
-                    file_uri = f.get("uri") or f.get("fileUri")
-                    if file_uri:
-                        job_file_pairs.append((job_id, file_uri))
-            with sqlite3.connect(DB_PATH) as conn:
-                c = conn.cursor()
-                for job_id, file_uri in job_file_pairs:
-                    c.execute("INSERT OR IGNORE INTO smartling_job_files (job_id, file_uri, project_id) VALUES (?, ?, ?)", (job_id, file_uri, project_id))
-                conn.commit()
-            return job_file_pairs
+        # stage the page, then merge it in one statement instead of a SELECT + UPDATE/INSERT per row
+        c.execute("CREATE TEMP TABLE IF NOT EXISTS translation_stage (project_id TEXT, file_uri TEXT, locale TEXT, parsed_string_text TEXT, translation TEXT, hashcode TEXT)")
+        c.execute("DELETE FROM translation_stage")
+        c.executemany("INSERT INTO translation_stage VALUES (?, ?, ?, ?, ?, ?)", rows)
+        # don't reset status if translation is the same; confidence, reason and flag are kept either way
+        c.execute("""
+            INSERT INTO smartling_translations (project_id, file_uri, locale, parsed_string_text, translation, status, confidence, reason, flag, hashcode)
+            SELECT project_id, file_uri, locale, parsed_string_text, translation, 'pending', NULL, NULL, 0, hashcode FROM translation_stage WHERE true
+            ON CONFLICT (project_id, locale, hashcode) DO UPDATE SET
+                parsed_string_text=excluded.parsed_string_text,
+                translation=excluded.translation,
+                status=CASE WHEN smartling_translations.translation IS excluded.translation THEN smartling_translations.status ELSE 'pending' END,
+                flag_checked=0,
+                tm_key=NULL
+            WHERE smartling_translations.translation IS NOT excluded.translation OR smartling_translations.parsed_string_text IS NOT excluded.parsed_string_text
+        """)
+        c.execute("DELETE FROM translation_stage")
+        conn.commit()
+    invalidate_translation_counts(project_id)
+    return len(items)
 
-    if not token or (token_expires and now >= token_expires):
-        token = None
-    tried_refresh = False
-    for attempt in range(2):
+async def sync_translations(project_id, locale, full_resync=False, concurrency=4, stats=None):
+    """Fetch translations for every known job file into smartling_translations; stats is filled in as it goes."""
+    file_uris = await asyncio.to_thread(get_project_file_uris, project_id)
+    stats = {} if stats is None else stats
+    stats.update({"saved": 0, "files": len(file_uris), "full_resync": full_resync, "files_skipped": 0, "pages": 0, "retries": 0})
+    checkpoints = {} if full_resync else await asyncio.to_thread(load_sync_checkpoints, project_id, locale, "file")
+    # producers page through files concurrently (each file in order), a single consumer writes to SQLite
+    started = time.perf_counter()
+    saved_count = 0
+    pages = asyncio.Queue(maxsize=concurrency * 4)
+    semaphore = asyncio.Semaphore(concurrency)
+    url = f"/strings-api/v2/projects/{project_id}/translations"
+
+    async def fetch_last_modified(file_uri):
         try:
-            if not token and refresh_token:
-                token, _, _ = await refresh_smartling_token(refresh_token, user_id, secret, DB_PATH)
-                tried_refresh = True
-            if not token:
-                return JSONResponse(status_code=401, content={"error": "No valid Smartling access token. Please authenticate again from the admin page."})
-            pairs = await fetch_job_files(token)
-            return {"saved": len(pairs), "pairs": pairs}
-        except Exception as e:
-            if (not tried_refresh) and refresh_token and ("unauthorized" in str(e) or "401" in str(e)):
-                token, _, _ = await refresh_smartling_token(refresh_token)
-                tried_refresh = True
-                continue
-            print("[Smartling Job Files Error]", e)
-            import traceback; traceback.print_exc()
-            return JSONResponse(status_code=500, content={"error": str(e)})
+            res = await smartling.get(f"/files-api/v2/projects/{project_id}/locales/{locale}/file/last-modified", {"fileUri": file_uri}, stats)
+        except httpx.HTTPStatusError:
+            return None
+        return res.json().get("response", {}).get("data", {}).get("lastModified")
+
+    async def fetch_file(file_uri):
+        async with semaphore:
+            last_modified = await fetch_last_modified(file_uri)
+            if last_modified and checkpoints.get(file_uri, {}).get("last_modified") == last_modified:
+                stats["files_skipped"] += 1
+                return
+            offset = 0
+            while True:
+                params = {"targetLocaleId": locale, "fileUri": file_uri, "offset": offset}
+                res = await smartling.get(url, params, stats)
+                items = res.json().get("response", {}).get("data", {}).get("items", [])
+                if not items:
+                    break
+                stats["pages"] += 1
+                await pages.put(("page", file_uri, items))
+                offset += len(items)
+            # queued behind this file's pages, so the checkpoint only lands once they're written
+            await pages.put(("checkpoint", file_uri, (file_uri, last_modified, offset)))
+
+    async def write_pages():
+        nonlocal saved_count
+        while True:
+            page = await pages.get()
+            if page is None:
+                break
+            kind, file_uri, payload = page
+            if kind == "checkpoint":
+                await asyncio.to_thread(save_sync_checkpoints, project_id, locale, "file", [payload])
+            else:
+                saved_count += await asyncio.to_thread(save_translation_page, project_id, locale, file_uri, payload)
+                stats["saved"] = saved_count
+
+    producers = [asyncio.create_task(fetch_file(file_uri)) for file_uri in file_uris]
+
+    async def produce_all():
+        await asyncio.gather(*producers)
+        await pages.put(None)
+
+    writer = asyncio.create_task(write_pages())
+    try:
+        await asyncio.gather(produce_all(), writer)
+    except Exception:
+        for task in producers + [writer]:
+            task.cancel()
+        raise
+    seconds = time.perf_counter() - started
+    stats["seconds"] = round(seconds, 2)
+    stats["items_per_second"] = round(saved_count / seconds, 1) if seconds else None
+    print(f"[Smartling Fetch Translations] {saved_count} items, {stats['pages']} pages from {len(file_uris) - stats['files_skipped']}/{len(file_uris)} files in {stats['seconds']}s ({stats['items_per_second']} items/s, {stats['retries']} retries)")
+    return saved_count
 
 # fetch and save all translations for all files in a project
 @app.post("/admin/smartling-fetch-translations")
 async def fetch_and_save_translations(data: dict = Body(...)):
     project_id = data.get("project_id")
     locale = data.get("locale", "ja-JP")
+    full_resync = bool(data.get("full_resync", False))
     if not project_id:
         return JSONResponse(status_code=400, content={"error": "Missing project_id"})
     # wtf was i doing. but may need this later
@@ -593,85 +2439,83 @@ async def fetch_and_save_translations(data: dict = Body(...)):
     #     c = conn.cursor()
     #     c.execute("DELETE FROM smartling_translations WHERE project_id=? AND locale=?", (project_id, locale))
     #     conn.commit()
-    with sqlite3.connect(DB_PATH) as conn:
-        c = conn.cursor()
-        c.execute("SELECT DISTINCT file_uri FROM smartling_job_files WHERE project_id=?", (project_id,))
-        file_uris = [row[0] for row in c.fetchall()]
-    with sqlite3.connect(DB_PATH) as conn:
-        c = conn.cursor()
-        c.execute("SELECT user_id, secret, account_id, access_token, refresh_token, token_expires FROM smartling_keys ORDER BY id DESC LIMIT 1")
-        row = c.fetchone()
-        if not row:
-            return JSONResponse(status_code=400, content={"error": "No Smartling credentials set"})
-        user_id, secret, account_id, access_token, refresh_token, token_expires = row
-    now = int(time.time())
-    token = access_token
-    async def fetch_translations(token):
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            headers = {"Authorization": f"Bearer {token}"}
-            saved_count = 0
-            for file_uri in file_uris:
-                offset = 0
-                while True:
-                    url = f"https://api.smartling.com/strings-api/v2/projects/{project_id}/translations"
-                    params = {"targetLocaleId": locale, "fileUri": file_uri, "offset": offset}
-                    res = await client.get(url, headers=headers, params=params)
-                    if res.status_code == 401:
-                        raise Exception("unauthorized")
-                    res.raise_for_status()
-                    items = res.json().get("response", {}).get("data", {}).get("items", [])
-                    if not items:
-                        break
-                    with sqlite3.connect(DB_PATH) as conn:
-                        c = conn.cursor()
-                        for item in items:
-                            parsed = item.get("parsedStringText")
-                            translations = item.get("translations", [])
-                            translation = translations[0]["translation"] if translations and "translation" in translations[0] else None
-                            hashcode = item.get("hashcode")
-                            c.execute("SELECT id, translation, reason, confidence, flag, status FROM smartling_translations WHERE project_id=? AND locale=? AND hashcode=?", (project_id, locale, hashcode))
-                            existing = c.fetchone()
-                            if existing:
-                                current_id, current_translation, current_reason, current_confidence, current_flag, current_status = existing
-                                # don't reset status if translation is the same
-                                if current_translation != translation:
-                                    new_status = 'pending'
-                                else:
-                                    new_status = current_status
-                                c.execute("UPDATE smartling_translations SET parsed_string_text=?, translation=?, status=?, confidence=?, reason=?, flag=? WHERE id=?",
-                                    (parsed, translation, new_status, current_confidence, current_reason, current_flag, current_id))
-                            else:
-                                c.execute(
-                                    "INSERT INTO smartling_translations (project_id, file_uri, locale, parsed_string_text, translation, status, confidence, reason, flag, hashcode) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                                    (project_id, file_uri, locale, parsed, translation, 'pending', None, None, 0, hashcode)
-                                )
-                            saved_count += 1
-                        conn.commit()
-                    offset += len(items)
-            return saved_count
-    if not token or (token_expires and now >= token_expires):
-        token = None
-    tried_refresh = False
-    for attempt in range(2):
-        try:
-            if not token and refresh_token:
-                token, _, _ = await refresh_smartling_token(refresh_token, user_id, secret, DB_PATH)
-                tried_refresh = True
-            if not token:
-                return JSONResponse(status_code=401, content={"error": "No valid Smartling access token. Please authenticate again from the admin page."})
-            count = await fetch_translations(token)
-            return {"saved": count}
-        except Exception as e:
-            if (not tried_refresh) and refresh_token and ("unauthorized" in str(e) or "401" in str(e)):
-                token, _, _ = await refresh_smartling_token(refresh_token)
-                tried_refresh = True
-                continue
-            print("[Smartling Fetch Translations Error]", e)
-            import traceback; traceback.print_exc()
-            return JSONResponse(status_code=500, content={"error": str(e)})
+    if not smartling.credentials():
+        return JSONResponse(status_code=400, content={"error": "No Smartling credentials set"})
+    concurrency = max(1, int(data.get("concurrency") or get_setting('smartling_fetch_concurrency', '4')))
+    stats = {}
+    try:
+        await sync_translations(project_id, locale, full_resync, concurrency, stats)
+        return stats
+    except Exception as e:
+        return smartling_error_response("Smartling Fetch Translations Error", e)
+
+# Totals for the table view are cached per filter; anything that inserts rows or changes status/flag
+# calls invalidate_translation_counts. The TTL only bounds staleness if a write path forgets to.
+TRANSLATION_COUNT_TTL = 300
+translation_counts = {}
+translation_counts_lock = threading.Lock()
+
+def invalidate_translation_counts(project_id=None):
+    with translation_counts_lock:
+        if project_id is None:
+            translation_counts.clear()
+        else:
+            for key in [key for key in translation_counts if key[0] == project_id]:
+                del translation_counts[key]
+
+def fts_query(search_type, search_text):
+    """FTS5 MATCH expression for the search box, or None if it has to fall back to LIKE."""
+    column = {"source": "parsed_string_text", "translation": "translation"}.get(search_type)
+    if not (FTS_ENABLED and column and len(search_text) >= FTS_MIN_QUERY_CHARS):
+        return None
+    return column, '{%s} : "%s"' % (column, search_text.replace('"', '""'))
+
+def translation_table_filter(project_id, locale, flag=None, status=None, search_type=None, search_text=None, min_confidence=None, max_confidence=None):
+    match = fts_query(search_type, search_text) if search_type and search_text else None
+    if match:
+        # CROSS JOIN pins the join order: drive from the FTS matches rather than probing the index per row
+        where = " FROM smartling_translations_fts CROSS JOIN smartling_translations ON smartling_translations.id=smartling_translations_fts.rowid WHERE smartling_translations_fts MATCH ? AND project_id=? AND locale=?"
+        params = [match[1], project_id, locale]
+        search_type = None
+    else:
+        where = " FROM smartling_translations WHERE project_id=? AND locale=?"
+        params = [project_id, locale]
+    if flag is not None:
+        where += " AND flag=?"
+        params.append(flag)
+    if status in ("completed", "pending"):
+        where += " AND status=?"
+        params.append(status)
+    if min_confidence is not None:
+        where += " AND confidence>=?"
+        params.append(min_confidence)
+    if max_confidence is not None:
+        where += " AND confidence<=?"
+        params.append(max_confidence)
+    if search_type and search_text:
+        if search_type == "source":
+            where += " AND parsed_string_text LIKE ?"
+            params.append(f"%{search_text}%")
+        elif search_type == "translation":
+            where += " AND translation LIKE ?"
+            params.append(f"%{search_text}%")
+    return where, params
+
+def count_translations(c, project_id, locale, where, params):
+    # project first so invalidate_translation_counts(project_id) finds it; params may start with an FTS MATCH expression
+    key = (project_id, locale, where, *params)
+    with translation_counts_lock:
+        cached = translation_counts.get(key)
+    if cached and time.time() - cached[1] < TRANSLATION_COUNT_TTL:
+        return cached[0]
+    c.execute("SELECT COUNT(*)" + where, params)
+    count = c.fetchone()[0]
+    with translation_counts_lock:
+        translation_counts[key] = (count, time.time())
+    return count
 
 @app.get("/admin/smartling-translations-table")
-async def get_smartling_translations_table(
+def get_smartling_translations_table(
     project_id: str,
     locale: str = "ja-JP",
     page: int = 1,
@@ -679,134 +2523,1336 @@ async def get_smartling_translations_table(
     flag: int = None,
     status: str = None,
     search_type: str = None,
-    search_text: str = None
+    search_text: str = None,
+    after_id: int = None,
+    sort: str = "id",
+    min_confidence: float = None,
+    max_confidence: float = None
 ):
-    with sqlite3.connect(DB_PATH) as conn:
+    """Pass after_id (the next_after_id of the previous page) to page by id instead of OFFSET.
+
+    Searches of 3+ characters go through the FTS index; those rows carry a highlighted snippet and
+    sort=relevance orders them by bm25 rank (page/OFFSET only).
+    """
+    where, params = translation_table_filter(project_id, locale, flag, status, search_type, search_text, min_confidence, max_confidence)
+    match = fts_query(search_type, search_text) if search_type and search_text else None
+    columns = "smartling_translations.id, file_uri, smartling_translations.parsed_string_text, smartling_translations.translation, status, confidence, reason, flag, hashcode, flag_rule, confidence_source"
+    if match:
+        column_index = 0 if match[0] == "parsed_string_text" else 1
+        columns += f", snippet(smartling_translations_fts, {column_index}, '<mark>', '</mark>', '…', 48)"
+    with db().read() as conn:
         c = conn.cursor()
-        query = "SELECT COUNT(*) FROM smartling_translations WHERE project_id=? AND locale=?"
-        params = [project_id, locale]
-        if flag is not None:
-            query += " AND flag=?"
-            params.append(flag)
-        if status in ("completed", "pending"):
-            query += " AND status=?"
-            params.append(status)
-        if search_type and search_text:
-            if search_type == "source":
-                query += " AND parsed_string_text LIKE ?"
-                params.append(f"%{search_text}%")
-            elif search_type == "translation":
-                query += " AND translation LIKE ?"
-                params.append(f"%{search_text}%")
-        c.execute(query, params)
-        count = c.fetchone()[0]
-        query = "SELECT id, file_uri, parsed_string_text, translation, status, confidence, reason, flag, hashcode FROM smartling_translations WHERE project_id=? AND locale=?"
-        params = [project_id, locale]
-        if flag is not None:
-            query += " AND flag=?"
-            params.append(flag)
-        if status in ("completed", "pending"):
-            query += " AND status=?"
-            params.append(status)
-        if search_type and search_text:
-            if search_type == "source":
-                query += " AND parsed_string_text LIKE ?"
-                params.append(f"%{search_text}%")
-            elif search_type == "translation":
-                query += " AND translation LIKE ?"
-                params.append(f"%{search_text}%")
-        query += " ORDER BY id LIMIT ? OFFSET ?"
-        params.extend([per_page, (page-1)*per_page])
-        c.execute(query, params)
+        count = count_translations(c, project_id, locale, where, params)
+        query = "SELECT " + columns + where
+        if match and sort == "relevance":
+            c.execute(query + " ORDER BY smartling_translations_fts.rank, smartling_translations.id LIMIT ? OFFSET ?", params + [per_page, (page-1)*per_page])
+        elif after_id is not None:
+            c.execute(query + " AND smartling_translations.id>? ORDER BY smartling_translations.id LIMIT ?", params + [after_id, per_page])
+        else:
+            c.execute(query + " ORDER BY smartling_translations.id LIMIT ? OFFSET ?", params + [per_page, (page-1)*per_page])
         rows = c.fetchall()
-        return {"total": count, "page": page, "per_page": per_page, "translations": [
-            {"id": row[0], "file_uri": row[1], "parsed_string_text": row[2], "translation": row[3], "status": row[4], "confidence": row[5], "reason": row[6], "flag": row[7], "hashcode": row[8]} for row in rows
-        ]}
+        translations = []
+        for row in rows:
+            translation = {"id": row[0], "file_uri": row[1], "parsed_string_text": row[2], "translation": row[3], "status": row[4], "confidence": row[5], "reason": row[6], "flag": row[7], "hashcode": row[8], "flag_rule": row[9], "confidence_source": row[10]}
+            if match:
+                translation["snippet"] = row[11]
+            translations.append(translation)
+        keyset = len(rows) == per_page and not (match and sort == "relevance")
+        return {"total": count, "page": page, "per_page": per_page, "next_after_id": rows[-1][0] if keyset else None, "translations": translations}
+
+# --- Export ---
+# Rows are read with one cursor on a dedicated connection and written out EXPORT_BATCH_ROWS at a
+# time, so memory stays flat however many rows match and the download starts with the first batch.
+EXPORT_BATCH_ROWS = 1000
+EXPORT_COLUMNS = ("id", "file_uri", "hashcode", "parsed_string_text", "translation", "status", "confidence", "reason", "flag", "flag_rule")
+EXPORT_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "jsonl": ("application/x-ndjson", "jsonl"),
+    "xliff": ("application/x-xliff+xml", "xlf"),
+}
+XML_INVALID_CHARS_RE = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+def export_row_batches(where, params):
+    columns = ", ".join("smartling_translations." + column for column in EXPORT_COLUMNS)
+    with db().stream() as conn:
+        c = conn.cursor()
+        c.execute("SELECT " + columns + where + " ORDER BY smartling_translations.id", params)
+        while True:
+            rows = c.fetchmany(EXPORT_BATCH_ROWS)
+            if not rows:
+                break
+            yield rows
+
+def export_csv(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM so Excel opens the Japanese text as UTF-8
+    buffer.write("\ufeff")
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+def export_jsonl(batches):
+    for rows in batches:
+        yield "".join(json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False) + "\n" for row in rows)
+
+def xliff_text(value):
+    return xml_escape(XML_INVALID_CHARS_RE.sub("", value or ""))
+
+def export_xliff(batches, project_id, locale):
+    yield ('<?xml version="1.0" encoding="UTF-8"?>\n'
+           '<xliff version="1.2" xmlns="urn:oasis:names:tc:xliff:document:1.2">\n'
+           f'<file original={xml_quoteattr(project_id)} source-language="en" target-language={xml_quoteattr(locale)} datatype="plaintext">\n<body>\n')
+    for rows in batches:
+        units = []
+        for row_id, file_uri, hashcode, source, translation, status, confidence, reason, flag, flag_rule in rows:
+            # completed rows are signed off; flagged ones go back to the translator for another look
+            state = "signed-off" if status == "completed" else "needs-review-translation" if flag else "translated"
+            unit = (f'<trans-unit id="{row_id}" resname={xml_quoteattr(hashcode or "")}>\n'
+                    f'  <source xml:space="preserve">{xliff_text(source)}</source>\n'
+                    f'  <target xml:space="preserve" state="{state}">{xliff_text(translation)}</target>\n'
+                    f'  <context-group purpose="location"><context context-type="sourcefile">{xliff_text(file_uri)}</context></context-group>\n')
+            if confidence is not None or reason:
+                score = f"score {confidence:g}: " if confidence is not None else ""
+                unit += f'  <note from="reviewer">{xliff_text(score + (reason or ""))}</note>\n'
+            if flag_rule:
+                unit += f'  <note from="flag-rules">{xliff_text(flag_rule)}</note>\n'
+            units.append(unit + "</trans-unit>\n")
+        yield "".join(units)
+    yield "</body>\n</file>\n</xliff>\n"
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = gzip header and trailer
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
+@app.get("/admin/smartling-translations-export")
+def export_smartling_translations(
+    project_id: str,
+    locale: str = "ja-JP",
+    format: str = "csv",
+    gzip: bool = False,
+    flag: int = None,
+    status: str = None,
+    search_type: str = None,
+    search_text: str = None,
+    min_confidence: float = None,
+    max_confidence: float = None
+):
+    """Stream every row matching the table view filters as CSV, JSONL or XLIFF 1.2, optionally gzipped."""
+    if format not in EXPORT_FORMATS:
+        return JSONResponse(status_code=400, content={"error": f"format must be one of {', '.join(EXPORT_FORMATS)}"})
+    where, params = translation_table_filter(project_id, locale, flag, status, search_type, search_text, min_confidence, max_confidence)
+    batches = export_row_batches(where, params)
+    if format == "csv":
+        chunks = export_csv(batches)
+    elif format == "jsonl":
+        chunks = export_jsonl(batches)
+    else:
+        chunks = export_xliff(batches, project_id, locale)
+    media_type, extension = EXPORT_FORMATS[format]
+    filename = re.sub(r"[^\w.-]+", "_", f"{project_id}-{locale}") + "." + extension
+    if gzip:
+        chunks = gzip_chunks(chunks)
+        media_type = "application/gzip"
+        filename += ".gz"
+    return StreamingResponse(chunks, media_type=media_type, headers={"Content-Disposition": f'attachment; filename="{filename}"'})
 
 @app.post("/admin/smartling-update-reason")
-async def smartling_update_reason(data: dict = Body(...)):
+def smartling_update_reason(data: dict = Body(...)):
     ids = data.get("ids")
     reason = data.get("reason") if "reason" in data else None
     if not ids:
         return JSONResponse(status_code=400, content={"success": False, "message": "Missing ids"})
     if not isinstance(ids, list):
         ids = [ids]
-    with sqlite3.connect(DB_PATH) as conn:
+    with db().write() as conn:
         c = conn.cursor()
         c.executemany("UPDATE smartling_translations SET reason=? WHERE id=?", [(reason, row_id) for row_id in ids])
         conn.commit()
     return {"success": True, "updated": len(ids)}
 
 @app.post("/admin/smartling-toggle-flag")
-async def smartling_toggle_flag(data: dict = Body(...)):
+def smartling_toggle_flag(data: dict = Body(...)):
     row_id = data.get("id")
     flag = data.get("flag")
     if row_id is None or flag is None:
         return JSONResponse(status_code=400, content={"success": False, "message": "Missing id or flag"})
-    with sqlite3.connect(DB_PATH) as conn:
+    with db().write() as conn:
         c = conn.cursor()
-        c.execute("UPDATE smartling_translations SET flag=? WHERE id=?", (flag, row_id))
+        c.execute("UPDATE smartling_translations SET flag=?, flag_rule=NULL, flag_manual=1 WHERE id=?", (flag, row_id))
         conn.commit()
+    invalidate_translation_counts()
     return {"success": True}
 
-@app.post("/evaluate-translation", response_model=TranslationEvalResponse)
-def evaluate_translation(req: TranslationEvalRequest):
-    import re, json
-    system_prompt = (
+EVAL_SYSTEM_PROMPT = (
     "You are an evaluation assistant. The user will send in a source and translation. Compare the two and evaluate the translation, providing a confidence score with a reason. Ensure that the given translation sounds natural. If there are any ways to improve the translation, include suggestions and provide an example sentence in Japanese. The reason and example SHOULD be included inside the {reason}. ONLY return a valid JSON object with keys 'score' (int, 0-100) and 'reason' (string). "
     "Do NOT include any explanation or text outside the JSON. Example: {\"score\": 95, \"reason\": \"Accurate and natural translation.\"} ONLY return one JSON object with the keys 'score' and 'reason'. "
 )
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": f'{{"source": "{req.source}", "translation": "{req.translation}"}}'},
-        {"role": "user", "content": f'{{"source": "{req.source}", "translation": "{req.translation}"}}'},
+
+# bump whenever build_eval_messages changes shape so cached scores from the old prompt are not reused
+EVAL_PROMPT_VERSION = 2
+
+class EvalCache:
+    """LRU of evaluation results in memory, backed by the eval_cache table."""
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "db_hits": 0, "misses": 0}
+
+    def get(self, key: str):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return self._entries[key]
+        with db().read() as conn:
+            c = conn.cursor()
+            c.execute("SELECT score, reason FROM eval_cache WHERE cache_key=?", (key,))
+            row = c.fetchone()
+        with self._lock:
+            if not row:
+                self.stats["misses"] += 1
+                return None
+            self.stats["db_hits"] += 1
+            self._remember(key, (row[0], row[1]))
+            return row[0], row[1]
+
+    def put(self, key: str, score: int, reason: str):
+        with db().write() as conn:
+            c = conn.cursor()
+            c.execute("INSERT OR REPLACE INTO eval_cache (cache_key, score, reason, created_at) VALUES (?, ?, ?, ?)", (key, score, reason, int(time.time())))
+            conn.commit()
+        with self._lock:
+            self._remember(key, (score, reason))
+
+    def clear(self):
+        with db().write() as conn:
+            c = conn.cursor()
+            c.execute("DELETE FROM eval_cache")
+            conn.commit()
+        with self._lock:
+            self._entries.clear()
+
+    def _remember(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def summary(self):
+        with self._lock:
+            lookups = sum(self.stats.values())
+            hits = self.stats["memory_hits"] + self.stats["db_hits"]
+            return {
+                **self.stats,
+                "memory_entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            }
+
+eval_cache = EvalCache(max_entries=int(get_setting('eval_cache_size', '10000')))
+
+def eval_cache_key(source: str, translation: str) -> str:
+    payload = json.dumps([source, translation, EVAL_PROMPT_VERSION, EVAL_SYSTEM_PROMPT, MODEL_PATH, model_manager.precision, generation_args], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def build_eval_messages(source: str, translation: str):
+    return [
+        {"role": "system", "content": EVAL_SYSTEM_PROMPT},
+        {"role": "user", "content": f'{{"source": "{source}", "translation": "{translation}"}}'},
     ]
-    output = pipe(messages, **generation_args)
-    raw = output[0]['generated_text']
+
+def parse_eval_output(raw: str):
+    """Pull (score, reason) out of the model output. Raises ValueError when it can't."""
     try:
         result = json.loads(raw)
     except Exception:
         match = re.search(r'\{.*\}', raw, re.DOTALL)
-        if match:
-            try:
-                result = json.loads(match.group(0))
-            except Exception as e2:
-                return TranslationEvalResponse(score=0, reason=f"Model output parse error: {str(e2)} | Raw: {raw}")
-        else:
-            return TranslationEvalResponse(score=0, reason=f"Model output parse error: No JSON found | Raw: {raw}")
+        if not match:
+            raise ValueError("No JSON found")
+        try:
+            result = json.loads(match.group(0))
+        except Exception as e:
+            # prose before the object may contain braces of its own; take the first object that decodes
+            result = None
+            decoder = json.JSONDecoder()
+            for start in (m.start() for m in re.finditer(r"\{", raw)):
+                try:
+                    candidate, _ = decoder.raw_decode(raw, start)
+                except ValueError:
+                    continue
+                if isinstance(candidate, dict):
+                    result = candidate
+                    break
+            if result is None:
+                raise ValueError(str(e))
     try:
-        score = int(result.get('score', 0))
-        reason = result.get('reason', '')
+        return int(result.get('score', 0)), result.get('reason', '')
     except Exception as e:
-        return TranslationEvalResponse(score=0, reason=f"Model output parse error: {str(e)} | Raw: {raw}")
+        raise ValueError(str(e))
+
+def save_eval_result(source: str, translation: str, score: int, reason: str, confidence_source: str = "model", project_id: str = None, locale: str = "ja-JP"):
+    # a provisional pre-screen score never replaces a model score
+    keep_model = " AND confidence_source IS NOT 'model'" if confidence_source != "model" else ""
     try:
-        with sqlite3.connect(DB_PATH) as conn:
+        with db().write() as conn:
             c = conn.cursor()
-            c.execute("UPDATE smartling_translations SET confidence=?, reason=? WHERE parsed_string_text=? AND translation=?", (score, reason, req.source, req.translation))
+            if project_id:
+                # the exact pair within the project (rows the translation memory has not indexed yet) ...
+                c.execute(
+                    "UPDATE smartling_translations SET confidence=?, reason=?, confidence_source=? WHERE parsed_string_text=? AND translation=? AND project_id=? AND locale=?" + keep_model,
+                    (score, reason, confidence_source, source, translation, project_id, locale)
+                )
+                # ... and every indexed row of the project that only differs by whitespace, punctuation or placeholder values
+                c.execute(
+                    "UPDATE smartling_translations SET confidence=?, reason=?, confidence_source=? WHERE tm_key=? AND project_id=? AND locale=?" + keep_model,
+                    (score, reason, confidence_source, tm_key(source, translation), project_id, locale)
+                )
+            else:
+                c.execute("UPDATE smartling_translations SET confidence=?, reason=?, confidence_source=? WHERE parsed_string_text=? AND translation=?" + keep_model, (score, reason, confidence_source, source, translation))
             conn.commit()
+        invalidate_translation_counts(project_id)
     except Exception as db_exc:
         print(f"[DB ERROR] Could not update confidence/reason: {db_exc}")
+
+def model_unavailable_response():
+    if eval_engine.state == "loading":
+        message = "Model is still loading, try again shortly."
+    elif eval_engine.state == "failed":
+        message = f"Model failed to load: {eval_engine.error}"
+    else:
+        message = "Model is not loaded. Enable model download in admin."
+    return JSONResponse(status_code=503, content={"error": message, "state": eval_engine.state}, headers={"Retry-After": "10"})
+
+def evaluation_failed_response(e: Exception):
+    """503 for a generation that raised: the model went away (unload, dead worker) or its batch failed (e.g. OOM)."""
+    print(f"[Translation Eval] Generation failed: {e}")
+    if eval_engine.state != "ready":
+        return model_unavailable_response()
+    return JSONResponse(status_code=503, content={"error": f"Evaluation failed: {e}", "state": eval_engine.state}, headers={"Retry-After": "10"})
+
+# --- Pre-screen ---
+# A heuristic tier in front of the model. Every row gets a provisional 0-100 score from the flag
+# checks, a glossary check and how unusual its length ratio is for the project; rows at or below
+# prescreen_fail_below or at or above prescreen_pass_above are decided without the model
+# (confidence_source='prescreen'), everything in between goes to the model as before.
+# A clean Japanese translation of typical length for its project scores 95 and passes by default;
+# without project length statistics (fewer than 50 translated rows) only glossary hits can get it there.
+PRESCREEN_BASE_SCORE = 75
+PRESCREEN_SCRIPT_BONUS = 10
+PRESCREEN_PENALTIES = (
+    # (reason, check, penalty)
+    ("identical to source", lambda source, translation, locale: source.strip().lower() == translation.strip().lower(), 60),
+    ("no Japanese text", latin_only_japanese, 50),
+    # a dropped or renamed placeholder breaks the string at runtime, so it fails even a fluent translation
+    ("placeholder mismatch", placeholder_mismatch, 65),
+    ("variable mismatch", variable_mismatch, 65),
+    ("HTML tag mismatch", html_tag_mismatch, 35),
+)
+PRESCREEN_LENGTH_PENALTY = 30
+PRESCREEN_LENGTH_Z = 3.0
+PRESCREEN_TYPICAL_LENGTH_BONUS = 10
+PRESCREEN_GLOSSARY_PENALTY = 20
+PRESCREEN_GLOSSARY_MAX_PENALTY = 40
+PRESCREEN_GLOSSARY_BONUS = 15
+PRESCREEN_CHUNK_SIZE = 5000
+PRESCREEN_STATS_TTL = 300
+prescreen_stats = {"pass": 0, "fail": 0, "model": 0}
+prescreen_stats_lock = threading.Lock()
+
+class Glossary:
+    """Source terms (case-insensitive, whole words for Latin script) and the target terms that must accompany them."""
+    def __init__(self, terms):
+        self.targets = {}
+        for source_term, target_term in terms:
+            self.targets.setdefault(source_term.lower(), []).append(target_term.lower())
+        alternatives = "|".join(re.escape(term) for term in sorted(self.targets, key=len, reverse=True))
+        self.pattern = re.compile(r"(?<!\w)(?:" + alternatives + r")(?!\w)", re.I) if self.targets else None
+
+    def check(self, source, translation):
+        """(missing source terms, share of the source's letters covered by terms whose translation is present)."""
+        if self.pattern is None:
+            return [], 0.0
+        matches = self.pattern.findall(source)
+        if not matches:
+            return [], 0.0
+        lowered = translation.lower()
+        missing = [match for match in matches if not any(target in lowered for target in self.targets[match.lower()])]
+        covered = sum(len(match) for match in matches if match not in missing)
+        letters = sum(ch.isalpha() for ch in source) or 1
+        return missing, min(1.0, covered / letters)
+
+glossaries = {}
+
+def load_glossary(locale):
+    if locale not in glossaries:
+        with db().read() as conn:
+            c = conn.cursor()
+            c.execute("SELECT source_term, target_term FROM glossary_terms WHERE locale=?", (locale,))
+            glossaries[locale] = Glossary(c.fetchall())
+    return glossaries[locale]
+
+def length_ratio_stats(project_id, locale):
+    """Median and robust spread (scaled MAD) of log length ratio over the project's translated rows, or None."""
+    with db().read() as conn:
+        c = conn.cursor()
+        c.execute("SELECT length(parsed_string_text), length(translation) FROM smartling_translations WHERE project_id=? AND locale=? AND parsed_string_text <> '' AND translation <> ''", (project_id, locale))
+        lengths = torch.tensor(c.fetchall(), dtype=torch.float64)
+    if lengths.shape[0] < 50:
+        return None
+    ratios = torch.log((lengths[:, 1] + 1) / (lengths[:, 0] + 1))
+    median = ratios.median()
+    spread = float((ratios - median).abs().median()) * 1.4826
+    return float(median), max(spread, 0.05)
+
+length_stats_cache = {}
+length_stats_cache_lock = threading.Lock()
+
+def cached_length_ratio_stats(project_id, locale):
+    """length_ratio_stats for single evaluations, recomputed at most every PRESCREEN_STATS_TTL seconds."""
+    with length_stats_cache_lock:
+        cached = length_stats_cache.get((project_id, locale))
+    if cached and time.time() - cached[1] < PRESCREEN_STATS_TTL:
+        return cached[0]
+    stats = length_ratio_stats(project_id, locale)
+    with length_stats_cache_lock:
+        length_stats_cache[(project_id, locale)] = (stats, time.time())
+    return stats
+
+class Prescreen:
+    def __init__(self, locale, glossary, length_stats=None, enabled=True, fail_below=30.0, pass_above=95.0):
+        self.locale = locale
+        self.glossary = glossary
+        self.length_stats = length_stats
+        self.enabled = enabled
+        self.fail_below = fail_below
+        self.pass_above = pass_above
+
+    @classmethod
+    def from_settings(cls, locale, length_stats=None):
+        return cls(
+            locale,
+            load_glossary(locale),
+            length_stats,
+            enabled=get_setting('prescreen_enabled', 'true') == 'true',
+            fail_below=float(get_setting('prescreen_fail_below', '30')),
+            pass_above=float(get_setting('prescreen_pass_above', '95')),
+        )
+
+    @classmethod
+    def for_project(cls, project_id, locale, cached=False):
+        screen = cls.from_settings(locale)
+        if screen.enabled:
+            screen.length_stats = (cached_length_ratio_stats if cached else length_ratio_stats)(project_id, locale)
+        return screen
+
+    def length_z(self, source, translation):
+        if self.length_stats is None:
+            return None
+        median, spread = self.length_stats
+        return (math.log((len(translation) + 1) / (len(source) + 1)) - median) / spread
+
+    def score(self, source, translation, length_z=None):
+        """(score, reasons) for one pair; pass length_z when it was computed in bulk."""
+        if not (translation or "").strip():
+            return 0, ["empty translation"]
+        reasons = []
+        score = PRESCREEN_BASE_SCORE
+        if not any(ch.isalpha() for ch in strip_markup(source)):
+            # only placeholders, numbers or markup: fine as long as they carry over
+            score = 100
+        for reason, check, penalty in PRESCREEN_PENALTIES:
+            if score == 100 and reason == "identical to source":
+                continue
+            if check(source, translation, self.locale):
+                score -= penalty
+                reasons.append(reason)
+        if score == 100 and not reasons:
+            return 100, ["nothing to translate"]
+        if self.locale.lower().startswith("ja") and JAPANESE_RE.search(translation):
+            score += PRESCREEN_SCRIPT_BONUS
+        if length_z is None:
+            length_z = self.length_z(source, translation)
+        if length_z is None:
+            if length_ratio_outlier(source, translation, self.locale):
+                score -= PRESCREEN_LENGTH_PENALTY
+                reasons.append("unusual length")
+        elif abs(length_z) > PRESCREEN_LENGTH_Z:
+            score -= PRESCREEN_LENGTH_PENALTY
+            reasons.append("unusual length for this project")
+        elif abs(length_z) <= 1:
+            score += PRESCREEN_TYPICAL_LENGTH_BONUS
+        missing, coverage = self.glossary.check(source, translation)
+        if missing:
+            score -= min(PRESCREEN_GLOSSARY_MAX_PENALTY, PRESCREEN_GLOSSARY_PENALTY * len(missing))
+            reasons.append("glossary term not followed: " + ", ".join(sorted(set(missing))))
+        elif coverage:
+            score += round(PRESCREEN_GLOSSARY_BONUS * coverage)
+        return max(0, min(100, score)), reasons
+
+    def route(self, score):
+        if score <= self.fail_below:
+            route = "fail"
+        elif score >= self.pass_above:
+            route = "pass"
+        else:
+            route = "model"
+        with prescreen_stats_lock:
+            prescreen_stats[route] += 1
+        metrics.inc("eval_prescreen_total", {"route": route})
+        return route
+
+def prescreen_reason(reasons):
+    return "Pre-screen: " + ("; ".join(reasons) if reasons else "no issues found")
+
+def prescreen_request(req):
+    """(score, reason) when the pre-screen decides this request without the model, else None."""
+    if req.force_model:
+        return None
+    if req.project_id:
+        screen = Prescreen.for_project(req.project_id, req.locale, cached=True)
+    else:
+        screen = Prescreen.from_settings(req.locale)
+    if not screen.enabled:
+        return None
+    score, reasons = screen.score(req.source, req.translation)
+    if screen.route(score) == "model":
+        return None
+    reason = prescreen_reason(reasons)
+    save_eval_result(req.source, req.translation, score, reason, confidence_source="prescreen", project_id=req.project_id, locale=req.locale)
+    print(f"[Translation Eval] Pre-screen score: {score}, Reason: {reason}")
+    return score, reason
+
+def run_prescreen(project_id, locale, progress=None):
+    """Score rows without a model score. Decided rows get a provisional confidence; undecided rows are left (or reset) to NULL for the model."""
+    progress = {} if progress is None else progress
+    screen = Prescreen.for_project(project_id, locale)
+    progress.update({"checked": 0, "pass": 0, "fail": 0, "model": 0, "model_calls_avoided": 0, "length_stats": screen.length_stats})
+    started = time.perf_counter()
+    last_id = 0
+    while True:
+        with db().read() as conn:
+            c = conn.cursor()
+            c.execute(
+                "SELECT id, parsed_string_text, translation, confidence_source FROM smartling_translations WHERE project_id=? AND locale=? AND id>? AND (confidence IS NULL OR confidence_source='prescreen') ORDER BY id LIMIT ?",
+                (project_id, locale, last_id, PRESCREEN_CHUNK_SIZE)
+            )
+            rows = [row for row in c.fetchall()]
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        # untranslated rows are left alone, as in eval jobs
+        rows = [row for row in rows if row[1] and row[2]]
+        length_z = [None] * len(rows)
+        if screen.length_stats is not None and rows:
+            # length ratios for the whole chunk at once
+            median, spread = screen.length_stats
+            lengths = torch.tensor([(len(row[1]), len(row[2])) for row in rows], dtype=torch.float64)
+            length_z = ((torch.log((lengths[:, 1] + 1) / (lengths[:, 0] + 1)) - median) / spread).tolist()
+        decided = []
+        undecided = []
+        for (row_id, source, translation, confidence_source), z in zip(rows, length_z):
+            score, reasons = screen.score(source, translation, z)
+            route = screen.route(score)
+            progress[route] += 1
+            if route == "model":
+                if confidence_source == "prescreen":
+                    undecided.append((row_id,))
+            else:
+                decided.append((score, prescreen_reason(reasons), row_id))
+        with db().write() as conn:
+            c = conn.cursor()
+            c.executemany("UPDATE smartling_translations SET confidence=?, reason=?, confidence_source='prescreen' WHERE id=?", decided)
+            c.executemany("UPDATE smartling_translations SET confidence=NULL, reason=NULL, confidence_source=NULL WHERE id=? AND confidence_source='prescreen'", undecided)
+            conn.commit()
+        progress["checked"] += len(rows)
+    progress["model_calls_avoided"] = progress["pass"] + progress["fail"]
+    progress["seconds"] = round(time.perf_counter() - started, 2)
+    invalidate_translation_counts(project_id)
+    return progress
+
+@app.post("/admin/prescreen-strings")
+def prescreen_strings(data: dict = Body(...)):
+    project_id = data.get("project_id")
+    if not project_id:
+        return JSONResponse(status_code=400, content={"error": "Missing project_id"})
+    return run_prescreen(project_id, data.get("locale", "ja-JP"))
+
+@app.get("/admin/prescreen-settings")
+def get_prescreen_settings():
+    screen = Prescreen.from_settings("ja-JP")
+    with prescreen_stats_lock:
+        stats = dict(prescreen_stats)
+    return {
+        "enabled": screen.enabled,
+        "fail_below": screen.fail_below,
+        "pass_above": screen.pass_above,
+        "stats": {**stats, "model_calls_avoided": stats["pass"] + stats["fail"]},
+    }
+
+@app.post("/admin/prescreen-settings")
+def set_prescreen_settings(data: dict = Body(...)):
+    current = get_prescreen_settings()
+    fail_below = float(data.get("fail_below", current["fail_below"]))
+    pass_above = float(data.get("pass_above", current["pass_above"]))
+    if not 0 <= fail_below < pass_above <= 101:
+        return JSONResponse(status_code=400, content={"error": "Expected 0 <= fail_below < pass_above (use 101 to never pass without the model)"})
+    if "enabled" in data:
+        set_setting('prescreen_enabled', 'true' if data["enabled"] else 'false')
+    set_setting('prescreen_fail_below', str(fail_below))
+    set_setting('prescreen_pass_above', str(pass_above))
+    return get_prescreen_settings()
+
+@app.get("/admin/glossary")
+def get_glossary(locale: str = "ja-JP"):
+    with db().read() as conn:
+        c = conn.cursor()
+        c.execute("SELECT id, source_term, target_term FROM glossary_terms WHERE locale=? ORDER BY source_term", (locale,))
+        return [{"id": row[0], "source_term": row[1], "target_term": row[2]} for row in c.fetchall()]
+
+@app.post("/admin/glossary")
+def add_glossary_terms(data: dict = Body(...)):
+    locale = data.get("locale", "ja-JP")
+    terms = data.get("terms")
+    if not isinstance(terms, list) or not all(isinstance(t, dict) and t.get("source_term", "").strip() and t.get("target_term", "").strip() for t in terms):
+        return JSONResponse(status_code=400, content={"error": "terms must be a list of {source_term, target_term}"})
+    with db().write() as conn:
+        c = conn.cursor()
+        c.executemany("INSERT OR IGNORE INTO glossary_terms (locale, source_term, target_term) VALUES (?, ?, ?)", [(locale, t["source_term"].strip(), t["target_term"].strip()) for t in terms])
+        conn.commit()
+    glossaries.pop(locale, None)
+    return get_glossary(locale)
+
+@app.delete("/admin/glossary/{term_id}")
+def delete_glossary_term(term_id: int):
+    with db().write() as conn:
+        c = conn.cursor()
+        c.execute("DELETE FROM glossary_terms WHERE id=?", (term_id,))
+        conn.commit()
+    glossaries.clear()
+    return {"success": True}
+
+@app.post("/evaluate-translation", response_model=TranslationEvalResponse)
+def evaluate_translation(req: TranslationEvalRequest):
+    cache_key = eval_cache_key(req.source, req.translation)
+    cached = eval_cache.get(cache_key)
+    metrics.inc("eval_cache_lookups_total", {"result": "hit" if cached else "miss"})
+    if cached:
+        score, reason = cached
+    else:
+        screened = prescreen_request(req)
+        if screened:
+            return TranslationEvalResponse(score=screened[0], reason=screened[1])
+        if not eval_engine.wait_until_ready(timeout=float(get_setting('model_wait_seconds', '30'))):
+            return model_unavailable_response()
+        # runs in the threadpool; concurrent callers end up in the same engine batch
+        try:
+            raw = eval_engine.submit(build_eval_messages(req.source, req.translation)).result()
+        except Exception as e:
+            return evaluation_failed_response(e)
+        try:
+            score, reason = parse_eval_output(raw)
+        except ValueError as e:
+            return TranslationEvalResponse(score=0, reason=f"Model output parse error: {str(e)} | Raw: {raw}")
+        eval_cache.put(cache_key, score, reason)
+    save_eval_result(req.source, req.translation, score, reason, project_id=req.project_id, locale=req.locale)
     print(f"[Translation Eval] Score: {score}, Reason: {reason}")
     return TranslationEvalResponse(score=score, reason=reason)
 
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/evaluate-translation/stream")
+def evaluate_translation_stream(req: TranslationEvalRequest):
+    """Same as /evaluate-translation but streams tokens as server-sent events, then a final result event."""
+    from transformers import TextIteratorStreamer
+    cache_key = eval_cache_key(req.source, req.translation)
+    cached = eval_cache.get(cache_key)
+    metrics.inc("eval_cache_lookups_total", {"result": "hit" if cached else "miss"})
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    if cached:
+        score, reason = cached
+        save_eval_result(req.source, req.translation, score, reason, project_id=req.project_id, locale=req.locale)
+        return StreamingResponse(iter([sse_event("result", {"score": score, "reason": reason, "cached": True})]), media_type="text/event-stream", headers=headers)
+    screened = prescreen_request(req)
+    if screened:
+        return StreamingResponse(iter([sse_event("result", {"score": screened[0], "reason": screened[1], "prescreen": True})]), media_type="text/event-stream", headers=headers)
+    if isinstance(eval_engine, ProcessPoolEvaluationEngine):
+        # the model lives in the worker processes, so only the final result can be streamed
+        if not eval_engine.wait_until_ready(timeout=float(get_setting('model_wait_seconds', '30'))):
+            return model_unavailable_response()
+        try:
+            raw = eval_engine.submit(build_eval_messages(req.source, req.translation)).result()
+        except Exception as e:
+            return evaluation_failed_response(e)
+        try:
+            score, reason = parse_eval_output(raw)
+        except ValueError as e:
+            return StreamingResponse(iter([sse_event("result", {"score": 0, "reason": f"Model output parse error: {str(e)} | Raw: {raw}"})]), media_type="text/event-stream", headers=headers)
+        eval_cache.put(cache_key, score, reason)
+        save_eval_result(req.source, req.translation, score, reason, project_id=req.project_id, locale=req.locale)
+        return StreamingResponse(iter([sse_event("result", {"score": score, "reason": reason})]), media_type="text/event-stream", headers=headers)
+    if not eval_engine.wait_until_ready(timeout=float(get_setting('model_wait_seconds', '30'))):
+        return model_unavailable_response()
+    # goes through the engine like every other evaluation, as a batch of one so tokens can be streamed
+    streamer = TextIteratorStreamer(model_manager.tokenizer, skip_prompt=True, skip_special_tokens=True)
+    future = eval_engine.submit(build_eval_messages(req.source, req.translation), streamer=streamer)
+
+    def events():
+        for text in streamer:
+            if text:
+                yield sse_event("token", {"text": text})
+        try:
+            raw = future.result()
+        except Exception as e:
+            yield sse_event("error", {"error": str(e)})
+            return
+        try:
+            score, reason = parse_eval_output(raw)
+        except ValueError as e:
+            yield sse_event("result", {"score": 0, "reason": f"Model output parse error: {str(e)} | Raw: {raw}"})
+            return
+        eval_cache.put(cache_key, score, reason)
+        save_eval_result(req.source, req.translation, score, reason, project_id=req.project_id, locale=req.locale)
+        print(f"[Translation Eval] Score: {score}, Reason: {reason}")
+        yield sse_event("result", {"score": score, "reason": reason})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
+@app.get("/admin/eval-engine")
+def get_eval_engine():
+    requests = eval_engine.stats["requests"]
+    return {
+        "max_batch_size": eval_engine.max_batch_size,
+        "max_wait_ms": eval_engine.max_wait_ms,
+        "decoding_mode": eval_engine.decoding_mode,
+        "prefix_cache": eval_engine.prefix_cache,
+        "prefix_cache_builds": prompt_prefix_cache.stats["builds"],
+        "prefix_tokens_reused": prompt_prefix_cache.stats["reused_tokens"],
+        "queue_depth": eval_engine.queue_depth(),
+        # in pool mode the prefix caches live in the workers; their summed counters override the ones above
+        **eval_engine.stats,
+        "avg_generated_tokens": round(eval_engine.stats["generated_tokens"] / requests, 1) if requests else None,
+        "avg_prompt_tokens": round(eval_engine.stats["prompt_tokens"] / requests, 1) if requests else None,
+    }
+
+@app.post("/admin/eval-engine")
+def set_eval_engine(data: dict = Body(...)):
+    if "decoding_mode" in data and data["decoding_mode"] not in EVAL_DECODING_MODES:
+        return JSONResponse(status_code=400, content={"success": False, "message": f"decoding_mode must be one of {', '.join(EVAL_DECODING_MODES)}"})
+    if "max_batch_size" in data:
+        eval_engine.max_batch_size = max(1, int(data["max_batch_size"]))
+        set_setting("eval_max_batch_size", str(eval_engine.max_batch_size))
+    if "max_wait_ms" in data:
+        eval_engine.max_wait_ms = max(0, int(data["max_wait_ms"]))
+        set_setting("eval_max_wait_ms", str(eval_engine.max_wait_ms))
+    if "decoding_mode" in data:
+        eval_engine.decoding_mode = data["decoding_mode"]
+        set_setting("eval_decoding_mode", eval_engine.decoding_mode)
+    if "prefix_cache" in data:
+        eval_engine.prefix_cache = bool(data["prefix_cache"])
+        set_setting("eval_prefix_cache", "true" if eval_engine.prefix_cache else "false")
+        if not eval_engine.prefix_cache:
+            prompt_prefix_cache.clear()
+    return {"success": True, "max_batch_size": eval_engine.max_batch_size, "max_wait_ms": eval_engine.max_wait_ms, "decoding_mode": eval_engine.decoding_mode, "prefix_cache": eval_engine.prefix_cache}
+
+@app.get("/admin/eval-cache")
+def get_eval_cache():
+    with db().read() as conn:
+        c = conn.cursor()
+        c.execute("SELECT COUNT(*) FROM eval_cache")
+        stored = c.fetchone()[0]
+    return {**eval_cache.summary(), "stored_entries": stored}
+
+@app.post("/admin/eval-cache/clear")
+def clear_eval_cache():
+    eval_cache.clear()
+    return {"success": True}
+
 def get_setting(key: str, default=None):
-    with sqlite3.connect(DB_PATH) as conn:
+    with db().read() as conn:
         c = conn.cursor()
         c.execute("SELECT value FROM settings WHERE key=?", (key,))
         row = c.fetchone()
         return row[0] if row else default
 
 def set_setting(key: str, value: str):
-    with sqlite3.connect(DB_PATH) as conn:
+    with db().write() as conn:
         c = conn.cursor()
         c.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, value))
         conn.commit()
 
+# --- Bulk evaluation jobs ---
+# Streams every matching row of a project/locale through the evaluation engine and writes
+# confidence/reason back a chunk at a time. last_id is committed together with each chunk,
+# so a job interrupted by a restart picks up where it stopped.
+eval_job_cancel_events = {}
+
+def eval_job_filter(job):
+    query = " FROM smartling_translations WHERE project_id=? AND locale=?"
+    params = [job["project_id"], job["locale"]]
+    if job["status_filter"] in ("completed", "pending"):
+        query += " AND status=?"
+        params.append(job["status_filter"])
+    if job["flag_filter"] is not None:
+        query += " AND flag=?"
+        params.append(job["flag_filter"])
+    if job["missing_confidence"]:
+        query += " AND confidence IS NULL"
+    return query, params
+
+def get_eval_job(job_id: int):
+    with db().read() as conn:
+        conn.row_factory = sqlite3.Row
+        c = conn.cursor()
+        c.execute("SELECT * FROM eval_jobs WHERE id=?", (job_id,))
+        row = c.fetchone()
+        return dict(row) if row else None
+
+def eval_job_progress(job):
+    # processed counts every row the job has visited: scored (model or eval cache, translation-memory
+    # duplicates included) + prescreened + failed + skipped (rows without a source or translation)
+    progress = dict(job)
+    progress["skipped"] = max(job["processed"] - job["scored"] - job["prescreened"] - job["failed"], 0)
+    progress["strings_per_second"] = round(job["processed"] / job["elapsed_seconds"], 2) if job["elapsed_seconds"] else 0.0
+    progress["percent"] = round(100.0 * job["processed"] / job["total"], 1) if job["total"] else None
+    return progress
+
+def run_eval_job(job_id: int, cancel_event: threading.Event):
+    job = get_eval_job(job_id)
+    where, params = eval_job_filter(job)
+    chunk_size = max(1, eval_engine.max_batch_size) * 4
+    # fingerprint rows first so translation-memory duplicates are evaluated once
+    index_translation_memory(job["project_id"], job["locale"])
+    screen = Prescreen.for_project(job["project_id"], job["locale"])
+    last_id = job["last_id"]
+    with db().write() as conn:
+        c = conn.cursor()
+        c.execute("UPDATE eval_jobs SET state='running', error=NULL, updated_at=? WHERE id=?", (int(time.time()), job_id))
+        conn.commit()
+    try:
+        while not cancel_event.is_set():
+            started = time.perf_counter()
+            with db().read() as conn:
+                c = conn.cursor()
+                c.execute("SELECT id, parsed_string_text, translation, tm_key" + where + " AND id>? ORDER BY id LIMIT ?", params + [last_id, chunk_size])
+                rows = c.fetchall()
+            if not rows:
+                break
+            updates = []
+            tm_updates = {}
+            pending = {}
+            prescreened = 0
+            failed = 0
+            for row_id, src, tgt, row_tm_key in rows:
+                if not (src and tgt):
+                    continue
+                dedupe_key = row_tm_key or eval_cache_key(src, tgt)
+                if dedupe_key in pending:
+                    pending[dedupe_key][2].append(row_id)
+                    continue
+                cache_key = eval_cache_key(src, tgt)
+                cached = eval_cache.get(cache_key)
+                if cached:
+                    updates.append((cached[0], cached[1], "model", row_id))
+                    if row_tm_key:
+                        tm_updates[row_tm_key] = cached
+                    continue
+                if screen.enabled:
+                    score, reasons = screen.score(src, tgt)
+                    if screen.route(score) != "model":
+                        updates.append((score, prescreen_reason(reasons), "prescreen", row_id))
+                        prescreened += 1
+                        continue
+                if not pending and not eval_engine.wait_until_ready():
+                    raise RuntimeError(f"Model is not available (state: {eval_engine.state})")
+                # submit the whole chunk up front so the engine can fill its batches
+                pending[dedupe_key] = (cache_key, eval_engine.submit(build_eval_messages(src, tgt)), [row_id], row_tm_key)
+            for cache_key, future, row_ids, row_tm_key in pending.values():
+                try:
+                    score, reason = parse_eval_output(future.result())
+                except Exception as e:
+                    # a failed batch or unparseable output only fails these rows; if the model went
+                    # away, the readiness check before the next chunk's first submit stops the job
+                    print(f"[Eval Job {job_id}] Evaluation failed for rows {row_ids}: {e}")
+                    failed += len(row_ids)
+                    continue
+                eval_cache.put(cache_key, score, reason)
+                updates.extend((score, reason, "model", row_id) for row_id in row_ids)
+                if row_tm_key:
+                    tm_updates[row_tm_key] = (score, reason)
+            last_id = rows[-1][0]
+            with db().write() as conn:
+                c = conn.cursor()
+                c.executemany("UPDATE smartling_translations SET confidence=?, reason=?, confidence_source=? WHERE id=?", updates)
+                # duplicates later in the project get the score now, so a missing_confidence job skips them
+                c.executemany(
+                    "UPDATE smartling_translations SET confidence=?, reason=?, confidence_source='model' WHERE tm_key=? AND project_id=? AND locale=? AND confidence IS NULL",
+                    [(score, reason, key, job["project_id"], job["locale"]) for key, (score, reason) in tm_updates.items()]
+                )
+                # rows filled in from the translation memory count towards the job's total as well
+                propagated = max(c.rowcount, 0) if job["missing_confidence"] else 0
+                scored = len(updates) - prescreened + propagated
+                c.execute(
+                    "UPDATE eval_jobs SET last_id=?, processed=processed+?, scored=scored+?, failed=failed+?, prescreened=prescreened+?, elapsed_seconds=elapsed_seconds+?, updated_at=? WHERE id=?",
+                    (last_id, len(rows) + propagated, scored, failed, prescreened, time.perf_counter() - started, int(time.time()), job_id)
+                )
+                conn.commit()
+            invalidate_translation_counts(job["project_id"])
+        state = "cancelled" if cancel_event.is_set() else "done"
+        error = None
+    except Exception as e:
+        print(f"[Eval Job {job_id} Error]", e)
+        traceback.print_exc()
+        state, error = "failed", str(e)
+    with db().write() as conn:
+        c = conn.cursor()
+        c.execute("UPDATE eval_jobs SET state=?, error=?, updated_at=? WHERE id=?", (state, error, int(time.time()), job_id))
+        conn.commit()
+    eval_job_cancel_events.pop(job_id, None)
+
+def start_eval_job_thread(job_id: int):
+    cancel_event = threading.Event()
+    eval_job_cancel_events[job_id] = cancel_event
+    threading.Thread(target=run_eval_job, args=(job_id, cancel_event), name=f"eval-job-{job_id}", daemon=True).start()
+
+@app.on_event("startup")
+def resume_eval_jobs():
+    with db().read() as conn:
+        c = conn.cursor()
+        c.execute("SELECT id FROM eval_jobs WHERE state IN ('queued', 'running') ORDER BY id")
+        job_ids = [row[0] for row in c.fetchall()]
+    for job_id in job_ids:
+        print(f"[Eval Job {job_id}] resuming")
+        start_eval_job_thread(job_id)
+
+@app.post("/admin/eval-jobs")
+def start_eval_job(data: dict = Body(...)):
+    project_id = data.get("project_id")
+    if not project_id:
+        return JSONResponse(status_code=400, content={"error": "Missing project_id"})
+    job = {
+        "project_id": project_id,
+        "locale": data.get("locale", "ja-JP"),
+        "status_filter": data.get("status"),
+        "flag_filter": data.get("flag"),
+        "missing_confidence": 1 if data.get("missing_confidence", True) else 0,
+    }
+    where, params = eval_job_filter(job)
+    now = int(time.time())
+    with db().write() as conn:
+        c = conn.cursor()
+        c.execute("SELECT COUNT(*)" + where, params)
+        total = c.fetchone()[0]
+        c.execute(
+            "INSERT INTO eval_jobs (project_id, locale, status_filter, flag_filter, missing_confidence, total, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (job["project_id"], job["locale"], job["status_filter"], job["flag_filter"], job["missing_confidence"], total, now, now)
+        )
+        job_id = c.lastrowid
+        conn.commit()
+    start_eval_job_thread(job_id)
+    return {"success": True, "job_id": job_id, "total": total}
+
+@app.get("/admin/eval-jobs")
+def list_eval_jobs(project_id: str = None):
+    with db().read() as conn:
+        conn.row_factory = sqlite3.Row
+        c = conn.cursor()
+        if project_id:
+            c.execute("SELECT * FROM eval_jobs WHERE project_id=? ORDER BY id DESC", (project_id,))
+        else:
+            c.execute("SELECT * FROM eval_jobs ORDER BY id DESC")
+        return [eval_job_progress(dict(row)) for row in c.fetchall()]
+
+@app.get("/admin/eval-jobs/{job_id}")
+def get_eval_job_progress(job_id: int):
+    job = get_eval_job(job_id)
+    if not job:
+        return JSONResponse(status_code=404, content={"error": "Job not found"})
+    return eval_job_progress(job)
+
+@app.post("/admin/eval-jobs/{job_id}/cancel")
+def cancel_eval_job(job_id: int):
+    job = get_eval_job(job_id)
+    if not job:
+        return JSONResponse(status_code=404, content={"error": "Job not found"})
+    cancel_event = eval_job_cancel_events.get(job_id)
+    if cancel_event:
+        cancel_event.set()
+    elif job["state"] in ("queued", "running"):
+        with db().write() as conn:
+            c = conn.cursor()
+            c.execute("UPDATE eval_jobs SET state='cancelled', updated_at=? WHERE id=?", (int(time.time()), job_id))
+            conn.commit()
+    return {"success": True}
+
+@app.post("/admin/eval-jobs/{job_id}/resume")
+def resume_eval_job(job_id: int):
+    job = get_eval_job(job_id)
+    if not job:
+        return JSONResponse(status_code=404, content={"error": "Job not found"})
+    if job_id in eval_job_cancel_events:
+        return JSONResponse(status_code=409, content={"error": "Job is already running"})
+    if job["state"] == "done":
+        return JSONResponse(status_code=400, content={"error": "Job already finished"})
+    start_eval_job_thread(job_id)
+    return {"success": True, "job_id": job_id, "last_id": job["last_id"]}
+
+# --- Background sync jobs ---
+# Smartling syncs and flagging run as rows in the jobs table, picked up by a scheduler loop on the
+# app's event loop. Jobs left running by a restart are queued again on startup; job_schedules
+# enqueue a job every interval_seconds (e.g. an hourly delta sync).
+def sync_job_options(params):
+    concurrency = max(1, int(params.get("concurrency") or get_setting('smartling_fetch_concurrency', '4')))
+    return params["project_id"], params.get("locale", "ja-JP"), bool(params.get("full_resync", False)), concurrency
+
+async def run_job_files_job(params, progress):
+    project_id, _, full_resync, concurrency = sync_job_options(params)
+    pairs = await sync_job_files(project_id, full_resync, concurrency, progress)
+    return {"saved": len(pairs), **progress}
+
+async def run_translations_job(params, progress):
+    project_id, locale, full_resync, concurrency = sync_job_options(params)
+    await sync_translations(project_id, locale, full_resync, concurrency, progress)
+    return dict(progress)
+
+async def run_flag_job(params, progress):
+    project_id, locale, full_resync, _ = sync_job_options(params)
+    await asyncio.to_thread(run_flag_rules, project_id, locale, full_resync, progress)
+    return dict(progress)
+
+async def run_strings_job(params, progress):
+    project_id, locale, _, concurrency = sync_job_options(params)
+    return await sync_smartling_strings(project_id, locale, progress, batch_size=int(params.get("batch_size", 100)), concurrency=concurrency)
+
+async def run_tm_index_job(params, progress):
+    project_id, locale, _, _ = sync_job_options(params)
+    await asyncio.to_thread(index_translation_memory, project_id, locale, progress)
+    return dict(progress)
+
+async def run_prescreen_job(params, progress):
+    project_id, locale, _, _ = sync_job_options(params)
+    await asyncio.to_thread(run_prescreen, project_id, locale, progress)
+    return dict(progress)
+
+async def run_delta_sync_job(params, progress):
+    # job files -> translations -> flagging -> translation memory; checkpoints make repeat runs cheap
+    progress["step"] = "job_files"
+    progress["job_files"] = {}
+    await run_job_files_job(params, progress["job_files"])
+    progress["step"] = "translations"
+    progress["translations"] = {}
+    await run_translations_job(params, progress["translations"])
+    progress["step"] = "flag"
+    progress["flag"] = {}
+    await run_flag_job(params, progress["flag"])
+    progress["step"] = "tm_index"
+    progress["tm_index"] = {}
+    await run_tm_index_job(params, progress["tm_index"])
+    progress["step"] = "done"
+    return dict(progress)
+
+SYNC_JOB_KINDS = {
+    "job_files": run_job_files_job,
+    "translations": run_translations_job,
+    "flag": run_flag_job,
+    "strings": run_strings_job,
+    "tm_index": run_tm_index_job,
+    "prescreen": run_prescreen_job,
+    "delta_sync": run_delta_sync_job,
+}
+SYNC_JOB_POLL_SECONDS = 1.0
+sync_job_tasks = {}
+sync_job_progress = {}
+sync_job_requeue = set()
+sync_scheduler_task = None
+
+def validate_sync_job(data):
+    kind = data.get("kind")
+    if kind not in SYNC_JOB_KINDS:
+        return None, f"Unknown job kind, expected one of {', '.join(SYNC_JOB_KINDS)}"
+    params = dict(data.get("params") or {})
+    if not params.get("project_id"):
+        return None, "Missing project_id"
+    return (kind, params), None
+
+def enqueue_sync_job(kind, params, schedule_id=None):
+    with db().write() as conn:
+        c = conn.cursor()
+        c.execute("INSERT INTO jobs (kind, params, schedule_id, created_at) VALUES (?, ?, ?, ?)", (kind, json.dumps(params), schedule_id, int(time.time())))
+        job_id = c.lastrowid
+        conn.commit()
+    return job_id
+
+def get_sync_job(job_id: int):
+    with db().read() as conn:
+        conn.row_factory = sqlite3.Row
+        c = conn.cursor()
+        c.execute("SELECT * FROM jobs WHERE id=?", (job_id,))
+        row = c.fetchone()
+    return sync_job_status(dict(row)) if row else None
+
+def sync_job_status(job):
+    for key in ("params", "progress", "result"):
+        job[key] = json.loads(job[key]) if job[key] else None
+    if job["id"] in sync_job_progress:
+        # live counters; the stored snapshot is only refreshed once per scheduler tick
+        job["progress"] = sync_job_progress[job["id"]]
+    return job
+
+def update_sync_job(job_id, **fields):
+    with db().write() as conn:
+        c = conn.cursor()
+        c.execute("UPDATE jobs SET " + ", ".join(f"{key}=?" for key in fields) + " WHERE id=?", list(fields.values()) + [job_id])
+        conn.commit()
+
+async def run_sync_job(job_id, kind, params):
+    progress = sync_job_progress[job_id] = {}
+    started = time.perf_counter()
+    await asyncio.to_thread(update_sync_job, job_id, state="running", error=None, started_at=int(time.time()))
+    fields = {}
+    try:
+        result = await SYNC_JOB_KINDS[kind](params, progress)
+        fields = {"state": "done", "result": json.dumps(result)}
+    except asyncio.CancelledError:
+        fields = {"state": "queued" if job_id in sync_job_requeue else "cancelled"}
+    except Exception as e:
+        print(f"[Sync Job {job_id} Error]", e)
+        traceback.print_exc()
+        fields = {"state": "failed", "error": str(e)}
+    finally:
+        fields.update(progress=json.dumps(progress), finished_at=int(time.time()), seconds=round(time.perf_counter() - started, 2))
+        await asyncio.to_thread(update_sync_job, job_id, **fields)
+        sync_job_progress.pop(job_id, None)
+        sync_job_tasks.pop(job_id, None)
+        sync_job_requeue.discard(job_id)
+
+def enqueue_due_schedules():
+    now = int(time.time())
+    with db().write() as conn:
+        c = conn.cursor()
+        c.execute("SELECT id, kind, params, interval_seconds, last_job_id FROM job_schedules WHERE enabled=1 AND next_run_at<=?", (now,))
+        schedules = c.fetchall()
+        for schedule_id, kind, params, interval_seconds, last_job_id in schedules:
+            # don't pile up runs behind one that is still going
+            c.execute("SELECT 1 FROM jobs WHERE id=? AND state IN ('queued', 'running')", (last_job_id,))
+            if c.fetchone():
+                continue
+            c.execute("INSERT INTO jobs (kind, params, schedule_id, created_at) VALUES (?, ?, ?, ?)", (kind, params, schedule_id, now))
+            c.execute("UPDATE job_schedules SET next_run_at=?, last_job_id=? WHERE id=?", (now + interval_seconds, c.lastrowid, schedule_id))
+        conn.commit()
+
+def claim_queued_jobs(limit):
+    with db().write() as conn:
+        c = conn.cursor()
+        c.execute("SELECT id, kind, params FROM jobs WHERE state='queued' ORDER BY id LIMIT ?", (limit,))
+        jobs = c.fetchall()
+        c.executemany("UPDATE jobs SET state='running', attempts=attempts+1 WHERE id=?", [(job[0],) for job in jobs])
+        conn.commit()
+    return jobs
+
+def save_sync_job_progress():
+    with db().write() as conn:
+        c = conn.cursor()
+        c.executemany("UPDATE jobs SET progress=? WHERE id=?", [(json.dumps(progress), job_id) for job_id, progress in list(sync_job_progress.items())])
+        conn.commit()
+
+async def sync_scheduler_loop():
+    while True:
+        try:
+            await asyncio.to_thread(enqueue_due_schedules)
+            free = max(1, int(await asyncio.to_thread(get_setting, 'sync_max_concurrent_jobs', '1'))) - len(sync_job_tasks)
+            if free > 0:
+                for job_id, kind, params in await asyncio.to_thread(claim_queued_jobs, free):
+                    sync_job_tasks[job_id] = asyncio.create_task(run_sync_job(job_id, kind, json.loads(params)))
+            if sync_job_progress:
+                await asyncio.to_thread(save_sync_job_progress)
+        except Exception as e:
+            print("[Sync Scheduler Error]", e)
+            traceback.print_exc()
+        await asyncio.sleep(SYNC_JOB_POLL_SECONDS)
+
+@app.on_event("startup")
+async def start_sync_scheduler():
+    global sync_scheduler_task
+    with db().write() as conn:
+        c = conn.cursor()
+        c.execute("UPDATE jobs SET state='queued' WHERE state='running'")
+        if c.rowcount:
+            print(f"[Sync Scheduler] requeued {c.rowcount} interrupted job(s)")
+        conn.commit()
+    sync_scheduler_task = asyncio.create_task(sync_scheduler_loop())
+
+@app.on_event("shutdown")
+async def stop_sync_scheduler():
+    if sync_scheduler_task:
+        sync_scheduler_task.cancel()
+    # interrupted jobs go back to the queue and start over on the next startup
+    tasks = list(sync_job_tasks.items())
+    for job_id, task in tasks:
+        sync_job_requeue.add(job_id)
+        task.cancel()
+    await asyncio.gather(*[task for _, task in tasks], return_exceptions=True)
+
+@app.post("/admin/jobs")
+def create_sync_job(data: dict = Body(...)):
+    job, error = validate_sync_job(data)
+    if error:
+        return JSONResponse(status_code=400, content={"error": error})
+    return get_sync_job(enqueue_sync_job(*job))
+
+@app.get("/admin/jobs")
+def list_sync_jobs(state: str = None, kind: str = None, limit: int = 50):
+    with db().read() as conn:
+        conn.row_factory = sqlite3.Row
+        c = conn.cursor()
+        query = "SELECT * FROM jobs WHERE 1=1"
+        params = []
+        if state:
+            query += " AND state=?"
+            params.append(state)
+        if kind:
+            query += " AND kind=?"
+            params.append(kind)
+        c.execute(query + " ORDER BY id DESC LIMIT ?", params + [limit])
+        return [sync_job_status(dict(row)) for row in c.fetchall()]
+
+@app.get("/admin/jobs/{job_id}")
+def get_sync_job_status(job_id: int):
+    job = get_sync_job(job_id)
+    if not job:
+        return JSONResponse(status_code=404, content={"error": "Job not found"})
+    return job
+
+@app.post("/admin/jobs/{job_id}/cancel")
+def cancel_sync_job(job_id: int):
+    job = get_sync_job(job_id)
+    if not job:
+        return JSONResponse(status_code=404, content={"error": "Job not found"})
+    task = sync_job_tasks.get(job_id)
+    if task:
+        task.get_loop().call_soon_threadsafe(task.cancel)
+    elif job["state"] in ("queued", "running"):
+        update_sync_job(job_id, state="cancelled", finished_at=int(time.time()))
+    else:
+        return JSONResponse(status_code=400, content={"error": f"Job already {job['state']}"})
+    return {"success": True}
+
+@app.get("/admin/job-schedules")
+def list_job_schedules():
+    with db().read() as conn:
+        conn.row_factory = sqlite3.Row
+        c = conn.cursor()
+        c.execute("SELECT * FROM job_schedules ORDER BY id")
+        return [{**dict(row), "params": json.loads(row["params"])} for row in c.fetchall()]
+
+@app.post("/admin/job-schedules")
+def create_job_schedule(data: dict = Body(...)):
+    job, error = validate_sync_job(data)
+    if error:
+        return JSONResponse(status_code=400, content={"error": error})
+    interval_seconds = int(data.get("interval_seconds") or 3600)
+    if interval_seconds < 60:
+        return JSONResponse(status_code=400, content={"error": "interval_seconds must be at least 60"})
+    now = int(time.time())
+    next_run_at = now if data.get("run_now", True) else now + interval_seconds
+    with db().write() as conn:
+        c = conn.cursor()
+        c.execute(
+            "INSERT INTO job_schedules (kind, params, interval_seconds, next_run_at, created_at) VALUES (?, ?, ?, ?, ?)",
+            (job[0], json.dumps(job[1]), interval_seconds, next_run_at, now)
+        )
+        schedule_id = c.lastrowid
+        conn.commit()
+    return {"success": True, "schedule_id": schedule_id, "next_run_at": next_run_at}
+
+@app.delete("/admin/job-schedules/{schedule_id}")
+def delete_job_schedule(schedule_id: int):
+    with db().write() as conn:
+        c = conn.cursor()
+        c.execute("DELETE FROM job_schedules WHERE id=?", (schedule_id,))
+        conn.commit()
+        if not c.rowcount:
+            return JSONResponse(status_code=404, content={"error": "Schedule not found"})
+    return {"success": True}
+
+@app.on_event("startup")
+def load_model_on_startup():
+    if get_setting('download_model', 'false') == 'true':
+        eval_engine.load()
+
+@app.on_event("shutdown")
+def stop_eval_workers():
+    if isinstance(eval_engine, ProcessPoolEvaluationEngine):
+        eval_engine.unload()
+
 @app.post("/admin/set-model-download-flag")
 def set_model_download_flag(data: dict = Body(...)):
     flag = data.get("download_model", False)
     set_setting("download_model", "true" if flag else "false")
-    return {"success": True, "download_model": flag}
+    if flag:
+        eval_engine.load()
+    else:
+        eval_engine.unload()
+    return {"success": True, "download_model": flag, "state": eval_engine.state}
+
+@app.get("/admin/model-status")
+def get_model_status():
+    if isinstance(eval_engine, ProcessPoolEvaluationEngine):
+        return {
+            **model_manager.status(),
+            "state": eval_engine.state,
+            "error": eval_engine.error,
+            "loaded_precision": eval_engine.loaded_precision,
+            "workers": eval_engine.worker_status(),
+        }
+    return model_manager.status()
+
+@app.get("/admin/eval-workers")
+def get_eval_workers():
+    return {
+        "processes": int(get_setting('eval_worker_processes', '0')),
+        "threads": int(get_setting('eval_worker_threads', '0')),
+        "queue_depth": int(get_setting('eval_queue_depth', '256')),
+        "active_processes": EVAL_WORKER_PROCESSES,
+        "workers": eval_engine.worker_status() if isinstance(eval_engine, ProcessPoolEvaluationEngine) else [],
+    }
+
+@app.post("/admin/eval-workers")
+def set_eval_workers(data: dict = Body(...)):
+    for key, setting in (("processes", "eval_worker_processes"), ("threads", "eval_worker_threads"), ("queue_depth", "eval_queue_depth")):
+        if key in data:
+            set_setting(setting, str(max(0, int(data[key]))))
+    # the engine type is picked at import, so switching modes takes a restart
+    return {"success": True, "restart_required": True, **get_eval_workers()}
+
+@app.get("/admin/inference-precision")
+def get_inference_precision():
+    return {"precision": model_manager.precision, "options": list(INFERENCE_PRECISIONS)}
+
+@app.post("/admin/inference-precision")
+def set_inference_precision(data: dict = Body(...)):
+    precision = data.get("precision")
+    if precision not in INFERENCE_PRECISIONS:
+        return JSONResponse(status_code=400, content={"success": False, "message": f"precision must be one of {', '.join(INFERENCE_PRECISIONS)}"})
+    if eval_engine.state == "loading":
+        return JSONResponse(status_code=409, content={"success": False, "message": "Model is loading, try again once it is ready"})
+    set_setting("inference_precision", precision)
+    model_manager.precision = precision
+    # reload with the new precision if a model is currently in memory
+    if eval_engine.state == "ready" and eval_engine.loaded_precision != precision:
+        eval_engine.unload()
+        eval_engine.load()
+    return {"success": True, "precision": precision, "state": eval_engine.state}
 
 @app.get("/admin/get-model-download-flag")
 def get_model_download_flag():
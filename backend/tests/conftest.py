@@ -0,0 +1,7 @@
+import os
+import sys
+import tempfile
+
+# main runs init_db() on import; keep the tests off the real strings.db
+os.environ["STRINGS_DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="strings-test-"), "strings.db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
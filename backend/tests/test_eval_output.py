@@ -0,0 +1,40 @@
+import torch
+
+import main
+
+
+class CharTokenizer:
+    """One token per character, so the criteria see the text exactly as written."""
+    def __init__(self, text):
+        self.text = text
+
+    def batch_decode(self, ids):
+        return [self.text[i] for i in ids[:, 0].tolist()]
+
+
+def stop_position(text, prompt_length=3):
+    criteria = main.JsonObjectStoppingCriteria(CharTokenizer(text))
+    ids = torch.zeros((1, prompt_length), dtype=torch.long)
+    for i in range(len(text)):
+        ids = torch.cat([ids, torch.tensor([[i]])], dim=1)
+        if criteria(ids, None)[0]:
+            return i + 1
+    return None
+
+
+def test_stops_after_first_object():
+    text = '{"score": 90, "reason": "ok"} and more'
+    assert text[:stop_position(text)] == '{"score": 90, "reason": "ok"}'
+
+
+def test_prose_with_braces_and_quotes_before_json():
+    prefix = 'The "{count}" placeholder is kept, so: '
+    obj = '{"score": 85, "reason": "Keeps {count}; says \\"hi\\" {"}'
+    text = prefix + obj + "\nExtra text {"
+    assert text[:stop_position(text)] == prefix + obj
+    assert main.parse_eval_output(text) == (85, 'Keeps {count}; says "hi" {')
+
+
+def test_unbalanced_prose_brace_does_not_stop_early():
+    text = 'Note: { is literal. {"score": 40, "reason": "x"}'
+    assert stop_position(text) == len(text)
@@ -0,0 +1,47 @@
+import main
+
+
+def screen(glossary=(), length_stats=(-0.5, 0.3)):
+    return main.Prescreen("ja-JP", main.Glossary(glossary), length_stats)
+
+
+def test_clean_translation_of_typical_length_passes():
+    s = screen()
+    source, translation = "Your changes have been saved.", "変更が保存されました。"
+    score, reasons = s.score(source, translation, length_z=0.2)
+    assert score >= s.pass_above
+    assert reasons == []
+    assert s.route(score) == "pass"
+
+
+def test_pass_needs_length_statistics_or_glossary():
+    source, translation = "Your changes have been saved.", "変更が保存されました。"
+    score, _ = screen(length_stats=None).score(source, translation)
+    assert screen().route(score) == "model"
+    # short UI labels covered by the glossary pass without project statistics
+    score, _ = screen([("settings", "設定")], length_stats=None).score("Settings", "設定")
+    assert screen().route(score) == "pass"
+
+
+def test_broken_translations_fail():
+    s = screen()
+    for source, translation in [
+        ("Export report as CSV", "Export report as CSV"),
+        ("Hello {name}, you have {count} items", "こんにちは、アイテムがあります"),
+        ("Save", "   "),
+    ]:
+        score, reasons = s.score(source, translation, length_z=0.0)
+        assert reasons
+        assert s.route(score) == "fail", (source, translation, score, reasons)
+
+
+def test_uncertain_translation_goes_to_model():
+    s = screen([("dashboard", "ダッシュボード")])
+    score, reasons = s.score("Open the dashboard", "管理画面を開く", length_z=0.0)
+    assert reasons == ["glossary term not followed: dashboard"]
+    assert s.route(score) == "model"
+
+
+def test_force_model_skips_prescreen():
+    req = main.TranslationEvalRequest(source="Export report as CSV", translation="Export report as CSV", force_model=True)
+    assert main.prescreen_request(req) is None